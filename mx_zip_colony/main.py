@@ -1,8 +1,47 @@
+import numpy as np
 import pandas as pd
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pyexcel_ods3 import save_data
-import ezodf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.checkpoint import Checkpoint  # noqa: E402
+from ods_utilities.readers import load_workbooks, open_workbook, read_text_table, validate_columns  # noqa: E402
+from ods_utilities.writers import atomic_output, pop_format_option, with_extension, write_table  # noqa: E402
+from mx_zip_colony.matching import match_colonies, municipality_codes, normalize_state_names  # noqa: E402
+from mx_zip_colony.zipcolony import DEFAULT_INDEX, build_index  # noqa: E402
+
+
+# Column names mapping to keys. Use only the keys to access the column data and use those same keys to assing the output data.
+# This structure defines the mapping from the input files column names to the output files column names. It also standarizes
+# variable names for each specific value.
+COLUMN_KEYS = {
+    'city': {
+        'name': 'name',
+        'code': 'l10n_mx_edi_code',
+        'external_id': 'external_id',
+        'state_name': 'state_name',
+        'state_external_id': 'state_external_id',
+        'country_external_id': 'country_external_id',
+    },
+    'colony': {
+        'name': 'd_asenta',
+        'code': 'id_asenta_cpcons',
+    },
+    'zipcode': {
+        'name': 'd_codigo',
+    },
+    'mx_record': {
+        'state_name': 'd_estado',
+        'city_code': 'c_mnpio',
+    },
+    'ccp': {
+        'colony_code': 'c_Colonia',
+        'zip_code': 'c_CodigoPostal',
+        'colony_name': 'asentamiento',
+    }
+}
 
 
 def generate_external_id(**kwargs):
@@ -17,16 +56,18 @@ def generate_external_id(**kwargs):
         str: A unique external identifier generated by joining cleaned values of the provided keyword arguments
              with underscores.
     """
-    cleaned_args = {key: value.replace(" ", "") for key, value in kwargs.items()}
+    cleaned_args = {key: str(value).replace(" ", "") for key, value in kwargs.items()}
     return "_".join(cleaned_args.values())
 
 
-def read_file(file_name):
+def read_file(file_name, usecols=None, categories=None):
     """
-    Reads an ODS file and returns its contents as a dictionary.
+    Reads an ODS file (or a Parquet/Arrow file written by a previous step) and returns its contents as a dictionary.
 
     Args:
         file_name (str): Name of the ODS file.
+        usecols (list, optional): Names of the columns to read, other cells are skipped by the parser.
+        categories (list, optional): Repetitive columns (state names, city codes) built as categoricals.
 
     Returns:
         dict: A dictionary containing each sheet name as a key and its contents as a DataFrame.
@@ -34,18 +75,7 @@ def read_file(file_name):
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            doc = ezodf.opendoc(file_path)
-            ods_data = {}
-            for sheet in doc.sheets:
-                sheet_name = sheet.name
-                data = []
-                for row in sheet.rows():
-                    row_data = []
-                    for cell in row:
-                        row_data.append(cell.value)
-                    data.append(row_data)
-                ods_data[sheet_name] = pd.DataFrame(data[1:], columns=data[0])
-            return ods_data
+            return open_workbook(file_path, usecols=usecols, categories=categories)
         except Exception as e:
             print(f"Error reading ODS file '{file_name}': {e}")
             return None
@@ -54,151 +84,484 @@ def read_file(file_name):
         return None
 
 
-def write_ods(data, output_path, sheet_name):
+def write_ods(data, output_path, sheet_name, columns=None):
     """
     Writes data to an ODS file, overwriting if a file with the same name already exists.
 
+    The file is written under a temporary name and renamed, so a crash never leaves a half-written
+    ODS and the previous file stays in place until the new one is complete.
+
     Args:
         data (list of dict): Data to be written to the ODS file.
         output_path (str): Absolute path for the output ODS file.
         sheet_name (str): Name of the sheet in the ODS file.
+        columns (list, optional): Header of the sheet, taken from the first row when not given.
 
     Returns:
         None
     """
-    # Remove the existing file if it exists
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
     # Convert data to a dictionary suitable for saving
-    sheet_data = {sheet_name: [list(data[0].keys())] + [[cell if cell is not None else '' for cell in row.values()] for row in data]}
+    if columns is None:
+        columns = list(data[0].keys())
+    sheet_data = {sheet_name: [list(columns)] + [[row.get(column) if row.get(column) is not None else '' for column in columns] for row in data]}
 
     # Save the data to an ODS file
-    save_data(output_path, sheet_data)
+    with atomic_output(output_path) as temp_path:
+        save_data(temp_path, sheet_data)
+
+
+def write_output(data, output_path, sheet_name, output_format='ods', columns=None):
+    """
+    Writes data to an ODS file, or to a Parquet/Arrow IPC file next to `output_path`.
+
+    Args:
+        data (list of dict): Data to be written.
+        output_path (str): Absolute path for the output ODS file.
+        sheet_name (str): Name of the sheet in the ODS file.
+        output_format (str): 'ods', 'csv', 'parquet' or 'arrow'.
+        columns (list, optional): Output columns, required when `data` may be empty.
+
+    Returns:
+        str: Path of the written file.
+    """
+    if output_format == 'ods':
+        write_ods(data, output_path, sheet_name, columns)
+        return output_path
+    output_path = with_extension(output_path, output_format)
+    write_table(pd.DataFrame(data, columns=columns), output_path, output_format)
+    return output_path
+
+
+def row_fingerprints(df, columns, key='external_id'):
+    """
+    Hashes every row of `df` into a single 64-bit fingerprint, indexed by its external ID.
+
+    Values are compared as text, so an output read back with `read_text_table` fingerprints the
+    same as the freshly generated rows.
+
+    Args:
+        df (pd.DataFrame): Output rows, must contain `key`.
+        columns (list): Columns that take part in the fingerprint.
+        key (str): Column with the external ID.
+
+    Returns:
+        pd.Series: uint64 fingerprints indexed by external ID. When an external ID is repeated the
+        last row wins, as it does when Odoo imports the file.
+    """
+    df = df.drop_duplicates(subset=key, keep='last')
+    values = df.reindex(columns=columns).astype(object)
+    values = values.where(values.notna(), '').astype(str)
+    fingerprints = pd.util.hash_pandas_object(values, index=False)
+    return pd.Series(fingerprints.values, index=df[key].astype(str).values)
+
+
+def diff_outputs(previous_df, current_df, key='external_id'):
+    """
+    Compares two runs of an output by external ID using a hash index of row fingerprints.
+
+    Args:
+        previous_df (pd.DataFrame): Output of the previous run.
+        current_df (pd.DataFrame): Output of the current run.
+        key (str): Column with the external ID.
+
+    Returns:
+        tuple: DataFrames with the added and updated rows (current values) and the deleted rows
+        (previous values).
+    """
+    columns = [column for column in current_df.columns if column != key]
+    previous = row_fingerprints(previous_df, columns, key)
+    current = row_fingerprints(current_df, columns, key)
+
+    current_keys = current_df.drop_duplicates(subset=key, keep='last')
+    current_ids = current_keys[key].astype(str)
+    known = previous.reindex(current_ids.values)
+
+    added = current_keys[known.isna().values]
+    updated = current_keys[(known.notna() & (known != current.reindex(current_ids.values))).values]
+    previous_keys = previous_df.drop_duplicates(subset=key, keep='last')
+    deleted = previous_keys[~previous_keys[key].astype(str).isin(current.index)]
+    return added, updated, deleted
+
+
+def delta_file_path(output_path, suffix):
+    """
+    Returns the path of a delta file, e.g. res_colony.ods -> res_colony_added.ods.
+    """
+    base, extension = os.path.splitext(output_path)
+    return f"{base}_{suffix}{extension}"
+
+
+def write_delta(data, previous_path, output_path, sheet_name, output_format='ods', columns=None):
+    """
+    Writes the added, updated and deleted rows of an output compared to the previous run.
+
+    Args:
+        data (list of dict): Rows of the current run.
+        previous_path (str): Output file of the previous run, in `output_format`.
+        output_path (str): Absolute path for the output ODS file, delta files are written next to it.
+        sheet_name (str): Name of the sheet in the ODS files.
+        output_format (str): 'ods', 'csv', 'parquet' or 'arrow'.
+        columns (list): Output columns.
+
+    Returns:
+        list: Paths of the written delta files.
+    """
+    # Read as text, a CSV would otherwise give the code '0001' back as the number 1
+    try:
+        previous_df = read_text_table(os.path.join(os.getcwd(), previous_path))
+    except Exception as e:
+        print(f"Previous output '{previous_path}' could not be read ({e}). Skipping delta for {sheet_name}.")
+        return []
+    current_df = pd.DataFrame(data, columns=columns)
+
+    added, updated, deleted = diff_outputs(previous_df, current_df)
+    print(f"{sheet_name} delta: {len(added)} added, {len(updated)} updated, {len(deleted)} deleted")
+    written = []
+    for suffix, df in (('added', added), ('updated', updated), ('deleted', deleted)):
+        df = df.astype(object).where(df.notna(), None)
+        written.append(write_output(df.to_dict('records'), delta_file_path(output_path, suffix), sheet_name, output_format, list(df.columns)))
+    return written
+
+
+def city_columns(column_keys):
+    """
+    Returns the columns read from the cities file.
+    """
+    return [column_keys[key] for key in ('name', 'code', 'external_id', 'state_name', 'state_external_id')]
+
+
+def city_categories(column_keys):
+    """
+    Returns the columns of the cities file that repeat for every city of a state.
+    """
+    return [column_keys['state_name'], column_keys['state_external_id']]
+
+
+def data_columns(column_keys):
+    """
+    Returns the columns read from the Correos de México file.
+    """
+    return [
+        column_keys['mx_record']['city_code'],
+        column_keys['colony']['code'],
+        column_keys['colony']['name'],
+        column_keys['zipcode']['name'],
+    ]
+
+
+def data_categories(column_keys):
+    """
+    Returns the columns of the Correos de México file that repeat for every colony of a city.
+    """
+    return [column_keys['mx_record']['city_code']]
 
 
-def read_cities(absolute_file_path, column_keys):
+def ccp_columns(column_keys):
+    """
+    Returns the columns read from the SAT carta porte file.
+    """
+    return [column_keys['zip_code'], column_keys['colony_code'], column_keys['colony_name']]
+
+
+def read_cities(absolute_file_path, column_keys, data=None):
     """
     Reads cities (municipalities) data from the specified file and returns a dictionary grouped by state name.
 
     Args:
         absolute_file_path (str): Absolute path to the cities file.
         column_keys (dict): Dictionary containing keys to access columns.
+        data (dict, optional): Sheets of the file already loaded, e.g. by `load_workbooks`.
 
     Returns:
         dict: Dictionary containing city data with state code as key.
     """
     cities = {}
-    data = read_file(absolute_file_path)
+    if data is None:
+        data = read_file(absolute_file_path, usecols=city_columns(column_keys), categories=city_categories(column_keys))
     sheet_name = list(data.keys())[0]  # Assuming there's only one sheet
 
-    for _, row in data[sheet_name].iterrows():
-        city = {
-            'name': row[column_keys['name']],
-            'code': row[column_keys['code']],
-            'external_id': row[column_keys['external_id']],
-            'state_name': row[column_keys['state_name']],
-            'state_external_id': row[column_keys['state_external_id']]
-        }
-        state_name = city['state_name']
-        if state_name not in cities:
-            cities[state_name] = {}
-        cities[state_name][city['code']] = city
+    # Grouping on the categorical state column works on its integer codes
+    for state_name, state in data[sheet_name].groupby(column_keys['state_name'], observed=True, sort=False):
+        cities[state_name] = {}
+        for _, row in state.iterrows():
+            city = {
+                'name': row[column_keys['name']],
+                'code': row[column_keys['code']],
+                'external_id': row[column_keys['external_id']],
+                'state_name': state_name,
+                'state_external_id': row[column_keys['state_external_id']]
+            }
+            cities[state_name][city['code']] = city
     return cities
 
 
-def read_data(absolute_file_path, column_keys, cities):
+def city_index(cities):
+    """
+    Builds the normalized keys of the cities catalog, so Correos de México sheets and city codes
+    written differently (accents, case, spacing, zero padding) still find their state and city.
+
+    Args:
+        cities (dict): Cities by state name and city code, see `read_cities`.
+
+    Returns:
+        dict: State names of the catalog keyed by their normalized name, see `normalize_state_names`.
+        dict: For every state, the city codes of the catalog keyed by their integer value, see
+        `municipality_codes`.
+    """
+    state_names = pd.Series(list(cities), dtype=object)
+    state_keys = {}
+    for key, state_name in zip(normalize_state_names(state_names), state_names):
+        state_keys.setdefault(key, state_name)
+
+    municipalities = {}
+    for state_name, state_cities in cities.items():
+        codes = pd.Series(list(state_cities), dtype=object)
+        municipalities[state_name] = {}
+        for number, code in zip(municipality_codes(codes), codes):
+            if not pd.isna(number):
+                municipalities[state_name].setdefault(int(number), code)
+    return state_keys, municipalities
+
+
+# Columns of the key matching report
+KEY_REPORT_COLUMNS = ['kind', 'sheet', 'key', 'matched_key', 'rows', 'status']
+
+
+def match_city_codes(codes, state_cities, state_municipalities):
+    """
+    Finds the catalog city code of every row of a state. A code found as written is kept, any
+    other code is looked up by its integer value. Each distinct code is matched once.
+
+    Args:
+        codes (pd.Series): City codes of the state's rows.
+        state_cities (dict): Cities of the state keyed by city code, see `read_cities`.
+        state_municipalities (dict): Catalog city codes of the state by integer value, see `city_index`.
+
+    Returns:
+        np.ndarray: Catalog city code of every row, None where the code is not in the catalog.
+        list: (code, catalog code or None, rows) of the codes not found as written.
+    """
+    positions, uniques = pd.factorize(codes.astype(object))
+    uniques = pd.Series(uniques, dtype=object)
+    counts = np.bincount(positions[positions >= 0], minlength=len(uniques))
+    matched = []
+    misses = []
+    for code, number, count in zip(uniques, municipality_codes(uniques), counts):
+        if code in state_cities:
+            matched.append(code)
+            continue
+        match = None if pd.isna(number) else state_municipalities.get(int(number))
+        matched.append(match)
+        misses.append((code, match, int(count)))
+    missing = int((positions < 0).sum())
+    if missing:
+        misses.append((None, None, missing))
+    row_codes = np.array(matched + [None], dtype=object)[positions]  # Missing codes have position -1
+    return row_codes, misses
+
+
+def process_state(state_name, data, state_cities, column_keys, state_municipalities=None, sheet_name=None):
+    """
+    Builds the colonies and zip codes of one state (one Correos de México sheet).
+
+    City codes are matched with `match_city_codes`, colonies and zip codes of a code matched by
+    its integer value get the catalog code, as if the sheet had it written the same way.
+
+    Args:
+        state_name (str): Name of the state in the cities catalog.
+        data (pd.DataFrame): Rows of the state's sheet.
+        state_cities (dict): Cities of the state keyed by city code, see `read_cities`.
+        column_keys (dict): Dictionary containing keys to access columns.
+        state_municipalities (dict, optional): Catalog city codes of the state by integer value,
+            see `city_index`. Built from `state_cities` when not given.
+        sheet_name (str, optional): Name of the state's sheet, `state_name` when not given.
+
+    Returns:
+        dict: Colonies of the state keyed by city code, then by colony code.
+        dict: Zip codes of the state keyed by city code, then by zip code.
+        list: Report rows of the city codes not found as written, see `KEY_REPORT_COLUMNS`.
+    """
+    colonies = {}
+    zipcodes = {}
+    sheet_name = sheet_name or state_name
+    if state_municipalities is None:
+        state_municipalities = city_index({state_name: state_cities})[1][state_name]
+
+    row_codes, misses = match_city_codes(data[column_keys['mx_record']['city_code']], state_cities, state_municipalities)
+    report = []
+    for code, match, rows in misses:
+        if match is None:
+            print(f"City code {code} not in cities for state {state_name}. Skipping {rows} row(s).")
+        report.append({'kind': 'municipality', 'sheet': sheet_name, 'key': code, 'matched_key': match, 'rows': rows,
+                       'status': 'unmatched' if match is None else 'normalized'})
+
+    for city_code, (_, row) in zip(row_codes, data.iterrows()):
+        if city_code is None:
+            continue
+
+        city = state_cities[city_code]
+        city_external_id = city['external_id']
+
+        # Process colonies
+        colony_code = row[column_keys['colony']['code']]
+        colony = colonies.setdefault(city_code, {}).get(colony_code)
+
+        if colony is None:
+            colony = {
+                'name': row[column_keys['colony']['name']],
+                'code': colony_code,
+                'zip': row[column_keys['zipcode']['name']],
+                'city_code': city_code,
+                'city_external_id': city_external_id,
+                'state_name': state_name,
+                'external_id': generate_external_id(state_name=state_name, city_code=city_code, colony_code=colony_code)
+            }
+        else:
+            colony['zip'] += f", {row[column_keys['zipcode']['name']]}"
+
+        # Add colony to output
+        colonies[city_code][colony_code] = colony
+
+        # Process zip codes
+        zipcode_name = row[column_keys['zipcode']['name']]
+        zipcode = zipcodes.setdefault(city_code, {}).get(zipcode_name)
+
+        if zipcode is None:
+            zipcode = {
+                'name': zipcode_name,
+                'city_code': city_code,
+                'city_external_id': city_external_id,
+                'state_name': state_name,
+                'external_id': generate_external_id(state_name=state_name, city_code=city_code, zipcode_name=zipcode_name)
+            }
+
+        # Add zipcode to output
+        zipcodes[city_code][zipcode_name] = zipcode
+
+    return colonies, zipcodes, report
+
+
+def process_state_sheet(workbook, sheet_name, state_name, state_cities, column_keys, state_municipalities=None):
+    """
+    Process pool task: parses only the sheet of a state and builds its colonies and zip codes.
+
+    The worker receives the unparsed `Workbook` opened by the parent, with the byte range of every
+    sheet already found, so it parses its own sheet without scanning the file again. Only the
+    state's slice of cities is sent with it, never the parsed sheet.
+    """
+    return process_state(state_name, workbook[sheet_name], state_cities, column_keys, state_municipalities, sheet_name)
+
+
+def read_data(absolute_file_path, column_keys, cities, workers=None, data=None, checkpoint=None, index=None):
     """
     Reads colonies and zip codes data from the specified file and returns dictionaries grouped by state name and city code.
 
     This method reads data from the provided file, which contains multiple datasets (sheets), each representing data for a specific state.
     It processes each state's data separately and returns dictionaries containing colony and zip code data, grouped by state name and city code.
 
+    Sheet names and city codes are matched as written first, then by their normalized keys (see
+    `city_index`), so "Michoacan de Ocampo" finds "Michoacán de Ocampo" and city code 1 finds "001".
+    Keys only matched after normalization, and keys not matched at all, are returned in a report.
+
     Args:
         absolute_file_path (str): Absolute path to the file.
         column_keys (dict): Dictionary containing keys to access columns.
         cities (dict): Dictionary containing city data with state code as key.
+        workers (int, optional): Number of processes used to parse and process the states in parallel,
+            each one receives a single sheet and the cities of its state. States are processed one
+            after another when not given.
+        data (dict, optional): Sheets of the file already loaded, e.g. by `load_workbooks`. States
+            are then processed one after another.
+        checkpoint (Checkpoint, optional): Saves the colonies and zip codes of every processed state.
+            States already saved by a previous run are restored instead of processed again.
+        index (tuple, optional): Normalized keys of `cities` returned by `city_index`, built when not given.
 
     Returns:
         dict: A nested dictionary where keys represent state names, values are dictionaries containing colony data. Each colony dictionary is keyed by city code and contains nested dictionaries for individual colonies.
 
         dict: A nested dictionary where keys represent state names, values are dictionaries containing zip code data. Each zip code dictionary is keyed by city code and contains nested dictionaries for individual zip codes.
+
+        list: Key matching report, one dict per state or city code not found as written, see `KEY_REPORT_COLUMNS`.
     """
     colonies = {}
     zipcodes = {}
 
-    file_data = read_file(absolute_file_path)
-
-    for state_name, data in file_data.items():
-        print(f"Read data sheet_name: {state_name}")
-        if state_name not in cities:
-            print(f"State name {state_name} not in cities dataset. Skipping sheet.")
+    usecols = data_columns(column_keys)
+    file_data = data if data is not None else read_file(absolute_file_path, usecols=usecols, categories=data_categories(column_keys))
+
+    state_keys, municipalities = index if index is not None else city_index(cities)
+
+    # Sheets by the state they match, all sheet names normalized at once. A sheet named exactly as
+    # a state takes it before any sheet only matching it after normalization
+    sheet_names = pd.Series(list(file_data), dtype=object)
+    exact = {sheet_name for sheet_name in sheet_names if sheet_name in cities}
+    states = {}
+    report = []
+    for sheet_name, key in zip(sheet_names, normalize_state_names(sheet_names)):
+        print(f"Read data sheet_name: {sheet_name}")
+        state_name = sheet_name if sheet_name in cities else state_keys.get(key)
+        if state_name is None:
+            print(f"State name {sheet_name} not in cities dataset. Skipping sheet.")
+            report.append({'kind': 'state', 'sheet': sheet_name, 'key': sheet_name, 'matched_key': None, 'rows': None, 'status': 'unmatched'})
+            continue
+        if state_name in states.values() or (state_name != sheet_name and state_name in exact):
+            print(f"Sheet {sheet_name} matches state {state_name}, read from another sheet. Skipping sheet.")
+            report.append({'kind': 'state', 'sheet': sheet_name, 'key': sheet_name, 'matched_key': state_name, 'rows': None, 'status': 'duplicate'})
             continue
+        if state_name != sheet_name:
+            print(f"Sheet {sheet_name} matched state {state_name} after normalization.")
+            report.append({'kind': 'state', 'sheet': sheet_name, 'key': sheet_name, 'matched_key': state_name, 'rows': None, 'status': 'normalized'})
+        states[sheet_name] = state_name
+
+    results = {}
+    pending = []
+    for sheet_name in states:
+        if checkpoint is not None and checkpoint.done(f"state/{sheet_name}"):
+            print(f"Restoring state {states[sheet_name]} from the checkpoint")
+            results[sheet_name] = checkpoint.result(f"state/{sheet_name}")
+        else:
+            pending.append(sheet_name)
+
+    def finished(sheet_name, result):
+        results[sheet_name] = result
+        if checkpoint is not None:
+            checkpoint.complete(f"state/{sheet_name}", result=result)
+
+    if workers and workers > 1 and data is None and pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            futures = [executor.submit(process_state_sheet, file_data, sheet_name, states[sheet_name],
+                                       cities[states[sheet_name]], column_keys, municipalities[states[sheet_name]])
+                       for sheet_name in pending]
+            for sheet_name, future in zip(pending, futures):
+                finished(sheet_name, future.result())
+    else:
+        for sheet_name in pending:
+            state_name = states[sheet_name]
+            finished(sheet_name, process_state(state_name, file_data[sheet_name], cities[state_name], column_keys,
+                                               municipalities[state_name], sheet_name))
 
-        colonies[state_name] = {}
-        zipcodes[state_name] = {}
+    # Merge in sheet order, whatever order the states were processed or restored in
+    for sheet_name, state_name in states.items():
+        colonies[state_name], zipcodes[state_name], state_report = results[sheet_name]
+        report.extend(state_report)
+    return colonies, zipcodes, report
 
-        for _, row in data.iterrows():
-            city_code = row[column_keys['mx_record']['city_code']]
-            if city_code not in cities[state_name]:
-                print(f"City code {city_code} not in cities for state {state_name}. Skipping row. {row}")
-                continue
-
-            city = cities[state_name][city_code]
-            city_external_id = city['external_id']
-
-            # Process colonies
-            colony_code = row[column_keys['colony']['code']]
-            colony = colonies[state_name].setdefault(city_code, {}).get(colony_code)
-
-            if colony is None:
-                colony = {
-                    'name': row[column_keys['colony']['name']],
-                    'code': colony_code,
-                    'zip': row[column_keys['zipcode']['name']],
-                    'city_code': city_code,
-                    'city_external_id': city_external_id,
-                    'state_name': state_name,
-                    'external_id': generate_external_id(state_name=state_name, city_code=city_code, colony_code=colony_code)
-                }
-            else:
-                colony['zip'] += f", {row[column_keys['colony']['zip']]}"
-
-            # Add colony to output
-            colonies[state_name][city_code][colony_code] = colony
-
-            # Process zip codes
-            zipcode_name = row[column_keys['zipcode']['name']]
-            zipcode = zipcodes[state_name].setdefault(city_code, {}).get(zipcode_name)
-
-            if zipcode is None:
-                zipcode = {
-                    'name': zipcode_name,
-                    'city_code': city_code,
-                    'city_external_id': city_external_id,
-                    'state_name': state_name,
-                    'external_id': generate_external_id(state_name=state_name, city_code=city_code, zipcode_name=zipcode_name)
-                }
-
-            # Add zipcode to output
-            zipcodes[state_name][city_code][zipcode_name] = zipcode
-
-    return colonies, zipcodes
-
-
-def process_ccp_data(ccp_file_path, column_keys):
+
+def process_ccp_data(ccp_file_path, column_keys, ccp=None):
     """
     Process the CCP dataset to create a dictionary mapping zip codes to colony codes.
 
     Args:
-        ccp (dict): Dictionary containing CCP data with sheet names as keys.
+        ccp_file_path (str): Absolute path to the SAT carta porte file.
         column_keys (dict): Dictionary containing keys to access columns in the CCP dataset.
+        ccp (dict, optional): Sheets of the file already loaded, e.g. by `load_workbooks`.
 
     Returns:
         dict: Dictionary mapping zip codes to colony codes.
         dict: Dictionary mapping zip codes to colony codes and names.
     """
-    ccp = read_file(ccp_file_path)
+    if ccp is None:
+        ccp = read_file(ccp_file_path, usecols=ccp_columns(column_keys))
     ccp_data_dict = {}
     ccp_lookup_dict = {}
 
@@ -213,42 +576,109 @@ def process_ccp_data(ccp_file_path, column_keys):
     return ccp_data_dict, ccp_lookup_dict
 
 
-def process_directory(cities_file_path=None,
-                      correos_de_mexico_file_path=None,
-                      colony_output_file_path=None,
-                      zip_output_file_path=None,
-                      error_logs_file_path=None,
-                      column_keys=None):
+def write_matches(colonies, ccp_data, colony_output_file_path, threshold=0.5, output_format='ods'):
     """
-    Processes the provided input files and generates an output file.
+    Matches the colony names of Correos de México with the SAT CCP catalog within each zip code and
+    writes the scored matches and both lists of unmatched colonies next to the colonies output
+    (`<output>_matches`, `<output>_unmatched_correos` and `<output>_unmatched_ccp`).
 
     Args:
-        cities_file_path (str): Absolute path to the file containing cities (municipalities) data.
-        correos_de_mexico_file_path (str): Absolute path to the file containing colonies data.
-        output_file_path (str): Absolute path for the output file.
-        column_keys (dict): Dictionary containing keys to access columns in each file.
+        colonies (dict): Colonies returned by `read_data`.
+        ccp_data (dict): CCP colonies by zip code returned by `process_ccp_data`.
+        colony_output_file_path (str): Absolute path for the colonies output ODS file.
+        threshold (float): Minimum name similarity (0 to 1) of a match.
+        output_format (str): 'ods', 'csv', 'parquet' or 'arrow'.
+
+    Returns:
+        list: Paths of the written files.
     """
-    if os.path.exists(error_logs_file_path):
-        os.remove(error_logs_file_path)
+    correos_rows = []
+    for state in colonies.values():
+        for city in state.values():
+            for colony in city.values():
+                # Colonies spanning several zip codes are compared in every one of them
+                for zip_code in str(colony['zip']).split(', '):
+                    correos_rows.append({
+                        'zip': zip_code,
+                        'code': colony['code'],
+                        'name': colony['name'],
+                        'city_external_id': colony['city_external_id'],
+                        'external_id': colony['external_id'],
+                    })
+    ccp_rows = [colony for zip_colonies in ccp_data.values() for colony in zip_colonies]
 
-    # Redirect print statements to a log file if error_logs_file_path is provided
-    if error_logs_file_path:
-        sys.stdout = open(error_logs_file_path, 'a')  # Append mode
+    matches, unmatched_correos, unmatched_ccp = match_colonies(
+        pd.DataFrame(correos_rows, columns=['zip', 'code', 'name', 'city_external_id', 'external_id']),
+        pd.DataFrame(ccp_rows, columns=['zip', 'code', 'name']),
+        threshold)
+    print(f"Colony matching: {len(matches)} matches, {len(unmatched_correos)} unmatched Correos de México colonies, "
+          f"{len(unmatched_ccp)} unmatched CCP colonies")
 
-    cities = read_cities(cities_file_path, column_keys['city'])
-    ccp_data, ccp_lookup = process_ccp_data(ccp_file_path, column_keys['ccp'])
-    colonies, zipcodes = read_data(correos_de_mexico_file_path, column_keys, cities)
+    written = []
+    for suffix, df in (('matches', matches), ('unmatched_correos', unmatched_correos), ('unmatched_ccp', unmatched_ccp)):
+        df = df.astype(object).where(df.notna(), None)
+        written.append(write_output(df.to_dict('records'), delta_file_path(colony_output_file_path, suffix), suffix, output_format, list(df.columns)))
+    return written
 
-    colonies_data = []
 
+def write_key_report(report, colony_output_file_path, output_format='ods'):
+    """
+    Prints a summary of the key matching report of `read_data` and writes it next to the colonies
+    output (`<output>_keys`), one row per sheet or city code only matched after normalization
+    (`normalized`), not matched (`unmatched`) or matching a state already read (`duplicate`).
+
+    Args:
+        report (list): Report rows returned by `read_data`.
+        colony_output_file_path (str): Absolute path for the colonies output ODS file.
+        output_format (str): 'ods', 'csv', 'parquet' or 'arrow'.
+
+    Returns:
+        list: Path of the written file, empty when every key matched as written.
+    """
+    if not report:
+        print("Key matching: every state and city code matched as written")
+        return []
+    df = pd.DataFrame(report, columns=KEY_REPORT_COLUMNS)
+    for kind in ('state', 'municipality'):
+        rows = df[df['kind'] == kind]
+        for status in ('normalized', 'unmatched', 'duplicate'):
+            keys = rows[rows['status'] == status]
+            if len(keys):
+                counted = f" ({int(keys['rows'].sum())} rows)" if kind == 'municipality' else ''
+                print(f"Key matching: {len(keys)} {kind} key(s) {status}{counted}")
+
+    # Codes may be text or numbers, written as text so every format takes the column
+    for column in ('key', 'matched_key'):
+        df[column] = df[column].map(lambda value: None if value is None else str(value))
+    df = df.astype(object).where(df.notna(), None)
+    return [write_output(df.to_dict('records'), delta_file_path(colony_output_file_path, 'keys'), 'Keys', output_format, KEY_REPORT_COLUMNS)]
+
+
+COLONY_COLUMNS = ['external_id', 'name', 'code', 'city_external_id', 'zip_code_external_id']
+ZIP_COLUMNS = ['external_id', 'name', 'city_external_id']
+
+
+def build_outputs(zipcodes, ccp_data, ccp_lookup):
+    """
+    Builds the output rows: the zip codes of Correos de México found in the SAT CCP catalog, and
+    the CCP colonies of each one of them.
+
+    Args:
+        zipcodes (dict): Zip codes returned by `read_data`.
+        ccp_data (dict): CCP colonies by zip code returned by `process_ccp_data`.
+        ccp_lookup (dict): CCP colony codes by zip code returned by `process_ccp_data`.
+
+    Returns:
+        list: Colony rows, with the `COLONY_COLUMNS` keys.
+        list: Zip code rows, with the `ZIP_COLUMNS` keys.
+    """
+    colonies_data = []
     zipcodes_data = []
     for state in zipcodes.values():
         for city in state.values():
             for zipcode in city.values():
                 zipcode_name = zipcode['name']
                 if zipcode_name in ccp_lookup:
-                    if zipcode_name == ['22755', '22754', '22753', '22752']:
-                        print(f"found  {zipcode_name} | {ccp_data[zipcode_name]} | {zipcode}")
                     zipcodes_data.append({
                         'external_id': zipcode['external_id'],
                         'name': zipcode_name,
@@ -262,11 +692,105 @@ def process_directory(cities_file_path=None,
                             'city_external_id': zipcode['city_external_id'],
                             'zip_code_external_id': zipcode['external_id']
                         })
+    return colonies_data, zipcodes_data
+
+
+def process_directory(cities_file_path=None,
+                      correos_de_mexico_file_path=None,
+                      colony_output_file_path=None,
+                      zip_output_file_path=None,
+                      error_logs_file_path=None,
+                      column_keys=None,
+                      output_format='ods',
+                      previous_dir=None,
+                      workers=None,
+                      parallel_load=False,
+                      index_path=None,
+                      match_threshold=None,
+                      resume=False):
+    """
+    Processes the provided input files and generates an output file.
+
+    Args:
+        cities_file_path (str): Absolute path to the file containing cities (municipalities) data.
+        correos_de_mexico_file_path (str): Absolute path to the file containing colonies data.
+        output_file_path (str): Absolute path for the output file.
+        column_keys (dict): Dictionary containing keys to access columns in each file.
+        output_format (str): Format of the outputs: 'ods' (default), 'csv', 'parquet' or 'arrow'.
+        previous_dir (str, optional): Directory with the outputs of the previous run. When given,
+            the added, updated and deleted colonies and zip codes are also written to
+            `<output>_added`, `<output>_updated` and `<output>_deleted` files.
+        workers (int, optional): Number of processes used to process the states in parallel, see `read_data`.
+        parallel_load (bool): Reads the input files at the same time, one process per file. With
+            `workers`, the Correos de México file is left to the per-state processes.
+        index_path (str, optional): Also writes the zip codes and colonies to this SQLite index,
+            see `zipcolony.py`.
+        match_threshold (float, optional): Also matches the Correos de México colony names with the
+            SAT CCP ones within each zip code, see `write_matches`.
+        resume (bool): Resumes a run that did not finish. Every processed state and written file
+            is recorded in a checkpoint (`.mx_zip_colony.checkpoint` next to the outputs) with
+            content hashes; with `resume` the recorded work is skipped if the inputs are unchanged.
+            All outputs are written to a temporary file and renamed, never left half-written.
+
+    States and city codes of Correos de México only matched to the cities file after normalizing
+    them, or not matched at all, are written to `<colony output>_keys`, see `write_key_report`.
+    """
+    if os.path.exists(error_logs_file_path) and not resume:
+        os.remove(error_logs_file_path)
+
+    # Redirect print statements to a log file if error_logs_file_path is provided
+    if error_logs_file_path:
+        sys.stdout = open(error_logs_file_path, 'a')  # Append mode
+
+    checkpoint = Checkpoint(os.path.join(os.path.dirname(colony_output_file_path), '.mx_zip_colony.checkpoint'),
+                            [cities_file_path, correos_de_mexico_file_path, ccp_file_path],
+                            {'column_keys': column_keys, 'output_format': output_format, 'key_matching': 'normalized'}, resume)
+
+    loaded = {}
+    if parallel_load:
+        requests = {
+            'cities': (cities_file_path, {'usecols': city_columns(column_keys['city']), 'categories': city_categories(column_keys['city'])}),
+            'ccp': (ccp_file_path, {'usecols': ccp_columns(column_keys['ccp'])}),
+        }
+        if not workers or workers <= 1:
+            requests['data'] = (correos_de_mexico_file_path, {'usecols': data_columns(column_keys), 'categories': data_categories(column_keys)})
+        loaded = load_workbooks(requests)
+
+    cities = read_cities(cities_file_path, column_keys['city'], loaded.get('cities'))
+    ccp_data, ccp_lookup = process_ccp_data(ccp_file_path, column_keys['ccp'], loaded.get('ccp'))
+    colonies, zipcodes, key_report = read_data(correos_de_mexico_file_path, column_keys, cities, workers, loaded.get('data'), checkpoint)
+    if not checkpoint.done("keys"):
+        checkpoint.complete("keys", write_key_report(key_report, colony_output_file_path, output_format))
+
+    colonies_data, zipcodes_data = build_outputs(zipcodes, ccp_data, ccp_lookup)
+
+    outputs = [
+        (colonies_data, colony_output_file_path, 'Colonies', COLONY_COLUMNS),
+        (zipcodes_data, zip_output_file_path, 'Zipcodes', ZIP_COLUMNS),
+    ]
+
+    # Write the deltas first, the previous outputs may be the files about to be overwritten
+    if previous_dir:
+        for data, output_path, sheet_name, columns in outputs:
+            step = f"delta/{sheet_name}/{previous_dir}"
+            if not checkpoint.done(step):
+                previous_path = os.path.join(previous_dir, os.path.basename(with_extension(output_path, output_format)))
+                checkpoint.complete(step, write_delta(data, previous_path, output_path, sheet_name, output_format, columns))
 
     # Write colonies and zipcodes to output file
+    for data, output_path, sheet_name, columns in outputs:
+        if not checkpoint.done(f"output/{sheet_name}"):
+            checkpoint.complete(f"output/{sheet_name}", [write_output(data, output_path, sheet_name, output_format, columns)])
+
+    if index_path and not checkpoint.done(f"index/{index_path}"):
+        build_index(zipcodes_data, colonies_data, index_path)
+        checkpoint.complete(f"index/{index_path}", [index_path])
+
+    if match_threshold is not None and not checkpoint.done(f"matches/{match_threshold}"):
+        checkpoint.complete(f"matches/{match_threshold}",
+                            write_matches(colonies, ccp_data, colony_output_file_path, match_threshold, output_format))
 
-    write_ods(colonies_data, colony_output_file_path, 'Colonies')
-    write_ods(zipcodes_data, zip_output_file_path, 'Zipcodes')
+    checkpoint.finish()
 
     # Reset stdout to default (console) after processing
     if error_logs_file_path:
@@ -275,37 +799,7 @@ def process_directory(cities_file_path=None,
 
 
 if __name__ == "__main__":
-    """
-    Define column names mapping to keys. Use only the keys to access the column data and use those same keys to assing the output data.
-    This approach results in this structure defining the mapping from the input files column names to the output files column names. It also standarizes variable names for each specific value.
-    """
-    column_keys = {
-        'city': {
-            'name': 'name',
-            'code': 'l10n_mx_edi_code',
-            'external_id': 'external_id',
-            'state_name': 'state_name',
-            'state_external_id': 'state_external_id',
-            'country_external_id': 'country_external_id',
-        },
-        'colony': {
-            'name': 'd_asenta',
-            'code': 'id_asenta_cpcons',
-        },
-        'zipcode': {
-            'name': 'd_codigo',
-        },
-        'mx_record': {
-            'state_name': 'd_estado',
-            'city_code': 'c_mnpio',
-        },
-        'ccp': {
-            'colony_code': 'c_Colonia',
-            'zip_code': 'c_CodigoPostal',
-            'colony_name': 'asentamiento',
-        }
-
-    }
+    column_keys = COLUMN_KEYS
 
     """
     The inputs consist of 3 files:
@@ -340,6 +834,38 @@ if __name__ == "__main__":
     """
 
     cwd = os.getcwd()
+    args = sys.argv[1:]
+    output_format = pop_format_option(args, 'ods')
+
+    # --delta <previous_dir> also writes the changes against the outputs of a previous run
+    previous_dir = None
+    if '--delta' in args:
+        index = args.index('--delta')
+        previous_dir = os.path.abspath(args[index + 1]) if index + 1 < len(args) and not args[index + 1].startswith('--') else cwd
+
+    # --workers <n> processes the states of correos_de_mexico.ods in n processes
+    workers = None
+    if '--workers' in args:
+        index = args.index('--workers')
+        workers = int(args[index + 1]) if index + 1 < len(args) and args[index + 1].isdigit() else os.cpu_count()
+
+    # --parallel-load reads the three input files at the same time
+    parallel_load = '--parallel-load' in args
+
+    # --index [path] also writes a SQLite index for zipcolony.py lookups
+    index_path = None
+    if '--index' in args:
+        index = args.index('--index')
+        index_path = os.path.abspath(args[index + 1]) if index + 1 < len(args) and not args[index + 1].startswith('--') else os.path.join(cwd, DEFAULT_INDEX)
+
+    # --resume skips the states and outputs a previous run that did not finish already processed
+    resume = '--resume' in args
+
+    # --match [threshold] also reconciles colony names between Correos de México and the SAT CCP
+    match_threshold = None
+    if '--match' in args:
+        index = args.index('--match')
+        match_threshold = float(args[index + 1]) if index + 1 < len(args) and not args[index + 1].startswith('--') else 0.5
 
     # Inputs
     cities_file_path = os.path.join(cwd, "res_city.ods")
@@ -351,11 +877,27 @@ if __name__ == "__main__":
     zip_output_file_path = os.path.join(cwd, "res_zip.ods")
     error_logs_file_path = os.path.join(cwd, "errors.log")
 
+    # Check the column names on the headers (first sheet of each file) before the full run
+    try:
+        validate_columns(cities_file_path, city_columns(column_keys['city']))
+        validate_columns(correos_de_mexico_file_path, data_columns(column_keys))
+        validate_columns(ccp_file_path, ccp_columns(column_keys['ccp']))
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
     process_directory(
         cities_file_path=cities_file_path,
         correos_de_mexico_file_path=correos_de_mexico_file_path,
         colony_output_file_path=colony_output_file_path,
         zip_output_file_path=zip_output_file_path,
         error_logs_file_path=error_logs_file_path,
-        column_keys=column_keys
+        column_keys=column_keys,
+        output_format=output_format,
+        previous_dir=previous_dir,
+        workers=workers,
+        parallel_load=parallel_load,
+        index_path=index_path,
+        match_threshold=match_threshold,
+        resume=resume
     )
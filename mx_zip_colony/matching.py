@@ -0,0 +1,195 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.cleaning import clean_columns  # noqa: E402
+
+
+# Settlement type prefixes that one catalog writes and the other one omits
+PREFIXES = (
+    'colonia', 'col', 'fraccionamiento', 'fracc', 'frac', 'barrio', 'bo', 'unidad habitacional', 'u hab', 'uh',
+    'conjunto habitacional', 'residencial', 'res', 'ejido', 'ej', 'rancheria', 'rancho', 'pueblo', 'ampliacion', 'ampl', 'amp',
+)
+
+# Common abbreviations, expanded so both catalogs spell the same tokens
+ABBREVIATIONS = {
+    'sta': 'santa', 'sto': 'santo', 'sn': 'san', 'gral': 'general', 'lic': 'licenciado', 'ing': 'ingeniero',
+    'profr': 'profesor', 'prof': 'profesor', 'ote': 'oriente', 'pte': 'poniente', 'nte': 'norte', 'ma': 'maria',
+}
+
+NORMALIZE_OPERATIONS = [
+    'strip_accents',
+    'lower',
+    ('regex_replace', r'[^a-z0-9]+', ' '),
+    'strip_spaces',
+    ('regex_replace', r'^(?:(?:' + '|'.join(sorted(PREFIXES, key=len, reverse=True)) + r')\b\s*)+', ''),
+    *[('regex_replace', rf'\b{abbreviation}\b', expansion) for abbreviation, expansion in ABBREVIATIONS.items()],
+    'collapse_whitespace',
+    'strip_spaces',
+]
+
+
+def normalize_names(names):
+    """
+    Normalizes colony names for matching: no accents, case, punctuation, settlement type prefix
+    ("Col.", "Fracc.", ...) or abbreviations. Each distinct name is normalized once.
+
+    Args:
+        names (pd.Series): Colony names.
+
+    Returns:
+        pd.Series: Normalized names.
+    """
+    df = pd.DataFrame({'name': names.astype(object).where(names.notna(), '').astype(str).values}, index=names.index)
+    return clean_columns(df, {'name': NORMALIZE_OPERATIONS})['name']
+
+
+STATE_OPERATIONS = [
+    'strip_accents',
+    'lower',
+    ('regex_replace', r'[^a-z0-9]+', ' '),
+    'collapse_whitespace',
+    'strip_spaces',
+]
+
+
+def normalize_state_names(names):
+    """
+    Normalizes state names for matching: no accents, case, punctuation or extra whitespace, so
+    "Michoacán de Ocampo", "MICHOACAN DE OCAMPO " and "michoacan-de-ocampo" share a key.
+
+    Args:
+        names (pd.Series): State names (cities catalog values or Correos de México sheet names).
+
+    Returns:
+        pd.Series: Normalized names.
+    """
+    df = pd.DataFrame({'name': names.astype(object).where(names.notna(), '').astype(str).values}, index=names.index)
+    return clean_columns(df, {'name': STATE_OPERATIONS})['name']
+
+
+def municipality_codes(codes):
+    """
+    Converts municipality codes to integers, so "001", " 1", 1 and 1.0 share a key. Each distinct
+    code is converted once.
+
+    Args:
+        codes (pd.Series): Municipality codes as read, text or numbers.
+
+    Returns:
+        pd.Series: Integer codes (Int64), missing where a code is empty or not a whole number.
+    """
+    positions, uniques = pd.factorize(codes.astype(object))
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object).astype(str).str.strip(), errors='coerce').to_numpy(dtype=float)
+    numbers[numbers % 1 != 0] = np.nan
+    values = np.append(numbers, np.nan)[positions]  # Missing codes have position -1
+    return pd.Series(values, index=codes.index).astype('Int64')
+
+
+def trigrams(name):
+    """
+    Returns the character trigrams of a normalized name, padded so short names still have some.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity_matrix(left, right):
+    """
+    Trigram Jaccard similarity between every name of `left` and every name of `right`.
+
+    Names are turned into binary trigram vectors over the vocabulary of the block, so the
+    intersections of all the pairs are a single matrix product.
+
+    Args:
+        left (list of str): Normalized names.
+        right (list of str): Normalized names.
+
+    Returns:
+        np.ndarray: Matrix of shape (len(left), len(right)) with scores between 0 and 1.
+    """
+    left_grams = [trigrams(name) for name in left]
+    right_grams = [trigrams(name) for name in right]
+    vocabulary = {gram: index for index, gram in enumerate(set().union(*left_grams, *right_grams))}
+
+    def vectors(grams_list):
+        matrix = np.zeros((len(grams_list), len(vocabulary)), dtype=np.float32)
+        for row, grams in enumerate(grams_list):
+            matrix[row, [vocabulary[gram] for gram in grams]] = 1
+        return matrix
+
+    a, b = vectors(left_grams), vectors(right_grams)
+    intersection = a @ b.T
+    union = a.sum(axis=1)[:, None] + b.sum(axis=1)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def match_block(left, right, threshold):
+    """
+    Pairs the names of one zip code block, best scores first, each name is used at most once.
+
+    Returns:
+        list of tuple: (left position, right position, score) of the accepted pairs.
+    """
+    scores = similarity_matrix(left, right)
+    order = np.argsort(-scores, axis=None, kind='stable')
+    rows, columns = np.unravel_index(order, scores.shape)
+    used_left, used_right = set(), set()
+    pairs = []
+    for row, column in zip(rows.tolist(), columns.tolist()):
+        score = float(scores[row, column])
+        if score < threshold:
+            break
+        if row in used_left or column in used_right:
+            continue
+        used_left.add(row)
+        used_right.add(column)
+        pairs.append((row, column, score))
+    return pairs
+
+
+def match_colonies(correos_df, ccp_df, threshold=0.5):
+    """
+    Matches the colonies of Correos de México with the SAT CCP catalog by name, comparing only
+    colonies that share a zip code.
+
+    Args:
+        correos_df (pd.DataFrame): Columns zip, code, name, plus any other columns to keep
+            (e.g. city_external_id).
+        ccp_df (pd.DataFrame): Columns zip, code, name.
+        threshold (float): Minimum trigram similarity for a pair to be a match.
+
+    Returns:
+        pd.DataFrame: Matches with the zip, the code and name of both catalogs and the score.
+        pd.DataFrame: Correos de México colonies without a match.
+        pd.DataFrame: CCP colonies without a match.
+    """
+    correos = correos_df.reset_index(drop=True)
+    correos = correos.assign(zip=correos['zip'].astype(str), normalized=normalize_names(correos['name']))
+    ccp = ccp_df.reset_index(drop=True)
+    ccp = ccp.assign(zip=ccp['zip'].astype(str), normalized=normalize_names(ccp['name']))
+
+    matched_correos, matched_ccp, scores = [], [], []
+    ccp_blocks = ccp.groupby('zip', sort=False).indices
+    for zip_code, correos_positions in correos.groupby('zip', sort=True).indices.items():
+        ccp_positions = ccp_blocks.get(zip_code)
+        if ccp_positions is None:
+            continue
+        left = correos['normalized'].values[correos_positions].tolist()
+        right = ccp['normalized'].values[ccp_positions].tolist()
+        for row, column, score in match_block(left, right, threshold):
+            matched_correos.append(correos_positions[row])
+            matched_ccp.append(ccp_positions[column])
+            scores.append(round(score, 4))
+
+    left = correos.iloc[matched_correos].drop(columns='normalized').reset_index(drop=True)
+    right = ccp.iloc[matched_ccp][['code', 'name']].reset_index(drop=True)
+    matches = left.rename(columns={'code': 'correos_code', 'name': 'correos_name'}).assign(
+        ccp_code=right['code'], ccp_name=right['name'], score=scores)
+
+    unmatched_correos = correos.drop(index=correos.index[matched_correos]).drop(columns='normalized')
+    unmatched_ccp = ccp.drop(index=ccp.index[matched_ccp]).drop(columns='normalized')
+    return matches, unmatched_correos.reset_index(drop=True), unmatched_ccp.reset_index(drop=True)
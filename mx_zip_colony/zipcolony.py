@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.readers import read_text_table  # noqa: E402
+from ods_utilities.writers import atomic_output  # noqa: E402
+
+
+DEFAULT_INDEX = "zipcolony.sqlite"
+
+SCHEMA = """
+CREATE TABLE zip (
+    external_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    city_external_id TEXT
+);
+CREATE TABLE colony (
+    external_id TEXT,
+    name TEXT,
+    code TEXT,
+    city_external_id TEXT,
+    zip_code_external_id TEXT
+);
+CREATE INDEX zip_name ON zip (name);
+CREATE INDEX colony_zip ON colony (zip_code_external_id);
+"""
+
+
+def _text(value):
+    """
+    Stores every value as text.
+    """
+    return None if value is None or value != value else str(value)
+
+
+def _zip_code(value):
+    """
+    Stores a zip code as 5-digit text, so 1000, 1000.0 and '01000' are all stored (and looked
+    up) as '01000'. Values that are not whole numbers are kept as text.
+    """
+    text = _text(value)
+    if text is None:
+        return None
+    text = text.strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return text
+    return f"{int(number):05d}" if number.is_integer() else text
+
+
+def build_index(zipcodes_data, colonies_data, index_path):
+    """
+    Writes the zip codes and colonies generated by `process_directory` to a SQLite index.
+
+    Args:
+        zipcodes_data (list of dict): Rows of res_zip (external_id, name, city_external_id).
+        colonies_data (list of dict): Rows of res_colony (external_id, name, code, city_external_id, zip_code_external_id).
+        index_path (str): Path of the SQLite file, replaced once the new index is complete.
+
+    Returns:
+        None
+    """
+    with atomic_output(index_path) as temp_path:
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO zip VALUES (?, ?, ?)",
+                    ((_text(row['external_id']), _zip_code(row['name']), _text(row['city_external_id'])) for row in zipcodes_data))
+                connection.executemany(
+                    "INSERT INTO colony VALUES (?, ?, ?, ?, ?)",
+                    ((_text(row['external_id']), _text(row['name']), _text(row['code']),
+                      _text(row['city_external_id']), _text(row['zip_code_external_id'])) for row in colonies_data))
+            connection.execute("ANALYZE")
+        finally:
+            connection.close()
+
+
+def open_index(index_path=DEFAULT_INDEX):
+    """
+    Opens a zip code index read-only. Keep the connection open to answer many lookups.
+    """
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"Index '{index_path}' not found. Run main.py with --index or zipcolony.py build first.")
+    return sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+
+
+def lookup(connection, zip_code):
+    """
+    Returns the zip code records of `zip_code` with their colonies.
+
+    A zip code may span several cities, so one record is returned per city.
+
+    Args:
+        connection (sqlite3.Connection): Connection returned by `open_index`.
+        zip_code (str or int): Zip code, e.g. '22755' or 1000 for '01000'.
+
+    Returns:
+        list of dict: One dict per zip code record with its external_id, name, city_external_id
+        and the list of its colonies (external_id, name, code).
+    """
+    rows = connection.execute(
+        "SELECT zip.external_id, zip.name, zip.city_external_id, colony.external_id, colony.name, colony.code "
+        "FROM zip LEFT JOIN colony ON colony.zip_code_external_id = zip.external_id "
+        "WHERE zip.name = ? ORDER BY zip.external_id, colony.code",
+        (_zip_code(zip_code),))
+
+    records = {}
+    for zip_external_id, name, city_external_id, colony_external_id, colony_name, colony_code in rows:
+        record = records.setdefault(zip_external_id, {
+            'external_id': zip_external_id,
+            'name': name,
+            'city_external_id': city_external_id,
+            'colonies': [],
+        })
+        if colony_external_id is not None:
+            record['colonies'].append({'external_id': colony_external_id, 'name': colony_name, 'code': colony_code})
+    return list(records.values())
+
+
+def build_from_files(zip_file_name, colony_file_name, index_path):
+    """
+    Builds the index from the res_zip and res_colony outputs of a previous run, read as text so
+    codes keep their leading zeros whatever the format of the files.
+    """
+    zipcodes = read_text_table(os.path.abspath(zip_file_name))
+    colonies = read_text_table(os.path.abspath(colony_file_name))
+    build_index(zipcodes.to_dict('records'), colonies.to_dict('records'), index_path)
+
+
+def print_records(zip_code, records):
+    if not records:
+        print(f"Zip code {zip_code} not found.")
+        return
+    for record in records:
+        print(f"{record['name']}  {record['external_id']}  city: {record['city_external_id']}")
+        for colony in record['colonies']:
+            print(f"    {colony['code']}  {colony['name']}  {colony['external_id']}")
+
+
+if __name__ == "__main__":
+    usage = ("Usage:\n"
+             "  python zipcolony.py lookup <zip_code> [index]\n"
+             "  python zipcolony.py build [res_zip.ods] [res_colony.ods] [index]")
+    if len(sys.argv) < 2 or sys.argv[1] not in ('lookup', 'build'):
+        print(usage)
+        sys.exit(1)
+
+    if sys.argv[1] == 'lookup':
+        if len(sys.argv) < 3:
+            print(usage)
+            sys.exit(1)
+        index_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_INDEX
+        try:
+            connection = open_index(index_path)
+        except FileNotFoundError as e:
+            print(e)
+            sys.exit(1)
+        print_records(sys.argv[2], lookup(connection, sys.argv[2]))
+        connection.close()
+    else:
+        zip_file_name = sys.argv[2] if len(sys.argv) > 2 else "res_zip.ods"
+        colony_file_name = sys.argv[3] if len(sys.argv) > 3 else "res_colony.ods"
+        index_path = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_INDEX
+        build_from_files(zip_file_name, colony_file_name, index_path)
+        print(f"Index written to '{index_path}'.")
@@ -1,17 +1,23 @@
 
 import pandas as pd
+import logging
 import os
 import sys
 from pyexcel_ods3 import save_data
-import ezodf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.checkpoint import Checkpoint, checkpoint_directory  # noqa: E402
+from ods_utilities.planner import plan, pop_memory_budget  # noqa: E402
+from ods_utilities.readers import open_workbook  # noqa: E402
+from ods_utilities.writers import OUTPUT_EXTENSIONS, atomic_output, pop_format_option, write_table  # noqa: E402
 
 
 def read_file(file_name):
     """
     Reads an ODS file and returns its contents as a dictionary of DataFrames.
 
-    Processes each sheet in the ODS file, converting rows into DataFrames. Replaces `None`
-    values with empty strings to maintain data integrity. Handles file not found and read errors.
+    Processes each sheet in the ODS file, building typed columns from the cell value types. Empty
+    cells in text columns are read as empty strings. Handles file not found and read errors.
 
     Args:
         file_name (str): Name of the ODS file to read.
@@ -23,18 +29,7 @@ def read_file(file_name):
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            doc = ezodf.opendoc(file_path)
-            ods_data = {}
-            for sheet in doc.sheets:
-                sheet_name = sheet.name
-                data = []
-                for row in sheet.rows():
-                    row_data = []
-                    for cell in row:
-                        row_data.append(cell.value if cell.value is not None else '')  # Replacing None with empty string
-                    data.append(row_data)
-                ods_data[sheet_name] = pd.DataFrame(data[1:], columns=data[0])
-            return ods_data
+            return open_workbook(file_path, na_value='')  # Replacing None with empty string
         except Exception as e:
             print(f"Error reading ODS file '{file_name}': {e}")
             return None
@@ -47,18 +42,16 @@ def write_ods(data, output_path, sheet_name):
     """
     Writes a DataFrame to an ODS file, converting large numbers to strings to prevent precision loss.
 
-    Overwrites existing files without warning. Converts values over 1e+15 to strings to avoid
-    Excel/ODS precision limitations. Creates a single-sheet ODS file with the specified name.
+    Overwrites existing files without warning, atomically: the file is written under a temporary
+    name and renamed, so a crash never leaves a half-written ODS. Converts values over 1e+15 to
+    strings to avoid Excel/ODS precision limitations. Creates a single-sheet ODS file with the
+    specified name.
 
     Args:
         data (pd.DataFrame): Data to write to the file.
         output_path (str): Full path for the output ODS file.
         sheet_name (str): Name of the sheet to create in the ODS file.
     """
-    # Remove the existing file if it exists
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
     # Convert large numbers to strings
     def convert_large_numbers(value):
         if isinstance(value, (int, float)):
@@ -70,17 +63,56 @@ def write_ods(data, output_path, sheet_name):
                 return str(value)
         return value
 
-    # Apply the conversion function to the DataFrame
-    converted_df = data.applymap(convert_large_numbers)
+    # pyexcel only writes Python's own date and time types
+    def convert_timestamps(value):
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        if isinstance(value, pd.Timedelta):
+            return value.to_pytimedelta()
+        return value
+
+    # Apply the conversion functions to every value, typed columns use missing values instead of ''
+    rows = data.astype(object).where(data.notna(), '').values.tolist()
+    converted_rows = [[convert_large_numbers(convert_timestamps(value)) for value in row] for row in rows]
 
     # Convert data to a dictionary suitable for saving
-    sheet_data = {sheet_name: [list(converted_df.columns)] + converted_df.to_records(index=False).tolist()}
+    sheet_data = {sheet_name: [list(data.columns)] + converted_rows}
 
     # Save the data to an ODS file
-    save_data(output_path, sheet_data)
+    with atomic_output(output_path) as temp_path:
+        save_data(temp_path, sheet_data)
+
+
+def iter_parts(df, max_rows):
+    """
+    Slices a loaded sheet into parts of at most `max_rows` rows.
+    """
+    for start_row in range(0, df.shape[0], max_rows):
+        yield df.iloc[start_row:start_row + max_rows]
 
 
-def split_ods(file_name, max_rows=10000):
+def iter_streamed_parts(chunks, max_rows):
+    """
+    Re-slices streamed chunks into parts of `max_rows` rows, the same parts `iter_parts` cuts from
+    the loaded sheet whatever the size of the chunks the reader hands out.
+    """
+    pieces = []
+    size = 0
+    for chunk in chunks:
+        start = 0
+        while start < len(chunk):
+            piece = chunk.iloc[start:start + max_rows - size]
+            pieces.append(piece)
+            size += len(piece)
+            start += len(piece)
+            if size == max_rows:
+                yield pd.concat(pieces) if len(pieces) > 1 else piece
+                pieces, size = [], 0
+    if pieces:
+        yield pd.concat(pieces) if len(pieces) > 1 else pieces[0]
+
+
+def split_ods(file_name, max_rows=10000, output_format='ods', memory_budget=None, resume=False):
     """
     Splits an ODS file into multiple smaller ODS files based on row count.
 
@@ -88,9 +120,19 @@ def split_ods(file_name, max_rows=10000):
     are named with the original filename, sheet name, and a numerical suffix. Each output file
     contains up to `max_rows` rows of data (header row excluded from count).
 
+    Sheets are loaded whole when the file fits the memory budget (see `plan`), otherwise they are
+    streamed and each part is written as soon as its rows are read. Streamed parts infer their
+    column types on their own.
+
+    Finished parts and sheets are recorded in a checkpoint next to the input file (see
+    `Checkpoint`), with `resume` a run skips the parts and sheets a crashed run already wrote.
+
     Args:
         file_name (str): Path to the input ODS file.
         max_rows (int, optional): Maximum rows per output file. Defaults to 10000.
+        output_format (str, optional): 'ods', 'csv', 'parquet' or 'arrow'. Defaults to 'ods'.
+        memory_budget (int, optional): Memory budget in bytes, defaults to a fraction of the available memory.
+        resume (bool, optional): Skips the work recorded by the checkpoint of a previous run.
     """
     # Read the ODS file
     data_dict = read_file(file_name)
@@ -98,29 +140,57 @@ def split_ods(file_name, max_rows=10000):
         return
 
     base_filename, _ = os.path.splitext(file_name)
+    file_path = os.path.join(os.getcwd(), file_name)
+    streaming = plan('split_ods', [file_path], memory_budget).streaming
+    checkpoint = Checkpoint(checkpoint_directory(file_path), [file_path], {'max_rows': max_rows, 'output_format': output_format}, resume)
 
     # Iterate over each sheet in the dictionary
-    for sheet_name, df in data_dict.items():
-        num_rows = df.shape[0]
-        num_files = (num_rows // max_rows) + (1 if num_rows % max_rows != 0 else 0)
-
-        for i in range(num_files):
-            start_row = i * max_rows
-            end_row = start_row + max_rows
-            # Slice the DataFrame
-            slice_df = df.iloc[start_row:end_row]
+    for sheet_name in data_dict:
+        if checkpoint.done(sheet_name):
+            print(f"Skipping sheet {sheet_name}, already split")
+            continue
+        if streaming:
+            parts = iter_streamed_parts(data_dict.iter_chunks(sheet_name, max_rows), max_rows)
+        else:
+            parts = iter_parts(data_dict[sheet_name], max_rows)
+
+        written = []
+        for i, slice_df in enumerate(parts):
             # Create a new filename for each slice
-            output_filename = f"{base_filename}_{sheet_name}_{i + 1}.ods"
+            output_filename = f"{base_filename}_{sheet_name}_{i + 1}{OUTPUT_EXTENSIONS[output_format]}"
             output_path = os.path.join(os.getcwd(), output_filename)
+            written.append(output_path)
+            part = f"{sheet_name}/{i + 1}"
+            if checkpoint.done(part):
+                print(f"Skipping {output_filename}, already written")
+                continue
             # Write the slice to a new ODS file
-            write_ods(slice_df, output_path, sheet_name)
+            if output_format == 'ods':
+                write_ods(slice_df, output_path, sheet_name)
+            else:
+                write_table(slice_df, output_path, output_format)
+            checkpoint.complete(part, [output_path])
             print(f"Written {output_filename}")
+        checkpoint.complete(sheet_name, written)
+
+    checkpoint.finish()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python script.py <filename.ods>")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = sys.argv[1:]
+    try:
+        output_format = pop_format_option(args, 'ods')
+        memory_budget = pop_memory_budget(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    resume = '--resume' in args
+    if resume:
+        args.remove('--resume')
+    if len(args) < 1:
+        print("Usage: python script.py <filename.ods> [--format=ods|csv|csv.gz|csv.zst|parquet|arrow|xlsx] [--memory-budget 512MB] [--resume]")
         sys.exit(1)
 
-    file_name = sys.argv[1]
-    split_ods(file_name)
+    file_name = args[0]
+    split_ods(file_name, output_format=output_format, memory_budget=memory_budget, resume=resume)
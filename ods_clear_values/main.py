@@ -1,9 +1,24 @@
 
 import pandas as pd
-import ezodf
+import logging
+import numpy as np
 import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.cleaning import clean_columns  # noqa: E402
+from ods_utilities.compression import split_extension  # noqa: E402
+from ods_utilities.planner import plan, pop_memory_budget  # noqa: E402
+from ods_utilities.readers import open_workbook, validate_columns  # noqa: E402
+from ods_utilities.writers import TableWriter, pop_format_option, with_extension, write_table  # noqa: E402
+
+# Order in which the menu operations are applied, before the type conversion
+CLEANING_ORDER = ('strip_spaces', 'remove_quotes', 'collapse_whitespace', 'strip_accents', 'lower', 'handle_missing')
+CONVERSIONS = {'integer': 'to_integer', 'float': 'to_float'}
+# Types of the converted columns when streaming. The conversions pick the smallest type that holds
+# the values of each chunk, every chunk must have the type of the first one
+STREAM_DTYPES = {'integer': 'Int64', 'float': 'float64'}
+
 
 def clean_column(df, column, data_type, cleaning_ops):
     """
@@ -14,58 +29,30 @@ def clean_column(df, column, data_type, cleaning_ops):
         if not cleaning_ops:
             return df
 
-        # Strip leading and trailing spaces if requested
-        if 'strip_spaces' in cleaning_ops:
-            df[column] = df[column].astype(str).str.strip()
-
-        # Remove unwanted characters if requested
-        if 'remove_quotes' in cleaning_ops:
-            df[column] = df[column].str.replace("'", "", regex=False)  # Example of unwanted character removal
-
-        # Handle missing values if requested
-        if 'handle_missing' in cleaning_ops:
-            df[column] = df[column].replace('', pd.NA)  # Replace empty strings with NaN
-            df[column] = df[column].fillna('0')  # Replace NaN with '0'
+        operations = [operation for operation in CLEANING_ORDER if operation in cleaning_ops]
 
         # Convert to the specified data type
-        if data_type == 'integer':
-            df[column] = pd.to_numeric(df[column], errors='coerce', downcast='integer')  # Convert to integer
-        elif data_type == 'float':
-            df[column] = pd.to_numeric(df[column], errors='coerce', downcast='float')  # Convert to float
+        if data_type in CONVERSIONS:
+            operations.append(CONVERSIONS[data_type])
         else:
             print(f"Unsupported data type: {data_type}. Column '{column}' will remain as string.")
-            df[column] = df[column].astype(str)
+            operations.append('to_string')
+
+        df = clean_columns(df, {column: operations})
     return df
 
 
-def read_file(file_name):
+def read_file(file_name, dtypes=None):
     """
-    Reads an ODS file and returns its contents as a dictionary.
+    Reads an ODS (or Parquet/Arrow) file and returns its contents as a dictionary.
+
+    Cells keep their native ODS types (integer, float, date, string), `dtypes` can override
+    the type of specific columns.
     """
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            doc = ezodf.opendoc(file_path)
-            ods_data = {}
-            for sheet in doc.sheets:
-                sheet_name = sheet.name
-                data = []
-                for row in sheet.rows():
-                    row_data = []
-                    for cell in row:
-                        try:
-                            # Ensure cell values are treated as strings
-                            if isinstance(cell.value, (str, int, float)):
-                                cell_value = str(cell.value)
-                            else:
-                                cell_value = None  # Ignore non-string, non-numeric cells
-                            row_data.append(cell_value)
-                        except Exception as e:
-                            print(f"Error processing cell: {e}")
-                            row_data.append(None)  # Handle cell processing errors
-                    data.append(row_data)
-                ods_data[sheet_name] = pd.DataFrame(data[1:], columns=data[0])
-            return ods_data
+            return open_workbook(file_path, dtypes=dtypes)
         except Exception as e:
             print(f"Error reading ODS file '{file_name}': {e}")
             return None
@@ -74,60 +61,146 @@ def read_file(file_name):
         return None
 
 
-def save_to_csv(df, file_name):
+def output_file_name(file_name, output_format='csv'):
+    """
+    Returns the name of the cleaned file: the input name with the extension of `output_format`,
+    plus a `_cleaned` suffix when that is the input itself, so the input is never overwritten.
     """
-    Save the DataFrame to a CSV file.
+    output_name = with_extension(file_name, output_format)
+    if os.path.realpath(output_name) == os.path.realpath(file_name):
+        output_name = '_cleaned'.join(split_extension(output_name))
+    return output_name
+
+
+def save_to_csv(df, file_name, output_format='csv'):
     """
-    output_filename = f"{file_name.replace('.ods', '.csv')}"
+    Save the DataFrame to a CSV file (gzip or zstd compressed with `csv.gz` or `csv.zst`), or to
+    Parquet/Arrow IPC when `output_format` asks for it.
+    """
+    output_filename = output_file_name(file_name, output_format)
     output_path = os.path.join(os.getcwd(), output_filename)
 
     # Save DataFrame to CSV
-    df.to_csv(output_path, index=False)
+    write_table(df, output_path, output_format)
     print(f"Cleaned file saved as {output_filename}")
 
 
-def process_file(file_name, column, data_type, cleaning_ops):
+def drop_seen_duplicates(df, seen):
+    """
+    Drops the rows of a chunk that are repeated within it or were already in a previous chunk.
+
+    Rows are compared by their 64-bit hash, `seen` is the sorted array of the hashes kept so far.
+
+    Returns:
+        tuple: The chunk without duplicates and the updated `seen` array.
     """
-    Process the ODS file to clean and convert the specified column's values.
+    hashes = pd.util.hash_pandas_object(df, index=False).values
+    keep = ~pd.Series(hashes).duplicated().values & ~np.isin(hashes, seen)
+    return df[keep].copy(), np.union1d(seen, hashes[keep])
+
+
+def widen_column(df, column, data_type):
+    """
+    Casts a converted column to the type of `STREAM_DTYPES`, see `stream_sheet`.
+    """
+    if column in df.columns and data_type in STREAM_DTYPES:
+        try:
+            df[column] = df[column].astype(STREAM_DTYPES[data_type])
+        except TypeError:
+            raise ValueError(f"Column '{column}' has decimal values, clean it as float.")
+    return df
+
+
+def stream_sheet(data_dict, sheet_name, file_name, column, data_type, cleaning_ops, output_format='csv', chunk_size=100000):
+    """
+    Cleans a sheet chunk by chunk and appends each cleaned chunk to the output, see `process_file`.
+    """
+    output_filename = output_file_name(file_name, output_format)
+    seen = np.empty(0, dtype=np.uint64)
+    with TableWriter(os.path.join(os.getcwd(), output_filename), output_format) as writer:
+        for df in data_dict.iter_chunks(sheet_name, chunk_size):
+            df, seen = drop_seen_duplicates(df, seen)
+            for column_name in column.split(','):
+                df = clean_column(df, column_name.strip(), data_type, cleaning_ops)
+                if cleaning_ops:
+                    df = widen_column(df, column_name.strip(), data_type)
+            writer.write(df)
+    print(f"Cleaned file saved as {output_filename}")
+
+
+def process_file(file_name, column, data_type, cleaning_ops, output_format='csv', memory_budget=None):
+    """
+    Process the ODS file to clean and convert the specified columns' values.
+
+    Sheets are loaded whole when the file fits the memory budget (see `plan`), otherwise they are
+    cleaned and written chunk by chunk, dropping duplicated rows across chunks by their hash.
     """
     data_dict = read_file(file_name)
     if data_dict is None:
         return
 
-    for sheet_name, df in data_dict.items():
+    streaming = plan('process_file', [os.path.join(os.getcwd(), file_name)], memory_budget).streaming
+    for sheet_name in data_dict:
+        if streaming:
+            try:
+                stream_sheet(data_dict, sheet_name, file_name, column, data_type, cleaning_ops, output_format)
+            except Exception as e:
+                print(f"An error occurred while processing sheet '{sheet_name}': {e}")
+            continue
+
+        df = data_dict[sheet_name]
         try:
             # Remove duplicates
             df = df.drop_duplicates()
 
-            # Clean and convert the specified column
-            df = clean_column(df, column, data_type, cleaning_ops)
+            # Clean and convert the specified columns (comma-separated)
+            for column_name in column.split(','):
+                df = clean_column(df, column_name.strip(), data_type, cleaning_ops)
 
             # Save the cleaned DataFrame to CSV
-            save_to_csv(df, file_name)
+            save_to_csv(df, file_name, output_format)
         except Exception as e:
             print(f"An error occurred while processing sheet '{sheet_name}': {e}")
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python script.py <filename.ods>")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = sys.argv[1:]
+    try:
+        output_format = pop_format_option(args, 'csv')
+        memory_budget = pop_memory_budget(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    if len(args) < 1:
+        print("Usage: python script.py <filename.ods> [--format=csv|csv.gz|csv.zst|parquet|arrow|xlsx] [--memory-budget 512MB]")
         sys.exit(1)
 
-    file_name = sys.argv[1]
+    file_name = args[0]
 
     # Get column name and data type
-    column_name = input("Enter the column name to clean: ")
+    column_name = input("Enter the column name(s) to clean (comma-separated): ")
     data_type = input("Enter the data type (integer/float): ").lower()
 
     if data_type not in ['integer', 'float']:
         print(f"Unsupported data type: {data_type}. Use 'integer' or 'float'.")
         sys.exit(1)
 
+    # Check the column names on the header before parsing the whole file
+    try:
+        validate_columns(os.path.join(os.getcwd(), file_name), [name.strip() for name in column_name.split(',')])
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
     # Ask user for cleaning operations
     print("Select cleaning operations (comma-separated):")
     print("1. Strip leading/trailing spaces")
     print("2. Remove unwanted characters (e.g., single quotes)")
     print("3. Handle missing values (replace with '0')")
+    print("4. Collapse repeated whitespace")
+    print("5. Strip accents")
+    print("6. Lowercase")
     ops_input = input("Enter your choices (e.g., 1,2,3) or press Enter to skip: ").strip()
 
     cleaning_ops = set()
@@ -137,8 +210,14 @@ def main():
         cleaning_ops.add('remove_quotes')
     if '3' in ops_input:
         cleaning_ops.add('handle_missing')
-
-    process_file(file_name, column_name, data_type, cleaning_ops)
+    if '4' in ops_input:
+        cleaning_ops.add('collapse_whitespace')
+    if '5' in ops_input:
+        cleaning_ops.add('strip_accents')
+    if '6' in ops_input:
+        cleaning_ops.add('lower')
+
+    process_file(file_name, column_name, data_type, cleaning_ops, output_format, memory_budget)
 
 
 if __name__ == "__main__":
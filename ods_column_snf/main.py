@@ -1,9 +1,11 @@
 import re
-import pandas as pd
-import ezodf
 import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.readers import open_workbook, validate_columns  # noqa: E402
+from ods_utilities.writers import OUTPUT_EXTENSIONS, pop_format_option, write_table  # noqa: E402
+
 
 def read_file(file_name):
     """
@@ -12,18 +14,7 @@ def read_file(file_name):
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            doc = ezodf.opendoc(file_path)
-            ods_data = {}
-            for sheet in doc.sheets:
-                sheet_name = sheet.name
-                data = []
-                for row in sheet.rows():
-                    row_data = []
-                    for cell in row:
-                        row_data.append(cell.value)
-                    data.append(row_data)
-                ods_data[sheet_name] = pd.DataFrame(data[1:], columns=data[0])
-            return ods_data
+            return open_workbook(file_path)
         except Exception as e:
             print(f"Error reading ODS file '{file_name}': {e}")
             return None
@@ -32,20 +23,27 @@ def read_file(file_name):
         return None
 
 
-def process_ods(file_name, search_column, target_column, output_column, value_taken_column):
+def process_ods(file_name, search_column, target_column, output_column, value_taken_column, output_format='ods', chain=False):
     """
     Procesa el archivo ODS, busca el valor en la columna de búsqueda en toda la tabla,
     y cuando lo encuentra, escribe el valor de la columna objetivo en la columna de salida.
+    Con `chain` sigue la cadena completa de referencias, ver `resolve_chains`.
     """
     data_dict = read_file(file_name)
     if data_dict is None:
         return
 
     for sheet_name, df in data_dict.items():
-        df = search_and_write(df, search_column, target_column, output_column, value_taken_column)
-        output_filename = f"{file_name}_processed_{sheet_name}.ods"
+        if chain:
+            df = resolve_chains(df, search_column, target_column, output_column, value_taken_column)
+        else:
+            df = search_and_write(df, search_column, target_column, output_column, value_taken_column)
+        output_filename = f"{file_name}_processed_{sheet_name}{OUTPUT_EXTENSIONS[output_format]}"
         output_path = os.path.join(os.getcwd(), output_filename)
-        df.to_excel(output_path, index=False)
+        if output_format == 'ods':
+            df.to_excel(output_path, index=False)
+        else:
+            write_table(df, output_path, output_format)
         print(f"Written {output_filename}")
 
 
@@ -68,18 +66,107 @@ def search_and_write(df, search_column, target_column, output_column, value_take
     return df
 
 
+def resolve_chains(df, search_column, target_column, output_column, value_taken_column, separator=' > '):
+    """
+    Sigue la cadena de referencias de cada fila hasta su raíz, por ejemplo cuenta -> cuenta padre
+    en un catálogo de cuentas contables.
+
+    El padre de una fila es la primera fila cuyo `target_column` es igual a su `search_column`
+    (la misma regla que `search_and_write`). Cada fila se resuelve una sola vez: el resultado de
+    un ancestro se reutiliza para todos sus descendientes, así que la tabla completa se resuelve
+    en tiempo lineal.
+
+    Escribe tres columnas:
+        - `output_column`: valor de `value_taken_column` de la raíz de la cadena.
+        - `<output_column>_depth`: número de saltos hasta la raíz (0 si la fila no tiene padre),
+          -1 si la cadena entra en un ciclo.
+        - `<output_column>_path`: valores de `target_column` desde la raíz hasta la fila.
+    """
+    keys = df[target_column].tolist()
+    references = df[search_column].tolist()
+    taken = df[value_taken_column].tolist()
+
+    # Índice construido una sola vez: valor de target_column -> primera fila que lo tiene
+    index = {}
+    for position, key in enumerate(keys):
+        if key is not None and key == key and key not in index:
+            index[key] = position
+    parents = [index.get(reference) if reference is not None and reference == reference else None for reference in references]
+
+    size = len(keys)
+    roots = [None] * size
+    depths = [None] * size
+    paths = [None] * size
+    in_progress = [False] * size
+
+    for start in range(size):
+        # Sube por la cadena hasta una fila ya resuelta, una raíz o un ciclo
+        stack = []
+        position = start
+        while position is not None and depths[position] is None and not in_progress[position]:
+            in_progress[position] = True
+            stack.append(position)
+            position = parents[position]
+
+        if position is not None and depths[position] is None:
+            # position está en la pila actual: ciclo. Las filas del ciclo y las que llevan a él no tienen raíz
+            for row in stack:
+                roots[row], depths[row], paths[row] = None, -1, None
+                in_progress[row] = False
+            continue
+
+        # Resuelve de la raíz hacia abajo reutilizando el resultado del ancestro
+        while stack:
+            row = stack.pop()
+            in_progress[row] = False
+            parent = parents[row]
+            if parent is None:
+                roots[row], depths[row], paths[row] = taken[row], 0, str(keys[row])
+            elif depths[parent] == -1:
+                roots[row], depths[row], paths[row] = None, -1, None
+            else:
+                roots[row] = roots[parent]
+                depths[row] = depths[parent] + 1
+                paths[row] = f"{paths[parent]}{separator}{keys[row]}"
+
+    cycles = depths.count(-1)
+    if cycles:
+        print(f"{cycles} rows reference a cycle, their {output_column} is left empty.")
+
+    df[output_column] = roots
+    df[f"{output_column}_depth"] = depths
+    df[f"{output_column}_path"] = paths
+    return df
+
+
 def main():
-    if len(sys.argv) < 5:
-        print("Usage: python script.py <filename.ods> <search_column> <target_column> <output_column> <value_taken_column>")
+    args = sys.argv[1:]
+    try:
+        output_format = pop_format_option(args, 'ods')
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    chain = '--chain' in args
+    if chain:
+        args.remove('--chain')
+    if len(args) < 5:
+        print("Usage: python script.py <filename.ods> <search_column> <target_column> <output_column> <value_taken_column> [--chain] [--format=ods|csv|csv.gz|csv.zst|parquet|arrow|xlsx]")
         sys.exit(1)
 
-    file_name = sys.argv[1]
-    search_column = sys.argv[2]
-    target_column = sys.argv[3]
-    output_column = sys.argv[4]
-    value_taken_column = sys.argv[5]
+    file_name = args[0]
+    search_column = args[1]
+    target_column = args[2]
+    output_column = args[3]
+    value_taken_column = args[4]
+
+    # Check the column names on the header before parsing the whole file
+    try:
+        validate_columns(os.path.join(os.getcwd(), file_name), [search_column, target_column, value_taken_column])
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
 
-    process_ods(file_name, search_column, target_column, output_column, value_taken_column)
+    process_ods(file_name, search_column, target_column, output_column, value_taken_column, output_format, chain)
 
 
 if __name__ == "__main__":
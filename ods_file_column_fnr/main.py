@@ -1,17 +1,27 @@
 
+import logging
 import os
 import sys
+import time
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.joins import align, build_lookup, column_list, fill_targets, mapping_columns, partitioned_map  # noqa: E402
+from ods_utilities.planner import plan, pop_memory_budget  # noqa: E402
+from ods_utilities.compression import CSV_EXTENSIONS  # noqa: E402
+from ods_utilities.readers import open_workbook, read_csv, validate_columns  # noqa: E402
+from ods_utilities.replacing import ReplaceAutomaton, load_pairs, replace_columns  # noqa: E402
+from ods_utilities.writers import TableWriter, pop_format_option, result_path, write_table  # noqa: E402
 
-def read_file(file_name):
+
+def read_file(file_name, usecols=None):
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            if file_name.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_name.endswith('.ods'):
-                df = pd.read_excel(file_path, engine='odf')
+            if file_name.endswith(CSV_EXTENSIONS):
+                df = read_csv(file_path, usecols=usecols)
+            elif file_name.endswith(('.ods', '.parquet', '.arrow')):
+                df = open_workbook(file_path, usecols=usecols).first()
             else:
                 print(f"Unsupported file format for '{file_name}'.")
                 return None
@@ -38,18 +48,157 @@ def clean_int_values(value):
         return value
 
 
+def load_lookup(input_df, search_columns, taken_columns):
+    """
+    Cleans the integer-like values of the lookup columns and indexes the lookup rows by their
+    (possibly composite) key, see `build_lookup`.
+    """
+    for column in search_columns + taken_columns:
+        input_df[column] = input_df[column].apply(clean_int_values)
+    return build_lookup(input_df.dropna(subset=search_columns + taken_columns), search_columns, taken_columns)
+
+
+def apply_lookup(lookup, output_df, key_columns, taken_columns, target_columns):
+    """
+    Cleans the integer-like values of the key and target columns and fills every target column
+    from a single alignment of the output keys.
+    """
+    for column in dict.fromkeys(key_columns + target_columns):
+        if column in output_df.columns:
+            output_df[column] = output_df[column].apply(clean_int_values)
+    fill_targets(output_df, align(lookup, output_df, key_columns), taken_columns, target_columns)
+    return output_df
+
+
+def restore_integers(output_df, target_columns):
+    """
+    Checks and fixes integer conversion issues: float target columns holding only whole numbers
+    are converted to nullable integers.
+    """
+    for target_column in target_columns:
+        if output_df[target_column].dtype == 'float64':
+            print(f"Column '{target_column}' is of float type. Checking for integer conversion.")
+            try:
+                if output_df[target_column].dropna().apply(lambda x: x.is_integer() if pd.notna(x) else False).all():
+                    output_df[target_column] = output_df[target_column].astype('Int64')  # Convert to nullable integer type
+                    print(f"Successfully converted '{target_column}' to nullable integer type.")
+                else:
+                    print(f"Column '{target_column}' contains non-integer values or NaNs. Values remain as floats.")
+            except Exception as e:
+                print(f"Error converting '{target_column}' to integer type: {e}")
+    return output_df
+
+
+def replace_substrings(pairs_file_name, output_file_name, find_column, replace_column, text_columns,
+                       output_format='csv', memory_budget=None, chunk_size=100000):
+    """
+    Rewrites the text columns of the output file with the find/replace pairs of the input file.
+
+    Unlike the mapping, which replaces whole cell values, every occurrence of a text to find
+    inside a cell is replaced. The pairs are compiled once into a `ReplaceAutomaton`, and each
+    distinct cell is rewritten in a single scan with leftmost-longest matches, whatever the number
+    of pairs. Files that don't fit the memory budget are rewritten chunk by chunk, to the same
+    file (see `result_path`).
+    """
+    try:
+        validate_columns(os.path.join(os.getcwd(), pairs_file_name), [find_column, replace_column])
+        validate_columns(os.path.join(os.getcwd(), output_file_name), text_columns)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    pairs_df = read_file(pairs_file_name, usecols=[find_column, replace_column])
+    if pairs_df is None:
+        return
+    start = time.perf_counter()
+    automaton = ReplaceAutomaton(load_pairs(pairs_df, find_column, replace_column))
+    print(f"Compiled {automaton.size} replacements from {find_column} to {replace_column} in {time.perf_counter() - start:.2f}s.")
+
+    # Both paths write to the same file, `TableWriter` only replaces it once the chunks are written
+    output_path = result_path(output_file_name, output_format, pairs_file_name, '_replaced')
+    if plan('replace_substrings', [os.path.join(os.getcwd(), output_file_name)], memory_budget).streaming:
+        try:
+            workbook = open_workbook(os.path.join(os.getcwd(), output_file_name))
+            with TableWriter(output_path, output_format) as writer:
+                for chunk in workbook.iter_chunks(workbook.sheet_names[0], chunk_size):
+                    writer.write(replace_columns(chunk, automaton, text_columns))
+            print(f"Written {output_path}")
+        except Exception as e:
+            print(f"Error replacing in {', '.join(text_columns)}: {e}")
+        return
+
+    output_df = read_file(output_file_name)
+    if output_df is None:
+        return
+    print(f"Replacing substrings in {', '.join(text_columns)}.")
+    replace_columns(output_df, automaton, text_columns)
+    try:
+        write_table(output_df, output_path, output_format)
+        print(f"Written {output_path}")
+    except Exception as e:
+        print(f"Error writing file '{output_path}': {e}")
+
+
 def main():
-    if len(sys.argv) < 6:
-        print("Usage: python script.py <input_file.ods/csv> <output_file.csv> <search_column> <taken_column> <target_column>")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = sys.argv[1:]
+    key_columns = None
+    # --substrings replaces the texts to find inside the target cells instead of whole values
+    substrings = '--substrings' in args
+    if substrings:
+        args.remove('--substrings')
+    try:
+        output_format = pop_format_option(args, 'csv')
+        memory_budget = pop_memory_budget(args)
+        if '--on' in args:
+            index = args.index('--on')
+            key_columns = args[index + 1]
+            del args[index:index + 2]
+    except (ValueError, IndexError) as e:
+        print(e)
+        sys.exit(1)
+    if len(args) < 5:
+        print("Usage: python script.py <input_file.ods/csv> <output_file.csv> <search_column[,...]> <taken_column[,...]> <target_column[,...]> "
+              "[--on key_column[,...]] [--format=csv|csv.gz|csv.zst|parquet|arrow|xlsx] [--memory-budget 512MB]")
+        print("       python script.py <pairs_file.ods/csv> <output_file.csv> <find_column> <replace_column> <text_column[,...]> "
+              "--substrings [--format=csv|csv.gz|csv.zst|parquet|arrow|xlsx] [--memory-budget 512MB]")
         sys.exit(1)
 
-    input_file_name = sys.argv[1]
-    output_file_name = sys.argv[2]
-    search_column = sys.argv[3]
-    taken_column = sys.argv[4]
-    target_column = sys.argv[5]
+    input_file_name = args[0]
+    output_file_name = args[1]
+    if substrings:
+        replace_substrings(input_file_name, output_file_name, args[2], args[3], column_list(args[4]), output_format, memory_budget)
+        return
+    try:
+        search_columns, taken_columns, target_columns, key_columns = mapping_columns(args[2], args[3], args[4], key_columns)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
 
-    input_df = read_file(input_file_name)
+    # Check the column names on the headers before parsing or partitioning the files
+    try:
+        validate_columns(os.path.join(os.getcwd(), input_file_name), search_columns + taken_columns)
+        validate_columns(os.path.join(os.getcwd(), output_file_name), key_columns)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    # Join in memory when both files fit the budget (a fraction of the available memory by default)
+    mapping_plan = plan('process_mapping', [(os.path.join(os.getcwd(), input_file_name), search_columns + taken_columns),
+                                            os.path.join(os.getcwd(), output_file_name)], memory_budget)
+    if mapping_plan.streaming:
+        # Out-of-core join: both files are hash-partitioned to disk and the output is streamed, the
+        # result replaces the output file once complete, as the in-memory join does
+        output_path = result_path(output_file_name, output_format, input_file_name, '_mapped')
+        try:
+            rows = partitioned_map(input_file_name, output_file_name, output_path, search_columns, taken_columns, target_columns,
+                                   output_format, mapping_plan.budget, clean=clean_int_values, dropna=True, key_cols=key_columns)
+            print(f"Written {rows} rows to {output_path}")
+        except Exception as e:
+            print(f"Error mapping {', '.join(target_columns)}: {e}")
+        return
+
+    input_df = read_file(input_file_name, usecols=search_columns + taken_columns)
     if input_df is None:
         return
 
@@ -57,46 +206,31 @@ def main():
     if output_df is None:
         return
 
-    # Create a mapping from search_column to taken_column
-    print("Creating mapping from search_column to taken_column.")
+    # Index the lookup rows once by their (possibly composite) key
+    print(f"Creating mapping from {', '.join(search_columns)} to {', '.join(taken_columns)}.")
     try:
-        # Clean integer-like values in the columns
-        input_df[search_column] = input_df[search_column].apply(clean_int_values)
-        input_df[taken_column] = input_df[taken_column].apply(clean_int_values)
-
-        mapping = input_df[[search_column, taken_column]].dropna().drop_duplicates().set_index(search_column)[taken_column].to_dict()
+        lookup = load_lookup(input_df, search_columns, taken_columns)
     except Exception as e:
         print(f"Error creating mapping: {e}")
         return
 
-    # Update the target_column in output_df based on the mapping
-    print(f"Updating '{target_column}' in output_df based on the mapping.")
+    # Fill every target column from a single alignment of the output keys
+    print(f"Updating {', '.join(target_columns)} in output_df based on the mapping.")
     try:
-        # Clean integer-like values in the target column
-        output_df[target_column] = output_df[target_column].apply(clean_int_values)
-        output_df[target_column] = output_df[target_column].map(mapping).fillna(output_df[target_column])
+        apply_lookup(lookup, output_df, key_columns, taken_columns, target_columns)
     except Exception as e:
-        print(f"Error updating '{target_column}' column: {e}")
+        print(f"Error updating {', '.join(target_columns)}: {e}")
         return
 
-    # Check and fix integer conversion issues
-    if output_df[target_column].dtype == 'float64':
-        print(f"Column '{target_column}' is of float type. Checking for integer conversion.")
-        try:
-            if output_df[target_column].dropna().apply(lambda x: x.is_integer() if pd.notna(x) else False).all():
-                output_df[target_column] = output_df[target_column].astype('Int64')  # Convert to nullable integer type
-                print(f"Successfully converted '{target_column}' to nullable integer type.")
-            else:
-                print(f"Column '{target_column}' contains non-integer values or NaNs. Values remain as floats.")
-        except Exception as e:
-            print(f"Error converting '{target_column}' to integer type: {e}")
+    restore_integers(output_df, target_columns)
 
-    # Write the processed data to the output file
+    # Write the processed data to the output file, other formats are written next to it
+    output_path = result_path(output_file_name, output_format, input_file_name, '_mapped')
     try:
-        output_df.to_csv(output_file_name, index=False)
-        print(f"Written {output_file_name}")
+        write_table(output_df, output_path, output_format)
+        print(f"Written {output_path}")
     except Exception as e:
-        print(f"Error writing file '{output_file_name}': {e}")
+        print(f"Error writing file '{output_path}': {e}")
 
 
 if __name__ == "__main__":
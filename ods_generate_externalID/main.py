@@ -5,10 +5,15 @@ import ezodf
 import os
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.compression import CSV_EXTENSIONS  # noqa: E402
+from ods_utilities.readers import open_workbook, validate_columns  # noqa: E402
+from ods_utilities.writers import OUTPUT_EXTENSIONS, pop_format_option, write_table  # noqa: E402
+
 
 def read_file(file_name):
     """
-    Reads an ODS or CSV file and returns its contents as a dictionary.
+    Reads an ODS, CSV, Parquet or Arrow file and returns its contents as a dictionary.
     """
     file_path = os.path.join(os.getcwd(), file_name)
     if not os.path.exists(file_path):
@@ -16,24 +21,10 @@ def read_file(file_name):
         return None
 
     try:
-        if file_name.endswith('.ods'):
-            doc = ezodf.opendoc(file_path)
-            ods_data = {}
-            for sheet in doc.sheets:
-                sheet_name = sheet.name
-                data = []
-                for row in sheet.rows():
-                    row_data = []
-                    for cell in row:
-                        row_data.append(cell.value)
-                    data.append(row_data)
-                ods_data[sheet_name] = pd.DataFrame(data[1:], columns=data[0])
-            return ods_data
-        elif file_name.endswith('.csv'):
-            df = pd.read_csv(file_path)
-            return {"Sheet1": df}
+        if file_name.endswith(('.ods', '.parquet', '.arrow') + CSV_EXTENSIONS):
+            return open_workbook(file_path)
         else:
-            print(f"Unsupported file type for '{file_name}'. Only ODS and CSV files are supported.")
+            print(f"Unsupported file type for '{file_name}'. Only ODS, CSV, Parquet and Arrow files are supported.")
             return None
     except Exception as e:
         print(f"Error reading file '{file_name}': {e}")
@@ -51,7 +42,7 @@ def clean_values(value):
     return value
 
 
-def process_file(file_name, column_names, prefix=None, suffix=None):
+def process_file(file_name, column_names, prefix=None, suffix=None, output_format='ods'):
     """
     Procesa el archivo ODS o CSV, selecciona las columnas indicadas y genera la columna "external_id".
     """
@@ -61,9 +52,12 @@ def process_file(file_name, column_names, prefix=None, suffix=None):
 
     for sheet_name, df in data_dict.items():
         df = generate_external_id(df, column_names, prefix, suffix)
-        output_filename = f"{file_name}_processed_{sheet_name}.ods"
+        output_filename = f"{file_name}_processed_{sheet_name}{OUTPUT_EXTENSIONS[output_format]}"
         output_path = os.path.join(os.getcwd(), output_filename)
-        df_to_ods(df, output_path, sheet_name)
+        if output_format == 'ods':
+            df_to_ods(df, output_path, sheet_name)
+        else:
+            write_table(df, output_path, output_format)
         print(f"Written {output_filename}")
 
 
@@ -96,7 +90,7 @@ def df_to_ods(df, file_path, sheet_name='Sheet1'):
 
     # Asegurar que las columnas que deben ser enteros se mantengan como enteros
     for column in df.columns:
-        if pd.api.types.is_integer_dtype(df[column]):
+        if pd.api.types.is_integer_dtype(df[column]) and not df[column].hasnans:
             df[column] = df[column].astype(int)  # Convertir a int explícitamente
 
     for i, col in enumerate(df.columns):
@@ -104,11 +98,11 @@ def df_to_ods(df, file_path, sheet_name='Sheet1'):
 
     for i, row in enumerate(df.itertuples(index=False, name=None), start=1):
         for j, value in enumerate(row):
-            if value is None:
+            if value is None or pd.isna(value):
                 ods_sheet[i, j].set_value("")  # Reemplaza None con una cadena vacía
-            elif isinstance(value, int):
-                ods_sheet[i, j].set_value(value)  # Escribe el valor como entero
-            elif isinstance(value, float) and value.is_integer():
+            elif pd.api.types.is_integer(value):
+                ods_sheet[i, j].set_value(int(value))  # Escribe el valor como entero
+            elif pd.api.types.is_float(value) and float(value).is_integer():
                 ods_sheet[i, j].set_value(int(value))  # Convierte flotantes que son enteros a int
             else:
                 ods_sheet[i, j].set_value(value)  # Mantén el valor original para otros tipos
@@ -117,12 +111,18 @@ def df_to_ods(df, file_path, sheet_name='Sheet1'):
 
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: python script.py <filename.ods/csv> <column1> [<column2> ...] [prefix] [suffix]")
+    args = sys.argv[1:]
+    try:
+        output_format = pop_format_option(args, 'ods')
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    if len(args) < 2:
+        print("Usage: python script.py <filename.ods/csv> <column1> [<column2> ...] [prefix] [suffix] [--format=ods|csv|csv.gz|csv.zst|parquet|arrow|xlsx]")
         sys.exit(1)
 
-    file_name = sys.argv[1]
-    column_names = sys.argv[2:]
+    file_name = args[0]
+    column_names = args[1:]
     prefix = None
     suffix = None
 
@@ -134,7 +134,14 @@ def main():
             suffix = arg[3:]
             column_names.remove(arg)
 
-    process_file(file_name, column_names, prefix, suffix)
+    # Check the column names on the header before parsing the whole file
+    try:
+        validate_columns(os.path.join(os.getcwd(), file_name), column_names)
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    process_file(file_name, column_names, prefix, suffix, output_format)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,27 @@
 
+import logging
 import os
 import sys
+
+import numpy as np
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.compression import CSV_EXTENSIONS  # noqa: E402
+from ods_utilities.readers import encode_categoricals, open_workbook, read_csv, validate_columns  # noqa: E402
+from ods_utilities.planner import plan, pop_memory_budget  # noqa: E402
+from ods_utilities.writers import TableWriter, pop_format_option, with_extension, write_table  # noqa: E402
+
 
-def read_file(file_name):
+def read_file(file_name, usecols=None, categories=None):
     file_path = os.path.join(os.getcwd(), file_name)
     if os.path.exists(file_path):
         try:
-            if file_name.endswith('.csv'):
-                return pd.read_csv(file_path)
-            elif file_name.endswith('.ods'):
-                return pd.read_excel(file_path, engine='odf')
+            if file_name.endswith(CSV_EXTENSIONS):
+                df = read_csv(file_path, usecols=usecols)
+                return encode_categoricals(df, categories) if categories else df
+            elif file_name.endswith(('.ods', '.parquet', '.arrow')):
+                return open_workbook(file_path, usecols=usecols, categories=categories).first()
             else:
                 print(f"Unsupported file format for '{file_name}'.")
                 return None
@@ -40,60 +50,229 @@ def crear_mapeo_categorias(categorias_df):
     return uom_to_category
 
 
-def validar_unidades_medida(productos_df, uom_to_category, col_unidad_compra, col_unidad_normal):
+def crear_tabla_unidades(categorias_df):
+    """
+    Crea la tabla de unidades de medida, una fila por uom_external_id con su categoría y, si el
+    archivo las trae, las columnas `uom_type` y `factor` de Odoo.
+
+    Args:
+        categorias_df (pd.DataFrame): DataFrame con las categorías y sus unidades de medida.
+
+    Returns:
+        pd.DataFrame: Tabla indexada por uom_external_id con las columnas `categoria` y, si existen,
+        `uom_type` y `factor`.
+    """
+    columnas = [columna for columna in ('uom_type', 'factor') if columna in categorias_df.columns]
+    unidades = categorias_df[['uom_external_id'] + columnas].copy()
+    unidades['categoria'] = categorias_df['id'].ffill()  # Rellenar las categorías en las filas vacías
+    unidades = unidades.dropna(subset=['uom_external_id']).drop_duplicates(subset='uom_external_id', keep='last')
+    if 'uom_type' in unidades.columns:
+        unidades['uom_type'] = unidades['uom_type'].astype(object).where(unidades['uom_type'].notna(), None)
+        unidades['uom_type'] = unidades['uom_type'].map(lambda tipo: str(tipo).strip().lower() if tipo is not None else tipo)
+    if 'factor' in unidades.columns:
+        unidades['factor'] = pd.to_numeric(unidades['factor'], errors='coerce')
+    return unidades.set_index('uom_external_id')
+
+
+UOM_TYPES = ('reference', 'bigger', 'smaller')
+
+# Reglas por unidad: cada una recibe la tabla de unidades y devuelve True en las unidades que
+# fallan. Solo se aplican si el archivo de categorías trae las columnas que usan. Odoo guarda en
+# `factor` cuántas unidades caben en la de referencia: 1 en la referencia, menos de 1 en las mayores
+# y más de 1 en las menores.
+REGLAS_UNIDAD = {
+    'tipo_invalido': (('uom_type',), lambda u: ~u['uom_type'].isin(UOM_TYPES)),
+    'factor_referencia': (('uom_type', 'factor'), lambda u: (u['uom_type'] == 'reference') & (u['factor'] != 1)),
+    'factor_mayor': (('uom_type', 'factor'), lambda u: (u['uom_type'] == 'bigger') & ~(u['factor'] < 1)),
+    'factor_menor': (('uom_type', 'factor'), lambda u: (u['uom_type'] == 'smaller') & ~(u['factor'] > 1)),
+}
+
+# Reglas por categoría: reciben la tabla de unidades y devuelven True por categoría que falla
+REGLAS_CATEGORIA = {
+    'sin_referencia_unica': (('uom_type',), lambda u: (u['uom_type'] == 'reference').groupby(u['categoria']).sum() != 1),
+}
+
+
+def evaluar_unidades(unidades):
+    """
+    Evalúa las reglas por unidad y por categoría sobre la tabla de unidades (unas cuantas filas).
+
+    Returns:
+        pd.DataFrame: Una columna booleana por regla aplicable, True en las unidades que fallan.
+        Las reglas por categoría se asignan a todas las unidades de la categoría que falla.
+    """
+    fallas = pd.DataFrame(index=unidades.index)
+    for nombre, (columnas, regla) in REGLAS_UNIDAD.items():
+        if all(columna in unidades.columns for columna in columnas):
+            fallas[nombre] = regla(unidades).fillna(True).astype(bool)
+    for nombre, (columnas, regla) in REGLAS_CATEGORIA.items():
+        if all(columna in unidades.columns for columna in columnas):
+            fallas_categoria = regla(unidades)
+            fallas[nombre] = unidades['categoria'].map(fallas_categoria).fillna(False).astype(bool)
+    return fallas
+
+
+def validar_unidades_medida(productos_df, uom_to_category, col_unidad_compra, col_unidad_normal, unidades=None):
     """
     Valida que las unidades de medida de compra y normales de cada producto pertenezcan a la misma categoría.
 
+    Con la tabla `unidades` (ver `crear_tabla_unidades`) también aplica las reglas de `REGLAS_UNIDAD`
+    y `REGLAS_CATEGORIA` a las dos unidades de cada producto. Las reglas se compilan a operaciones
+    sobre columnas: se evalúan una vez por unidad y se llevan a los productos con un mapeo sobre los
+    códigos de las columnas categóricas, en una sola pasada por el archivo de productos.
+
     Args:
         productos_df (pd.DataFrame): DataFrame con los productos.
         uom_to_category (dict): Diccionario que mapea cada uom_external_id a su categoría.
         col_unidad_compra (str): Columna de la unidad de medida de compra.
         col_unidad_normal (str): Columna de la unidad de medida normal.
+        unidades (pd.DataFrame, optional): Tabla de unidades para las reglas de factor y tipo.
 
     Returns:
-        pd.DataFrame: DataFrame con la columna de validación.
+        pd.DataFrame: DataFrame con la columna de validación (1 si ambas unidades son de la misma
+        categoría) y, con `unidades`, la columna `reglas_fallidas` con las reglas que falla cada producto.
     """
-    def validar_fila(row):
-        categoria_compra = uom_to_category.get(row[col_unidad_compra])
-        categoria_normal = uom_to_category.get(row[col_unidad_normal])
-        return 1 if categoria_compra == categoria_normal else 0
+    # Con columnas categóricas el mapeo se hace una vez por unidad distinta y no por fila
+    categoria_compra = productos_df[col_unidad_compra].map(uom_to_category).astype(object)
+    categoria_normal = productos_df[col_unidad_normal].map(uom_to_category).astype(object)
+    # Dos unidades sin categoría también se consideran iguales
+    sin_categoria = categoria_compra.isna() & categoria_normal.isna()
+    productos_df['validacion'] = ((categoria_compra == categoria_normal) | sin_categoria).astype(int)
+    if unidades is None:
+        return productos_df
 
-    productos_df['validacion'] = productos_df.apply(validar_fila, axis=1)
+    fallas = {
+        'categoria_distinta': productos_df['validacion'] == 0,
+        'unidad_compra_desconocida': categoria_compra.isna() & productos_df[col_unidad_compra].notna(),
+        'unidad_normal_desconocida': categoria_normal.isna() & productos_df[col_unidad_normal].notna(),
+    }
+    fallas_unidades = evaluar_unidades(unidades)
+    for regla in fallas_unidades.columns:
+        mapeo = fallas_unidades[regla].to_dict()
+        fallas[f'{regla}_compra'] = productos_df[col_unidad_compra].map(mapeo).astype(object).fillna(False).astype(bool)
+        fallas[f'{regla}_normal'] = productos_df[col_unidad_normal].map(mapeo).astype(object).fillna(False).astype(bool)
+
+    # Cada producto recibe una máscara de bits con sus reglas fallidas, y cada máscara distinta se
+    # traduce a texto una sola vez
+    nombres = list(fallas)
+    mascara = np.zeros(len(productos_df), dtype=np.int64)
+    for bit, nombre in enumerate(nombres):
+        mascara |= fallas[nombre].to_numpy(dtype=bool).astype(np.int64) << bit
+    textos = {valor: ','.join(nombre for bit, nombre in enumerate(nombres) if valor >> bit & 1) for valor in np.unique(mascara)}
+    productos_df['reglas_fallidas'] = pd.Series(mascara, index=productos_df.index).map(textos)
+    productos_df.attrs['fallas'] = pd.DataFrame(fallas, index=productos_df.index)
     return productos_df
 
 
+def resumen_por_categoria(productos_df, uom_to_category, col_unidad_compra):
+    """
+    Resume las reglas fallidas por categoría de la unidad de compra.
+
+    Returns:
+        pd.DataFrame: Una fila por categoría con el número de productos y de productos que fallan cada regla.
+    """
+    fallas = productos_df.attrs['fallas']
+    categoria = productos_df[col_unidad_compra].map(uom_to_category).astype(object).fillna('(sin categoría)')
+    resumen = fallas.groupby(categoria.values).sum()
+    resumen.insert(0, 'productos', categoria.value_counts())
+    resumen.insert(1, 'productos_con_fallas', (fallas.any(axis=1)).groupby(categoria.values).sum())
+    resumen.index.name = 'categoria'
+    return resumen.reset_index()
+
+
+def validar_por_bloques(productos_path, uom_to_category, col_unidad_compra, col_unidad_normal, unidades,
+                        output_file_name, output_format='csv', chunk_size=100000):
+    """
+    Valida el archivo de productos bloque por bloque y escribe cada bloque validado en cuanto se
+    termina, para archivos que no caben en memoria. Las reglas por unidad se evalúan en cada bloque
+    (la tabla de unidades es pequeña) y los resúmenes por categoría de los bloques se suman.
+
+    Args:
+        productos_path (str): Ruta del archivo de productos (se valida su primera hoja).
+        output_file_name (str): Archivo de salida, CSV, Parquet o Arrow según `output_format`.
+        chunk_size (int): Filas por bloque.
+
+    Returns:
+        pd.DataFrame: Resumen por categoría de todo el archivo, ver `resumen_por_categoria`.
+    """
+    columnas = [col_unidad_compra, col_unidad_normal]
+    libro = open_workbook(productos_path)
+    resumenes = []
+    with TableWriter(output_file_name, output_format) as writer:
+        for bloque in libro.iter_chunks(libro.sheet_names[0], chunk_size):
+            bloque = validar_unidades_medida(encode_categoricals(bloque, columnas), uom_to_category,
+                                             col_unidad_compra, col_unidad_normal, unidades)
+            resumenes.append(resumen_por_categoria(bloque, uom_to_category, col_unidad_compra))
+            # Cada bloque tiene sus propias categorías, se escriben como texto para que el esquema no cambie
+            writer.write(bloque.astype({columna: object for columna in columnas}))
+    return pd.concat(resumenes).groupby('categoria').sum().reset_index()
+
+
 def main():
     """
     Función principal que maneja la validación de unidades de medida.
     """
-    if len(sys.argv) < 5:
-        print("Usage: python script.py <productos_file.ods/csv> <categorias_file.ods/csv> <unidad_compra_column> <unidad_normal_column>")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    args = sys.argv[1:]
+    try:
+        output_format = pop_format_option(args, 'csv')
+        memory_budget = pop_memory_budget(args)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    if len(args) < 4:
+        print("Usage: python script.py <productos_file.ods/csv> <categorias_file.ods/csv> <unidad_compra_column> <unidad_normal_column> "
+              "[--format=csv|csv.gz|csv.zst|parquet|arrow|xlsx] [--memory-budget 512MB]")
         sys.exit(1)
 
-    productos_file_name = sys.argv[1]
-    categorias_file_name = sys.argv[2]
-    unidad_compra_column = sys.argv[3]
-    unidad_normal_column = sys.argv[4]
+    productos_file_name = args[0]
+    categorias_file_name = args[1]
+    unidad_compra_column = args[2]
+    unidad_normal_column = args[3]
 
-    productos_df = read_file(productos_file_name)
-    if productos_df is None:
-        return
+    # Validar los nombres de las columnas con los encabezados antes de leer los archivos completos
+    try:
+        validate_columns(os.path.join(os.getcwd(), productos_file_name), [unidad_compra_column, unidad_normal_column])
+        validate_columns(os.path.join(os.getcwd(), categorias_file_name), ['id', 'uom_external_id'])
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
 
+    # El archivo de categorías es pequeño: se lee completo para usar uom_type y factor si vienen
     categorias_df = read_file(categorias_file_name)
     if categorias_df is None:
         return
 
     # Crear mapeo de categorías
-    uom_to_category = crear_mapeo_categorias(categorias_df)
+    uom_to_category = crear_mapeo_categorias(categorias_df[['id', 'uom_external_id']])
+    unidades = crear_tabla_unidades(categorias_df)
+    output_file_name = with_extension('productos_validados.csv', output_format)
 
-    # Validar unidades de medida
-    productos_df = validar_unidades_medida(productos_df, uom_to_category, unidad_compra_column, unidad_normal_column)
+    # El archivo de productos se valida completo en memoria si cabe en el presupuesto, si no por bloques
+    productos_path = os.path.join(os.getcwd(), productos_file_name)
+    if plan('validar_unidades_medida', [productos_path], memory_budget).streaming:
+        try:
+            resumen = validar_por_bloques(productos_path, uom_to_category, unidad_compra_column, unidad_normal_column,
+                                          unidades, output_file_name, output_format)
+        except Exception as e:
+            print(f"Error validando '{productos_file_name}': {e}")
+            return
+    else:
+        productos_df = read_file(productos_file_name, categories=[unidad_compra_column, unidad_normal_column])
+        if productos_df is None:
+            return
 
-    # Guardar resultados en un archivo ODS
-    output_file_name = 'productos_validados.csv'
-    productos_df.to_csv(output_file_name, index=False)
+        # Validar unidades de medida
+        productos_df = validar_unidades_medida(productos_df, uom_to_category, unidad_compra_column, unidad_normal_column, unidades)
+        resumen = resumen_por_categoria(productos_df, uom_to_category, unidad_compra_column)
+        write_table(productos_df, output_file_name, output_format)
     print(f"Validación completada. Archivo guardado como '{output_file_name}'.")
 
+    resumen_file_name = with_extension('resumen_categorias.csv', output_format)
+    write_table(resumen, resumen_file_name, output_format)
+    print(f"Resumen por categoría guardado como '{resumen_file_name}'.")
+    print(resumen.to_string(index=False))
+
 
 if __name__ == "__main__":
     main()
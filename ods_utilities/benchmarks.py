@@ -0,0 +1,188 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.cleaning import clean_columns  # noqa: E402
+from ods_utilities.compression import write_csv, zstandard  # noqa: E402
+from ods_utilities.readers import read_csv, read_xlsx  # noqa: E402
+from ods_utilities.replacing import ReplaceAutomaton, replace_columns  # noqa: E402
+from ods_utilities.xlsx import write_xlsx  # noqa: E402
+
+
+def timed(label, func, *args, **kwargs):
+    """
+    Runs `func` once, prints the elapsed time and returns its result.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+def make_sheet(n_rows=1_000_000, n_columns=30, n_unique=5_000, seed=0):
+    """
+    Builds a synthetic export with text columns that repeat a limited set of dirty values
+    (padding, quotes, accents, repeated spaces and empty cells), like our ERP and SEPOMEX sheets.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(["  Querétaro ", "'San  José'", "Nuevo León", "", "  CDMX", "Michoacán  de Ocampo"], dtype=object)
+    vocabulary = np.array([f"{words[i % len(words)]} {i}" if i % 7 else "" for i in range(n_unique)], dtype=object)
+    return pd.DataFrame({f"col_{i}": vocabulary[rng.integers(0, n_unique, n_rows)] for i in range(n_columns)})
+
+
+def naive_clean(df, spec):
+    """
+    Cleans column by column re-assigning the whole Series after each operation, the way
+    `clean_column` worked before the fused engine.
+    """
+    for column, operations in spec.items():
+        for operation in operations:
+            if operation == 'strip_spaces':
+                df[column] = df[column].astype(str).str.strip()
+            elif operation == 'remove_quotes':
+                df[column] = df[column].str.replace("'", "", regex=False)
+            elif operation == 'collapse_whitespace':
+                df[column] = df[column].str.replace(r'\s+', ' ', regex=True)
+            elif operation == 'strip_accents':
+                df[column] = df[column].str.normalize('NFKD').str.replace(r'[\u0300-\u036f]', '', regex=True).str.normalize('NFC')
+            elif operation == 'lower':
+                df[column] = df[column].str.lower()
+            elif operation == 'handle_missing':
+                df[column] = df[column].replace('', pd.NA).fillna('0')
+    return df
+
+
+def bench_cleaning(n_rows=1_000_000, n_columns=30):
+    """
+    Compares the per-operation cleaning loop with the fused `clean_columns` engine.
+    """
+    df = timed(f"Build {n_rows} x {n_columns} sheet", make_sheet, n_rows, n_columns)
+    operations = ['strip_spaces', 'remove_quotes', 'collapse_whitespace', 'strip_accents', 'lower', 'handle_missing']
+    spec = {column: operations for column in df.columns}
+
+    naive = timed("Per-operation clean_column", naive_clean, df.copy(), spec)
+    fused = timed("Fused clean_columns", clean_columns, df.copy(), spec)
+    print(f"Same result: {naive.equals(fused)}")
+
+
+def make_descriptions(n_rows=100_000, n_pairs=2_000, n_unique=20_000, seed=0):
+    """
+    Builds a products sheet whose descriptions embed legacy codes, and the code -> text pairs
+    that expand them. Codes have the same length and start with a letter absent from the rest of
+    the text, so no pair overlaps another and the per-pair loop gives the same result.
+    """
+    rng = np.random.default_rng(seed)
+    pairs = {f"K{i:05d}": f"abbr {i}" for i in range(n_pairs)}
+    codes = np.array(list(pairs), dtype=object)
+    words = ["caja", "pieza", "rollo", "tubo", "juego", "bolsa"]
+    vocabulary = np.array([f"{words[i % len(words)]} {codes[rng.integers(0, n_pairs)]} de {i} x {codes[rng.integers(0, n_pairs)]}"
+                           for i in range(n_unique)], dtype=object)
+    return pd.DataFrame({'description': vocabulary[rng.integers(0, n_unique, n_rows)]}), pairs
+
+
+def naive_replace(df, pairs, columns):
+    """
+    Replaces substrings with one `str.replace` over the whole column per pair.
+    """
+    for column in columns:
+        for find, replacement in pairs.items():
+            df[column] = df[column].str.replace(find, replacement, regex=False)
+    return df
+
+
+def bench_replacing(n_rows=100_000, n_pairs=2_000):
+    """
+    Compares the per-pair `str.replace` loop with the `ReplaceAutomaton` of `ods_file_column_fnr --substrings`.
+    """
+    df, pairs = timed(f"Build {n_rows} rows and {n_pairs} pairs", make_descriptions, n_rows, n_pairs)
+
+    naive = timed("Per-pair str.replace", naive_replace, df.copy(), pairs, ['description'])
+    automaton = timed("Compile ReplaceAutomaton", ReplaceAutomaton, pairs)
+    replaced = timed("ReplaceAutomaton", replace_columns, df.copy(), automaton, ['description'])
+    print(f"Same result: {naive.equals(replaced)}")
+
+
+def make_export(n_rows=1_000_000, seed=0):
+    """
+    Builds a typical script output: integer ids, prices, free text, a repetitive categorical
+    column, dates and some empty cells.
+    """
+    rng = np.random.default_rng(seed)
+    states = pd.Categorical.from_codes(rng.integers(0, 32, n_rows), [f"Estado {i}" for i in range(32)])
+    prices = rng.random(n_rows) * 1000
+    prices[::11] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(n_rows),
+        'name': [f"Producto {i}" for i in rng.integers(0, n_rows, n_rows)],
+        'state': states,
+        'price': prices,
+        'created': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 86400 * 365, n_rows), unit='s'),
+    })
+
+
+def same_content(df, read):
+    """
+    Tells whether a sheet read back has the values of `df`, floats compared with a tolerance.
+    """
+    try:
+        pd.testing.assert_frame_equal(read, df, check_dtype=False, check_categorical=False, check_exact=False)
+        return True
+    except AssertionError:
+        return False
+
+
+def bench_xlsx(n_rows=1_000_000):
+    """
+    Compares `DataFrame.to_excel` (openpyxl) with the streaming `write_xlsx` writer.
+    """
+    df = timed(f"Build {n_rows} rows", make_export, n_rows)
+    timed("DataFrame.to_excel", df.to_excel, 'bench_to_excel.xlsx', index=False)
+    timed("write_xlsx", write_xlsx, df, 'bench_write_xlsx.xlsx')
+    expected = df.astype({'state': object})
+    for path in ('bench_to_excel.xlsx', 'bench_write_xlsx.xlsx'):
+        print(f"{path}: {os.path.getsize(path) / 1024 ** 2:.1f} MB, same content: {same_content(expected, read_xlsx(path)['Sheet1'])}")
+        os.remove(path)
+
+
+def bench_csv(n_rows=1_000_000, workers=None):
+    """
+    Compares `DataFrame.to_csv`, plain and gzip compressed, with `write_csv` in worker threads,
+    plain and gzip or zstd compressed.
+    """
+    df = timed(f"Build {n_rows} rows", make_export, n_rows)
+    runs = [
+        ('bench_to_csv.csv', "DataFrame.to_csv", lambda path: df.to_csv(path, index=False)),
+        ('bench_to_csv.csv.gz', "DataFrame.to_csv gzip", lambda path: df.to_csv(path, index=False, compression='gzip')),
+        ('bench_write_csv.csv', "write_csv", lambda path: write_csv(df, path, workers=workers)),
+        ('bench_write_csv.csv.gz', "write_csv gzip", lambda path: write_csv(df, path, 'gzip', workers)),
+    ]
+    if zstandard is not None:
+        runs.append(('bench_write_csv.csv.zst', "write_csv zstd", lambda path: write_csv(df, path, 'zstd', workers)))
+    for path, label, write in runs:
+        timed(label, write, path)
+    expected = read_csv(runs[0][0])
+    for path, _, _ in runs:
+        print(f"{path}: {os.path.getsize(path) / 1024 ** 2:.1f} MB, same content: {read_csv(path).equals(expected)}")
+    for path, _, _ in runs:
+        os.remove(path)
+
+
+BENCHMARKS = {
+    'cleaning': bench_cleaning,
+    'replacing': bench_replacing,
+    'xlsx': bench_xlsx,
+    'csv': bench_csv,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmarks.py <{'|'.join(BENCHMARKS)}> [n_rows]")
+        sys.exit(1)
+
+    args = [int(arg) for arg in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
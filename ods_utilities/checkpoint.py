@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+
+from ods_utilities.writers import atomic_output
+
+
+MANIFEST = 'manifest.json'
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_hash(file_path):
+    """
+    Returns the SHA-256 of a file's content, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as source:
+        for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def checkpoint_directory(file_path):
+    """
+    Returns the checkpoint directory of a job named after `file_path`, e.g. data.ods -> .data.ods.checkpoint
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.checkpoint")
+
+
+class Checkpoint:
+    """
+    Manifest of the finished steps of a long job, so a crashed run can be resumed.
+
+    The manifest stores the content hash of the job's inputs and its settings, and for every
+    finished step the hashes of the files it wrote. A step may also save a picklable result
+    (e.g. the colonies of a state) next to the manifest. On resume a step is skipped only if the
+    inputs and settings are unchanged and its outputs are still on disk with the same content;
+    anything else is done again. The manifest is rewritten atomically after every step.
+
+    Usage:
+        checkpoint = Checkpoint(checkpoint_directory(file_path), [file_path], {'max_rows': 1000}, resume)
+        if not checkpoint.done('Sheet1/1'):
+            ...
+            checkpoint.complete('Sheet1/1', [output_path])
+        checkpoint.finish()
+    """
+
+    def __init__(self, directory, inputs, settings=None, resume=False):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self.inputs = {os.path.abspath(path): file_hash(path) for path in inputs}
+        self.settings = json.loads(json.dumps(settings or {}))
+        self.steps = {}
+
+        if resume and os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get('inputs') == self.inputs and manifest.get('settings') == self.settings:
+                self.steps = manifest.get('steps', {})
+                print(f"Resuming: {len(self.steps)} finished step(s) found in {directory}")
+            else:
+                print("Inputs or settings changed since the checkpoint was written. Starting over.")
+        if not self.steps:
+            shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+        self._save()
+
+    def done(self, step):
+        """
+        Tells whether a step finished in a previous run and its outputs are unchanged.
+        """
+        entry = self.steps.get(step)
+        if entry is None:
+            return False
+        return all(os.path.exists(path) and file_hash(path) == digest for path, digest in entry['outputs'].items())
+
+    def complete(self, step, outputs=(), result=None):
+        """
+        Records a finished step with the files it wrote and, optionally, a result to restore on resume.
+        """
+        outputs = [os.path.abspath(path) for path in outputs]
+        if result is not None:
+            result_path = os.path.join(self.directory, re.sub(r'[^\w.-]+', '_', step) + '.pickle')
+            with atomic_output(result_path) as temp_path, open(temp_path, 'wb') as result_file:
+                pickle.dump(result, result_file, protocol=pickle.HIGHEST_PROTOCOL)
+            outputs.append(result_path)
+        self.steps[step] = {'outputs': {path: file_hash(path) for path in outputs}, 'result': result is not None}
+        self._save()
+
+    def result(self, step):
+        """
+        Returns the result saved by a finished step.
+        """
+        result_path = os.path.join(self.directory, re.sub(r'[^\w.-]+', '_', step) + '.pickle')
+        with open(result_path, 'rb') as result_file:
+            return pickle.load(result_file)
+
+    def finish(self):
+        """
+        Removes the checkpoint once the whole job has finished.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _save(self):
+        manifest = {'inputs': self.inputs, 'settings': self.settings, 'steps': self.steps}
+        with atomic_output(self.manifest_path) as temp_path, open(temp_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
@@ -0,0 +1,155 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def _is_text(values):
+    """
+    Returns a boolean mask of the values that are Python strings.
+    """
+    return values.map(lambda value: isinstance(value, str))
+
+
+def _text_operation(transform):
+    """
+    Wraps a vectorized `.str` transformation so it only touches string values.
+
+    Numbers, dates and missing values read with their native type are left untouched, so a
+    string operation never turns them into 'nan' or '1.0'. Categorical columns have their
+    categories cleaned, and pandas `string` columns go through `.str` directly.
+    """
+    def operation(values, *args):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Cleaned categories may collide ('A ' and 'A'), the codes are remapped to the distinct ones
+            categories = operation(pd.Series(values.cat.categories), *args)
+            category_codes, distinct = pd.factorize(categories)
+            codes = values.cat.codes.to_numpy()
+            codes = np.where(codes >= 0, category_codes[codes], -1)
+            return pd.Series(pd.Categorical.from_codes(codes, distinct), index=values.index, name=values.name)
+        if isinstance(values.dtype, pd.StringDtype):
+            return transform(values, *args)
+        if values.dtype != object:
+            return values
+        mask = _is_text(values)
+        if not mask.any():
+            return values
+        return transform(values[mask].astype(str), *args).reindex(values.index).where(mask, values)
+    return operation
+
+
+def _strip_accents(values):
+    decomposed = values.str.normalize('NFKD')
+    return decomposed.str.replace(r'[\u0300-\u036f]', '', regex=True).str.normalize('NFC')
+
+
+def _handle_missing(values):
+    if values.dtype == object:
+        return values.replace('', pd.NA).fillna('0')
+    return values.fillna(0)
+
+
+def _to_integer(values):
+    return pd.to_numeric(values, errors='coerce', downcast='integer')
+
+
+def _to_float(values):
+    return pd.to_numeric(values, errors='coerce', downcast='float')
+
+
+def _to_string(values):
+    return values.astype(str)
+
+
+# Every operation receives the unique values of a column as a Series and returns the cleaned
+# Series, operations that take arguments receive them after the values.
+OPERATIONS = {
+    'strip_spaces': _text_operation(lambda values: values.str.strip()),
+    'remove_quotes': _text_operation(lambda values: values.str.replace("'", "", regex=False)),
+    'lower': _text_operation(lambda values: values.str.lower()),
+    'collapse_whitespace': _text_operation(lambda values: values.str.replace(r'\s+', ' ', regex=True)),
+    'regex_replace': _text_operation(lambda values, pattern, repl='': values.str.replace(pattern, repl, regex=True)),
+    'strip_accents': _text_operation(_strip_accents),
+    'handle_missing': _handle_missing,
+    'to_integer': _to_integer,
+    'to_float': _to_float,
+    'to_string': _to_string,
+}
+
+
+def parse_operation(operation):
+    """
+    Parses an operation written as text, arguments are separated from the name with ':'.
+
+    Example: 'regex_replace:\\s+:_' -> ('regex_replace', '\\s+', '_')
+
+    Args:
+        operation (str or tuple): Operation name with optional arguments, tuples are returned as is.
+
+    Returns:
+        tuple: Operation name followed by its arguments.
+    """
+    if isinstance(operation, tuple):
+        return operation
+    name, *args = operation.split(':', 2) if operation.startswith('regex_replace') else [operation]
+    return (name, *args)
+
+
+def compile_spec(spec):
+    """
+    Compiles a cleaning spec into one cleaning function per column.
+
+    Args:
+        spec (dict): Keys are column names, values are the ordered list of operations to apply.
+            Each operation is a name from `OPERATIONS`, or a tuple (name, *args) such as
+            ('regex_replace', r'\\s+', '_').
+
+    Returns:
+        dict: Keys are column names, values are functions that clean a Series of unique values.
+
+    Raises:
+        ValueError: If the spec uses an unknown operation.
+    """
+    compiled = {}
+    for column, operations in spec.items():
+        steps = []
+        for operation in operations:
+            name, *args = parse_operation(operation)
+            if name not in OPERATIONS:
+                raise ValueError(f"Unknown cleaning operation '{name}'. Use one of: {', '.join(OPERATIONS)}")
+            if name == 'regex_replace':
+                args[0] = re.compile(args[0])
+            steps.append((OPERATIONS[name], args))
+
+        def clean(values, steps=steps):
+            for function, args in steps:
+                values = function(values, *args)
+            return values
+        compiled[column] = clean
+    return compiled
+
+
+def clean_columns(df, spec):
+    """
+    Cleans several columns of a DataFrame in a single pass per column.
+
+    Each column is factorized once, every operation of its spec runs over the unique values only,
+    and the cleaned values are expanded back to the full column with one `take`. Repeated values
+    are therefore cleaned once, and each column is assigned once instead of after every operation.
+
+    Args:
+        df (pd.DataFrame): DataFrame to clean, modified in place.
+        spec (dict): Keys are column names, values are the ordered list of operations, see `compile_spec`.
+
+    Returns:
+        pd.DataFrame: The cleaned DataFrame. Columns missing from the DataFrame are skipped.
+    """
+    for column, clean in compile_spec(spec).items():
+        if column not in df.columns:
+            print(f"Column '{column}' not found. Skipping.")
+            continue
+        codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        cleaned = clean(pd.Series(uniques))
+        df[column] = pd.Series(cleaned.array.take(codes), index=df.index, name=column)
+    return df
+
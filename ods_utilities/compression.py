@@ -0,0 +1,204 @@
+import gzip
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # zstd files need the zstandard package, gzip works without it
+    zstandard = None
+
+
+# Compressions of CSV files: the suffix of their extension and the magic bytes their files start with
+COMPRESSIONS = {
+    'gzip': ('.gz', b'\x1f\x8b'),
+    'zstd': ('.zst', b'\x28\xb5\x2f\xfd'),
+}
+
+# Extensions of the CSV files the readers accept, compressed or not
+CSV_EXTENSIONS = ('.csv',) + tuple('.csv' + suffix for suffix, _ in COMPRESSIONS.values())
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Rows formatted (and compressed) by a worker thread at a time
+BLOCK_ROWS = 50000
+
+
+def split_extension(file_path):
+    """
+    Splits a path like `os.path.splitext`, keeping a compression suffix with the extension before
+    it: 'data.csv.gz' -> ('data', '.csv.gz').
+    """
+    base, extension = os.path.splitext(file_path)
+    if extension.lower() in {suffix for suffix, _ in COMPRESSIONS.values()}:
+        base, inner = os.path.splitext(base)
+        extension = inner + extension
+    return base, extension
+
+
+def table_extension(file_path):
+    """
+    Returns the lower-case extension that tells the format of a file, a compressed CSV counts as
+    CSV: 'data.csv.gz' -> '.csv'.
+    """
+    extension = split_extension(file_path)[1].lower()
+    return '.csv' if extension in CSV_EXTENSIONS else extension
+
+
+def detect_compression(file_path):
+    """
+    Tells the compression of a file from its first bytes, whatever its extension.
+
+    Returns:
+        str: 'gzip', 'zstd' or None for an uncompressed file.
+    """
+    with open(file_path, 'rb') as source:
+        head = source.read(4)
+    for compression, (_, magic) in COMPRESSIONS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ValueError("zstd files need the zstandard package: pip install zstandard")
+
+
+def read_sample(file_path, size):
+    """
+    Reads the first `size` bytes of the content of a file, decompressed if it is gzip or zstd
+    compressed (see `detect_compression`).
+
+    Returns:
+        tuple: The bytes read and the number of bytes of the file they took, to extrapolate from
+        the sample to the whole file.
+    """
+    compression = detect_compression(file_path)
+    with open(file_path, 'rb') as source:
+        if compression is None:
+            sample = source.read(size)
+            return sample, len(sample)
+        if compression == 'gzip':
+            reader = gzip.GzipFile(fileobj=source)
+        else:
+            _require_zstandard()
+            reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=False)
+        with reader:
+            sample = reader.read(size)
+            return sample, source.tell()
+
+
+def read_compression(file_path):
+    """
+    Returns the `compression` argument of `pd.read_csv` for a file, detected from its content so a
+    compressed file is read whatever its name.
+    """
+    compression = detect_compression(file_path)
+    if compression == 'zstd':
+        _require_zstandard()
+    return compression
+
+
+class CsvWriter:
+    """
+    Writes a CSV file chunk by chunk, uncompressed or compressed with gzip or zstd.
+
+    Every chunk is cut in blocks of `block_rows` rows that a pool of worker threads formats (and,
+    for gzip, compresses) while the blocks before them are written, always in their original
+    order. zlib and zstd release the GIL while they compress, so compression runs on all the
+    workers at once. Each gzip block is a complete gzip member, a file made of several members
+    is a regular gzip file for every reader. zstd blocks go through one zstd stream compressed
+    by `workers` threads of the zstd library itself, which writes a single frame.
+
+    The file has the same CSV as `DataFrame.to_csv(index=False)`. At most `workers * 2` blocks
+    are pending at any time, so memory does not grow with the size of the output. Blocks are
+    formatted after `write` returns: a written DataFrame must not be modified afterwards.
+
+    Usage:
+        with CsvWriter('output.csv.gz', 'gzip') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, output_path, compression=None, workers=None, block_rows=BLOCK_ROWS, level=None):
+        """
+        Args:
+            output_path (str): Path of the CSV file.
+            compression (str, optional): 'gzip', 'zstd' or None.
+            workers (int, optional): Worker threads, the number of CPUs by default.
+            block_rows (int): Rows per block.
+            level (int, optional): Compression level, `GZIP_LEVEL` or `ZSTD_LEVEL` by default.
+
+        Raises:
+            ValueError: If the compression is not supported or zstandard is not installed.
+        """
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression '{compression}'. Use one of: {', '.join(COMPRESSIONS)}")
+        if compression == 'zstd':
+            _require_zstandard()
+        self.output_path = output_path
+        self.compression = compression
+        self.workers = workers or os.cpu_count() or 1
+        self.block_rows = block_rows
+        self.level = level if level is not None else (ZSTD_LEVEL if compression == 'zstd' else GZIP_LEVEL)
+        self.rows = 0
+        self._header = True
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._file = open(output_path, 'wb')
+        self._sink = self._file
+        if compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=self.level, threads=self.workers if self.workers > 1 else 0)
+            self._sink = compressor.stream_writer(self._file, closefd=False)
+
+    def _encode(self, block, header):
+        data = block.to_csv(index=False, header=header).encode('utf-8')
+        if self.compression == 'gzip':
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+        return data
+
+    def write(self, df):
+        """
+        Appends the rows of a DataFrame, the header is written with the first chunk.
+        """
+        # An empty first chunk still writes the header
+        for start in range(0, max(len(df), 1 if self._header else 0), self.block_rows):
+            self._pending.append(self._executor.submit(self._encode, df.iloc[start:start + self.block_rows], self._header))
+            self._header = False
+            while len(self._pending) > self.workers * 2:
+                self._sink.write(self._pending.popleft().result())
+        self.rows += len(df)
+
+    def close(self):
+        """
+        Writes the pending blocks and closes the file.
+        """
+        if self._file is None:
+            return
+        try:
+            while self._pending:
+                self._sink.write(self._pending.popleft().result())
+            if self._sink is not self._file:
+                self._sink.close()
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_csv(df, output_path, compression=None, workers=None, block_rows=BLOCK_ROWS):
+    """
+    Writes a DataFrame to a CSV file with `CsvWriter`, see there for the arguments.
+    """
+    with CsvWriter(output_path, compression, workers, block_rows) as writer:
+        writer.write(df)
@@ -0,0 +1,369 @@
+import os
+import pickle
+import re
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from ods_utilities.readers import iter_chunks
+from ods_utilities.writers import TableWriter
+
+
+# Number of hash partitions both sides of a join are spilled to; partitions are then grouped so
+# each group fits the memory budget
+PARTITIONS = 64
+
+# In-memory size of a partition once loaded and indexed, relative to its DataFrame pieces
+INDEX_OVERHEAD = 3
+
+# Column holding the row number of the output file in the spilled keys and results
+ROW = '__row__'
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    """
+    Parses a size such as '512MB', '2G' or '1048576' into bytes.
+
+    Raises:
+        ValueError: If the size is not understood.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(text).upper())
+    if match is None:
+        raise ValueError(f"Invalid size '{text}'. Use e.g. 512MB or 2GB.")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def _key_text(value):
+    """
+    Text used to hash a key, 5 and 5.0 hash alike since they are the same dictionary key.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def partition_of(keys, partitions=PARTITIONS):
+    """
+    Returns the hash partition of every key, equal keys always land in the same partition.
+
+    Args:
+        keys (pd.Series or pd.DataFrame): Keys, a DataFrame holds one composite key per row.
+    """
+    if isinstance(keys, pd.DataFrame):
+        text = keys.iloc[:, 0].map(_key_text)
+        for column in range(1, keys.shape[1]):
+            text = text + '\x1f' + keys.iloc[:, column].map(_key_text)
+    else:
+        text = keys.map(_key_text)
+    hashes = pd.util.hash_pandas_object(text.astype(object), index=False).values
+    return (hashes % partitions).astype(np.int64)
+
+
+def column_list(columns):
+    """
+    Accepts a column name, a comma-separated list of names or a list, returns a list.
+    """
+    if isinstance(columns, str):
+        return [column.strip() for column in columns.split(',') if column.strip()]
+    return list(columns)
+
+
+def mapping_columns(search_cols, taken_cols, target_cols, key_cols=None):
+    """
+    Validates the columns of a mapping and returns them as lists.
+
+    Key columns are the columns of the output file matched against `search_cols`. When not given,
+    a single-column mapping uses its target column as key (the target is looked up and replaced),
+    and composite mappings use the columns named like `search_cols`.
+
+    Raises:
+        ValueError: If the number of columns does not match.
+    """
+    search_cols, taken_cols, target_cols = column_list(search_cols), column_list(taken_cols), column_list(target_cols)
+    if key_cols is None:
+        key_cols = target_cols if len(search_cols) == 1 and len(target_cols) == 1 else search_cols
+    key_cols = column_list(key_cols)
+    if len(taken_cols) != len(target_cols):
+        raise ValueError(f"Got {len(taken_cols)} taken columns for {len(target_cols)} target columns.")
+    if len(key_cols) != len(search_cols):
+        raise ValueError(f"Got {len(key_cols)} key columns for {len(search_cols)} search columns.")
+    return search_cols, taken_cols, target_cols, key_cols
+
+
+def _key_index(df, columns):
+    """
+    Index of the key columns of `df`, a MultiIndex for composite keys.
+    """
+    if len(columns) == 1:
+        return pd.Index(df[columns[0]])
+    return pd.MultiIndex.from_frame(df[columns])
+
+
+def build_lookup(pairs, search_cols, taken_cols):
+    """
+    De-duplicates the lookup rows and indexes them by key, once for every taken column.
+
+    The precedence is the one of a dict built from the de-duplicated rows: when a key has several
+    distinct rows, the last one wins.
+
+    Returns:
+        tuple: (key index, DataFrame of taken values aligned with the index).
+    """
+    pairs = pairs[search_cols + taken_cols].drop_duplicates().drop_duplicates(subset=search_cols, keep='last')
+    return _key_index(pairs, search_cols), pairs[taken_cols].astype(object).reset_index(drop=True)
+
+
+def align(lookup, keys_df, key_cols):
+    """
+    Looks every row of `keys_df` up in a lookup built by `build_lookup`, in one vectorized pass.
+
+    Returns:
+        dict: Taken column -> object array of mapped values, None where the key is not found.
+    """
+    index, values = lookup
+    positions = index.get_indexer(_key_index(keys_df, key_cols))
+    found = positions >= 0
+    mapped = {}
+    for column in values.columns:
+        column_values = np.full(len(positions), None, dtype=object)
+        column_values[found] = values[column].values[positions[found]]
+        mapped[column] = column_values
+    return mapped
+
+
+def fill_targets(df, mapped, taken_cols, target_cols):
+    """
+    Writes the mapped values into the target columns, rows without a mapped value keep theirs.
+    """
+    for taken_col, target_col in zip(taken_cols, target_cols):
+        values = mapped[taken_col]
+        has_value = pd.notna(values)
+        if target_col in df.columns:
+            filled = df[target_col].astype(object).values.copy()
+            filled[has_value] = values[has_value]
+        else:
+            filled = values
+        df[target_col] = pd.Series(filled, index=df.index, name=target_col).infer_objects()
+    return df
+
+
+def map_columns(input_df, output_df, search_cols, taken_cols, target_cols, key_cols=None):
+    """
+    In-memory "mapped value, else original value" mapping with composite keys and several
+    taken -> target column pairs, all filled from a single key lookup.
+
+    Args:
+        input_df (pd.DataFrame): Lookup rows.
+        output_df (pd.DataFrame): Rows to update, modified in place.
+        search_cols (str or list): Key columns of `input_df`.
+        taken_cols (str or list): Value columns of `input_df`.
+        target_cols (str or list): Columns of `output_df` receiving the values, one per taken column.
+        key_cols (str or list, optional): Key columns of `output_df`, see `mapping_columns`.
+
+    Returns:
+        pd.DataFrame: The updated `output_df`.
+    """
+    search_cols, taken_cols, target_cols, key_cols = mapping_columns(search_cols, taken_cols, target_cols, key_cols)
+    lookup = build_lookup(input_df, search_cols, taken_cols)
+    return fill_targets(output_df, align(lookup, output_df, key_cols), taken_cols, target_cols)
+
+
+class _Spill:
+    """
+    Set of partition files on disk, each one a sequence of pickled DataFrame pieces.
+    """
+
+    def __init__(self, directory, name, partitions=PARTITIONS):
+        self.paths = [os.path.join(directory, f"{name}_{partition}.pkl") for partition in range(partitions)]
+        self.files = [None] * partitions
+        self.sizes = np.zeros(partitions, dtype=np.int64)
+
+    def write(self, partition, df):
+        if self.files[partition] is None:
+            self.files[partition] = open(self.paths[partition], 'wb')
+        pickle.dump(df, self.files[partition], protocol=pickle.HIGHEST_PROTOCOL)
+        self.sizes[partition] += df.memory_usage(index=False, deep=True).sum()
+
+    def write_partitioned(self, partitions, df):
+        for partition, piece in df.groupby(partitions, sort=False):
+            self.write(partition, piece)
+
+    def close(self):
+        for file in self.files:
+            if file is not None:
+                file.close()
+
+    def read(self, partition):
+        """
+        Yields the pieces of a partition in the order they were written.
+        """
+        if not os.path.exists(self.paths[partition]):
+            return
+        with open(self.paths[partition], 'rb') as file:
+            while True:
+                try:
+                    yield pickle.load(file)
+                except EOFError:
+                    return
+
+
+def _iter_first_sheet(file_path, chunk_size, na_value=None, usecols=None):
+    """
+    Streams the first sheet of a file, the sheet the eager mapping functions use.
+    """
+    first = None
+    for sheet_name, chunk in iter_chunks(file_path, chunk_size, na_value=na_value, usecols=usecols):
+        if first is None:
+            first = sheet_name
+        elif sheet_name != first:
+            return
+        yield chunk
+
+
+def _group_partitions(sizes, memory_budget):
+    """
+    Groups consecutive partitions so the estimated memory of each group stays within the budget.
+    """
+    groups, group, used = [], [], 0
+    for partition, size in enumerate(sizes):
+        size = int(size) * INDEX_OVERHEAD
+        if group and used + size > memory_budget:
+            groups.append(group)
+            group, used = [], 0
+        group.append(partition)
+        used += size
+    if group:
+        groups.append(group)
+    return groups
+
+
+class _ResultCursor:
+    """
+    Reads the result pieces of a group, sorted by row, a range of rows at a time.
+    """
+
+    def __init__(self, spill, partition):
+        self.pieces = spill.read(partition)
+        self.pending = None
+
+    def take_until(self, end):
+        taken = []
+        while True:
+            if self.pending is None:
+                self.pending = next(self.pieces, None)
+                if self.pending is None:
+                    break
+            rows = self.pending[ROW].values
+            split = np.searchsorted(rows, end)
+            taken.append(self.pending.iloc[:split])
+            if split < len(rows):
+                self.pending = self.pending.iloc[split:]
+                break
+            self.pending = None
+        return taken
+
+
+def partitioned_map(input_file, output_file, output_path, search_cols, taken_cols, target_cols, output_format='csv',
+                    memory_budget=512 * 1024 ** 2, chunk_size=100000, na_value=None, clean=None, dropna=False, key_cols=None):
+    """
+    Out-of-core version of `map_columns`, the "mapped value, else original value" column mapping.
+
+    Both files are streamed once and hash-partitioned to disk by key: the lookup rows of
+    `input_file`, and the row number and key of every row of `output_file`. Partitions are then
+    joined in groups that fit `memory_budget`, and `output_file` is streamed a second time, filling
+    the target columns from the joined partitions and writing each chunk as it goes.
+
+    As with the in-memory mapping, when a key appears several times in `input_file` the last
+    distinct row wins, and rows whose key is not found (or maps to an empty value) keep their value.
+
+    Args:
+        input_file (str): Path of the lookup file.
+        output_file (str): Path of the file whose target columns are updated.
+        output_path (str): Path of the result.
+        search_cols (str or list): Key columns of `input_file`.
+        taken_cols (str or list): Value columns of `input_file`.
+        target_cols (str or list): Columns of `output_file` receiving the values, one per taken column.
+        output_format (str): 'csv', 'parquet' or 'arrow'.
+        memory_budget (int): Bytes available for the partitions loaded at once.
+        chunk_size (int): Rows read and written at a time.
+        na_value (optional): Value used for empty cells of ODS and XLSX string columns.
+        clean (callable, optional): Function applied to every key and value before mapping.
+        dropna (bool): Ignores the rows of `input_file` with an empty key or value.
+        key_cols (str or list, optional): Key columns of `output_file`, see `mapping_columns`.
+
+    Returns:
+        int: Number of rows written.
+    """
+    search_cols, taken_cols, target_cols, key_cols = mapping_columns(search_cols, taken_cols, target_cols, key_cols)
+    # Output columns that the mapping reads or rewrites, cleaned like the lookup rows
+    cleaned_cols = list(dict.fromkeys(key_cols + target_cols))
+
+    directory = tempfile.mkdtemp(prefix='partitioned_map_')
+    try:
+        lookup = _Spill(directory, 'lookup')
+        for chunk in _iter_first_sheet(input_file, chunk_size, na_value, usecols=search_cols + taken_cols):
+            chunk = chunk[search_cols + taken_cols]
+            if clean is not None:
+                chunk = chunk.apply(lambda column: column.map(clean))
+            if dropna:
+                chunk = chunk.dropna()
+            chunk = chunk.drop_duplicates()
+            lookup.write_partitioned(partition_of(chunk[search_cols]), chunk)
+        lookup.close()
+
+        keys = _Spill(directory, 'keys')
+        total_rows = 0
+        for chunk in _iter_first_sheet(output_file, chunk_size, na_value, usecols=key_cols):
+            rows = chunk[key_cols] if clean is None else chunk[key_cols].apply(lambda column: column.map(clean))
+            rows = rows.reset_index(drop=True).assign(**{ROW: np.arange(total_rows, total_rows + len(chunk))})
+            keys.write_partitioned(partition_of(rows[key_cols]), rows)
+            total_rows += len(chunk)
+        keys.close()
+
+        groups = _group_partitions(lookup.sizes + keys.sizes, memory_budget)
+        print(f"Joining {total_rows} rows in {len(groups)} partition groups "
+              f"(lookup {lookup.sizes.sum() / 1024 ** 2:.1f} MB, budget {memory_budget / 1024 ** 2:.0f} MB)")
+
+        results = _Spill(directory, 'result', len(groups))
+        for index, group in enumerate(groups):
+            group_keys = [piece for partition in group for piece in keys.read(partition)]
+            if not group_keys:
+                continue
+            group_keys = pd.concat(group_keys).sort_values(ROW, kind='stable')
+            rows = [piece for partition in group for piece in lookup.read(partition)]
+            rows = pd.concat(rows) if rows else pd.DataFrame(columns=search_cols + taken_cols)
+            mapped = align(build_lookup(rows, search_cols, taken_cols), group_keys, key_cols)
+            result = pd.DataFrame({ROW: group_keys[ROW].values, **mapped})
+            for start in range(0, len(result), chunk_size):
+                results.write(index, result.iloc[start:start + chunk_size])
+        results.close()
+
+        cursors = [_ResultCursor(results, index) for index in range(len(groups))]
+        written = 0
+        with TableWriter(output_path, output_format) as writer:
+            for chunk in _iter_first_sheet(output_file, chunk_size, na_value):
+                chunk = chunk.reset_index(drop=True)
+                if clean is not None:
+                    for column in cleaned_cols:
+                        if column in chunk.columns:
+                            chunk[column] = chunk[column].map(clean)
+                end = written + len(chunk)
+                pieces = [piece for cursor in cursors for piece in cursor.take_until(end)]
+                if pieces:
+                    pieces = pd.concat(pieces)
+                    positions = pieces[ROW].values - written
+                    mapped = {}
+                    for column in taken_cols:
+                        values = np.full(len(chunk), None, dtype=object)
+                        values[positions] = pieces[column].values
+                        mapped[column] = values
+                    fill_targets(chunk, mapped, taken_cols, target_cols)
+                writer.write(chunk)
+                written = end
+        return written
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -1,16 +1,24 @@
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton,
-                             QFileDialog, QProgressBar, QLabel, QLineEdit, QFormLayout, QMessageBox)
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QPushButton, QComboBox,
+                             QFileDialog, QProgressBar, QLabel, QLineEdit, QFormLayout, QMessageBox,
+                             QTableView, QHeaderView)
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QAbstractTableModel, QModelIndex
 import logging
 import os
 import sys
-import pandas as pd
-import ezodf
 from pyexcel_ods3 import save_data
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.cleaning import clean_columns  # noqa: E402
+from ods_utilities.compression import CSV_EXTENSIONS  # noqa: E402
+from ods_utilities.joins import map_columns, mapping_columns, partitioned_map  # noqa: E402
+from ods_utilities.paging import PagedTable  # noqa: E402
+from ods_utilities.planner import plan  # noqa: E402
+from ods_utilities.readers import open_workbook, validate_columns  # noqa: E402
+from ods_utilities.writers import OUTPUT_EXTENSIONS, result_path, with_extension, write_table  # noqa: E402
 
-def unified_read_file(file_name):
-    """Unified function to read CSV, ODS, and XLSX files into DataFrames"""
+
+def unified_read_file(file_name, usecols=None):
+    """Unified function to read CSV, ODS, XLSX, Parquet and Arrow files into DataFrames, optionally only `usecols`"""
     file_path = os.path.join(os.getcwd(), file_name)
 
     if not os.path.exists(file_path):
@@ -18,21 +26,8 @@ def unified_read_file(file_name):
         return None
 
     try:
-        if file_name.endswith('.csv'):
-            return {'Sheet1': pd.read_csv(file_path)}
-        elif file_name.endswith(('.ods', '.odt')):
-            doc = ezodf.opendoc(file_path)
-            data_dict = {}
-            for sheet in doc.sheets:
-                data = []
-                for row in sheet.rows():
-                    data.append([cell.value if cell.value is not None else '' for cell in row])
-                if data:
-                    columns = data[0]
-                    data_dict[sheet.name] = pd.DataFrame(data[1:], columns=columns)
-            return data_dict
-        elif file_name.endswith(('.xlsx', '.xls')):
-            return pd.read_excel(file_path, sheet_name=None)
+        if file_name.endswith(CSV_EXTENSIONS + ('.ods', '.odt', '.xlsx', '.xls', '.parquet', '.arrow')):
+            return open_workbook(file_path, na_value='', usecols=usecols)
         else:
             print("Unsupported file format")
             return None
@@ -42,42 +37,54 @@ def unified_read_file(file_name):
 
 
 def clean_column(df, column, operations):
-    """Generic column cleaning function"""
-    if 'strip_spaces' in operations:
-        df[column] = df[column].astype(str).str.strip()
-    if 'remove_quotes' in operations:
-        df[column] = df[column].str.replace("'", "")
-    if 'handle_missing' in operations:
-        df[column] = df[column].replace('', pd.NA).fillna('0')
-    return df
-
-
-def process_mapping(input_file, output_file, search_col, taken_col, target_col):
-    """Process column mapping between two files"""
-    input_df = unified_read_file(input_file)['Sheet1']
-    output_df = unified_read_file(output_file)['Sheet1']
-
-    mapping = input_df[[search_col, taken_col]].drop_duplicates().set_index(search_col)[taken_col].to_dict()
-    output_df[target_col] = output_df[target_col].map(mapping).fillna(output_df[target_col])
-
-    output_df.to_csv(output_file, index=False)
-    print(f"Updated {output_file}")
-
-
-def split_large_file(file_name, max_rows):
-    """Split large files into smaller chunks"""
+    """Generic column cleaning function, see `clean_columns` for the available operations"""
+    return clean_columns(df, {column: operations})
+
+
+def process_mapping(input_file, output_file, search_col, taken_col, target_col, output_format='csv', memory_budget=None, key_col=None):
+    """Process column mapping between two files, other formats are written next to `output_file`, see `result_path`.
+    Columns may be lists or comma-separated names for composite keys and several taken -> target pairs, see `map_columns`.
+    When both files don't fit `memory_budget` (bytes, a fraction of the available memory by default) they are
+    streamed and joined by hash partitions on disk, see `plan` and `partitioned_map`"""
+    search_cols, taken_cols, target_cols, key_cols = mapping_columns(search_col, taken_col, target_col, key_col)
+    mapping_plan = plan('process_mapping', [(os.path.join(os.getcwd(), input_file), search_cols + taken_cols),
+                                            os.path.join(os.getcwd(), output_file)], memory_budget)
+    output_path = result_path(output_file, output_format, input_file, '_mapped')
+    if mapping_plan.streaming:
+        partitioned_map(os.path.join(os.getcwd(), input_file), os.path.join(os.getcwd(), output_file), output_path,
+                        search_cols, taken_cols, target_cols, output_format, mapping_plan.budget, na_value='', key_cols=key_cols)
+        print(f"Updated {output_path}")
+        return output_path
+
+    input_df = unified_read_file(input_file, usecols=search_cols + taken_cols).first()
+    output_df = unified_read_file(output_file).first()
+    map_columns(input_df, output_df, search_cols, taken_cols, target_cols, key_cols)
+
+    write_table(output_df, output_path, output_format)
+    print(f"Updated {output_path}")
+    return output_path
+
+
+def split_large_file(file_name, max_rows, output_format='ods'):
+    """Split large files into smaller chunks, returns the names of the parts"""
     data_dict = unified_read_file(file_name)
     base_name = os.path.splitext(file_name)[0]
+    output_names = []
 
     for sheet_name, df in data_dict.items():
         chunks = [df[i:i + max_rows] for i in range(0, df.shape[0], max_rows)]
         for i, chunk in enumerate(chunks):
-            output_name = f"{base_name}_{sheet_name}_part{i + 1}.ods"
-            save_data(output_name, {sheet_name: [chunk.columns.tolist()] + chunk.values.tolist()})
+            output_name = f"{base_name}_{sheet_name}_part{i + 1}{OUTPUT_EXTENSIONS[output_format]}"
+            if output_format == 'ods':
+                save_data(output_name, {sheet_name: [chunk.columns.tolist()] + chunk.values.tolist()})
+            else:
+                write_table(chunk, output_name, output_format)
             print(f"Created {output_name}")
+            output_names.append(output_name)
+    return output_names
 
 
-def interactive_cleaner(file_name, column, operations):
+def interactive_cleaner(file_name, column, operations, output_format='csv'):
     """Versión modificada para GUI"""
     data_dict = unified_read_file(file_name)
 
@@ -87,12 +94,14 @@ def interactive_cleaner(file_name, column, operations):
     sheet = list(data_dict.keys())[0]
     df = data_dict[sheet]
 
-    if column not in df.columns:
-        raise ValueError(f"Columna '{column}' no encontrada")
+    columns = [name.strip() for name in column.split(',')]
+    missing = [name for name in columns if name not in df.columns]
+    if missing:
+        raise ValueError(f"Columna '{', '.join(missing)}' no encontrada")
 
-    cleaned_df = clean_column(df.copy(), column, operations)
-    output_name = f"cleaned_{os.path.basename(file_name)}"
-    cleaned_df.to_csv(output_name, index=False)
+    cleaned_df = clean_columns(df.copy(), {name: operations for name in columns})
+    output_name = with_extension(f"cleaned_{os.path.basename(file_name)}", output_format)
+    write_table(cleaned_df, output_name, output_format)
     return output_name
 
 
@@ -113,16 +122,83 @@ class WorkerThread(QThread):
         self.task_func = task_func
         self.args = args
         self.kwargs = kwargs
+        self.result = None
 
     def run(self):
         try:
-            self.task_func(*self.args, **self.kwargs)
+            self.result = self.task_func(*self.args, **self.kwargs)
             self.task_completed.emit(True, "Operación completada con éxito")
         except Exception as e:
             logging.error(str(e))
             self.task_completed.emit(False, str(e))
 
 
+class PagedTableModel(QAbstractTableModel):
+    """Modelo de solo lectura sobre un `PagedTable`: la vista solo pide las celdas visibles,
+    que se convierten por páginas, y ordenar una columna solo cambia el orden de las filas"""
+
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.table.n_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        value = self.table.cell(index.row(), index.column())
+        return '' if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.table.columns[section]
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.table.sort(column if column >= 0 else None, descending=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+
+class PreviewWindow(QWidget):
+    """Ventana con la tabla de un archivo y un selector de hoja"""
+
+    def __init__(self, table, open_sheet):
+        super().__init__()
+        self.table = table
+        self.setWindowTitle(f'Vista previa - {os.path.basename(table.file_path)} ({table.n_rows} filas)')
+        self.setGeometry(350, 350, 900, 600)
+        layout = QVBoxLayout()
+
+        if len(table.sheet_names) > 1:
+            self.sheet = QComboBox(self)
+            self.sheet.addItems(table.sheet_names)
+            self.sheet.setCurrentText(table.sheet_name)
+            self.sheet.activated[str].connect(lambda sheet_name: open_sheet(table.file_path, sheet_name))
+            layout.addWidget(self.sheet)
+
+        self.view = QTableView(self)
+        self.view.setModel(PagedTableModel(table, self.view))
+        # Sin indicador de orden, las filas se muestran en el orden del archivo hasta que se ordena una columna
+        self.view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.view.setSortingEnabled(True)
+        # Filas de altura fija: la vista no mide las filas, solo calcula cuáles son visibles
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(self.view.fontMetrics().height() + 6)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
+
+    def closeEvent(self, event):
+        self.table.close()
+        super().closeEvent(event)
+
+
 class DataProcessorApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -142,15 +218,23 @@ class DataProcessorApp(QMainWindow):
         self.btn_mapping = QPushButton('Mapear columnas entre archivos', self)
         self.btn_clean = QPushButton('Limpiar columna específica', self)
         self.btn_split = QPushButton('Dividir archivo grande', self)
+        self.btn_preview = QPushButton('Vista previa de archivo', self)
+
+        # Formato de los archivos generados
+        self.output_format = QComboBox(self)
+        self.output_format.addItems(['csv', 'csv.gz', 'csv.zst', 'parquet', 'arrow', 'xlsx'])
 
         # Barra de progreso
         self.progress_bar = QProgressBar(self)
         self.progress_bar.hide()
 
         # Diseño
+        self.layout.addWidget(QLabel('Formato de salida:'))
+        self.layout.addWidget(self.output_format)
         self.layout.addWidget(self.btn_mapping)
         self.layout.addWidget(self.btn_clean)
         self.layout.addWidget(self.btn_split)
+        self.layout.addWidget(self.btn_preview)
         self.layout.addWidget(self.progress_bar)
 
         self.main_widget.setLayout(self.layout)
@@ -160,11 +244,12 @@ class DataProcessorApp(QMainWindow):
         self.btn_mapping.clicked.connect(self.show_mapping_dialog)
         self.btn_clean.clicked.connect(self.show_clean_dialog)
         self.btn_split.clicked.connect(self.show_split_dialog)
+        self.btn_preview.clicked.connect(self.show_preview_dialog)
 
     def show_file_dialog(self, title):
         file_path, _ = QFileDialog.getOpenFileName(
             self, title, "",
-            "Archivos de datos (*.csv *.ods *.xlsx *.xls);;Todos los archivos (*)"
+            "Archivos de datos (*.csv *.csv.gz *.csv.zst *.ods *.xlsx *.xls *.parquet *.arrow);;Todos los archivos (*)"
         )
         return file_path
 
@@ -212,6 +297,16 @@ class DataProcessorApp(QMainWindow):
             QMessageBox.warning(self, "Error", "Todos los campos son requeridos")
             return
 
+        # Validar las columnas con los encabezados antes de leer los archivos completos
+        try:
+            search_cols, taken_cols, _, key_cols = mapping_columns(
+                self.search_col.text(), self.taken_col.text(), self.target_col.text())
+            validate_columns(self.source_file.text(), search_cols + taken_cols)
+            validate_columns(self.target_file.text(), key_cols)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+
         self.worker = WorkerThread(self._mapping_task)
         self.worker.progress_updated.connect(self.update_progress)
         self.worker.task_completed.connect(self.show_result)
@@ -220,14 +315,16 @@ class DataProcessorApp(QMainWindow):
 
     def _mapping_task(self):
         try:
-            process_mapping(
+            output_path = process_mapping(
                 self.source_file.text(),
                 self.target_file.text(),
                 self.search_col.text(),
                 self.taken_col.text(),
-                self.target_col.text()
+                self.target_col.text(),
+                self.output_format.currentText()
             )
-            self.progress_updated.emit(100)
+            self.worker.progress_updated.emit(100)
+            return output_path
         except Exception as e:
             logging.error(str(e))
             raise
@@ -241,6 +338,36 @@ class DataProcessorApp(QMainWindow):
                                 "Resultado",
                                 message if success else f"Error: {message}"
                                 )
+        # Abrir el archivo generado (la primera parte, al dividir) en la vista previa
+        result = self.worker.result if success else None
+        if isinstance(result, list):
+            result = result[0] if result else None
+        if result:
+            self.open_preview(result)
+
+    def show_preview_dialog(self):
+        file_path = self.show_file_dialog("Seleccionar archivo")
+        if file_path:
+            self.open_preview(file_path)
+
+    def open_preview(self, file_path, sheet_name=None):
+        """Carga el archivo en segundo plano y lo muestra en una ventana de vista previa"""
+        self.preview_worker = WorkerThread(PagedTable, file_path, sheet_name)
+        self.preview_worker.task_completed.connect(self.show_preview)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.preview_worker.start()
+
+    def show_preview(self, success, message):
+        self.progress_bar.hide()
+        self.progress_bar.setRange(0, 100)
+        if not success:
+            QMessageBox.warning(self, "Error", f"No se pudo abrir la vista previa: {message}")
+            return
+        if getattr(self, 'preview_window', None) is not None:
+            self.preview_window.close()
+        self.preview_window = PreviewWindow(self.preview_worker.result, self.open_preview)
+        self.preview_window.show()
 
     # Implementar métodos similares para limpieza y división
     def show_clean_dialog(self):
@@ -252,7 +379,7 @@ class DataProcessorApp(QMainWindow):
         self.clean_operations = QLineEdit()
 
         layout.addRow(QLabel('Archivo a limpiar:'), self.create_file_row(self.clean_file))
-        layout.addRow(QLabel('Columna a limpiar:'), self.clean_column)
+        layout.addRow(QLabel('Columnas a limpiar (separadas por coma):'), self.clean_column)
         layout.addRow(QLabel('Operaciones (separadas por espacio):'), self.clean_operations)
 
         btn_execute = QPushButton('Ejecutar')
@@ -273,11 +400,18 @@ class DataProcessorApp(QMainWindow):
             QMessageBox.warning(self, "Error", "Todos los campos son requeridos")
             return
 
+        try:
+            validate_columns(params['file_name'], [name.strip() for name in params['column'].split(',')])
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error", str(e))
+            return
+
         self.worker = WorkerThread(
             interactive_cleaner,
             params['file_name'],
             params['column'],
-            params['operations']
+            params['operations'],
+            self.output_format.currentText()
         )
         self.worker.task_completed.connect(self.show_result)
         self.worker.start()
@@ -309,7 +443,10 @@ class DataProcessorApp(QMainWindow):
             if not os.path.exists(file_path):
                 raise FileNotFoundError
 
-            self.worker = WorkerThread(split_large_file, file_path, max_rows)
+            # La división conserva ODS salvo que se pida un formato columnar
+            output_format = self.output_format.currentText()
+            self.worker = WorkerThread(split_large_file, file_path, max_rows,
+                                       'ods' if output_format == 'csv' else output_format)
             self.worker.task_completed.connect(self.show_result)
             self.worker.start()
 
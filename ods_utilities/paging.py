@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ods_utilities.readers import open_workbook
+from ods_utilities.writers import write_arrow
+
+
+def _common_type(types):
+    """
+    Returns the type a column is cast to when its chunks were read with different types: the
+    widest numeric type if they are all numbers, strings otherwise.
+    """
+    types = [data_type for data_type in types if not pa.types.is_null(data_type)]
+    if not types:
+        return pa.string()
+    if all(data_type == types[0] for data_type in types):
+        return types[0]
+    if all(pa.types.is_integer(data_type) for data_type in types):
+        return pa.int64()
+    if all(pa.types.is_integer(data_type) or pa.types.is_floating(data_type) for data_type in types):
+        return pa.float64()
+    return pa.string()
+
+
+def _concat_chunks(tables):
+    """
+    Concatenates the chunk tables of a sheet, casting the columns whose type changed between chunks.
+    """
+    names = tables[0].schema.names
+    types = {name: _common_type([table.schema.field(name).type for table in tables]) for name in names}
+    conformed = []
+    for table in tables:
+        if any(table.schema.field(name).type != types[name] for name in names):
+            table = pa.Table.from_arrays([table.column(name).cast(types[name]) for name in names], names=names)
+        conformed.append(table)
+    return pa.concat_tables(conformed)
+
+
+class PagedTable:
+    """
+    Read-only, random-access view of one sheet of a CSV, ODS, XLSX, Parquet or Arrow IPC file,
+    meant for displaying tables with millions of rows.
+
+    The sheet is streamed once in chunks and each chunk is written to an Arrow IPC file in a
+    temporary directory (Arrow files are used in place). The files are memory-mapped, so the
+    operating system pages rows in as they are displayed. Cells are served from pages of
+    `page_size` rows converted to Python values on first access, the last `max_pages` pages are
+    cached. Sorting computes a row permutation with Arrow's sort kernel and leaves the data in place.
+
+    Usage:
+        with PagedTable('output.csv') as table:
+            table.sort(0)
+            table.cell(0, 1)
+    """
+
+    def __init__(self, file_path, sheet_name=None, page_size=1000, max_pages=16, chunk_size=100000):
+        self.file_path = file_path
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.order = None
+        self._pages = OrderedDict()
+        self._directory = None
+        self._sources = []
+
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in ('.arrow', '.feather'):
+            self.sheet_names = ['Sheet1']
+            self.sheet_name = 'Sheet1'
+            paths = [file_path]
+        else:
+            workbook = open_workbook(file_path, na_value='')
+            self.sheet_names = list(workbook.sheet_names)
+            self.sheet_name = sheet_name if sheet_name is not None else self.sheet_names[0]
+            self._directory = tempfile.mkdtemp(prefix='paged_table_')
+            paths = []
+            for index, chunk in enumerate(workbook.iter_chunks(self.sheet_name, chunk_size)):
+                paths.append(os.path.join(self._directory, f'{index}.arrow'))
+                write_arrow(chunk, paths[-1])
+
+        tables = []
+        for path in paths:
+            source = pa.memory_map(path, 'r')
+            self._sources.append(source)
+            tables.append(pa.ipc.open_file(source).read_all())
+        self.table = _concat_chunks(tables)
+        self.columns = self.table.schema.names
+        self.n_rows = self.table.num_rows
+
+    def cell(self, row, column):
+        """
+        Returns the value at a (display) row and a column position.
+        """
+        page = self._page(row // self.page_size)
+        return page[column][row % self.page_size]
+
+    def _page(self, number):
+        page = self._pages.get(number)
+        if page is not None:
+            self._pages.move_to_end(number)
+            return page
+
+        start = number * self.page_size
+        if self.order is None:
+            rows = self.table.slice(start, self.page_size)
+        else:
+            rows = self.table.take(self.order[start:start + self.page_size])
+        page = [column.to_pylist() for column in rows.columns]
+        self._pages[number] = page
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def sort(self, column, descending=False):
+        """
+        Orders the rows by a column position, missing values last. The sort is stable.
+
+        Args:
+            column (int): Position of the column, None restores the order of the file.
+            descending (bool): Sorts from the largest value.
+        """
+        self._pages.clear()
+        if column is None:
+            self.order = None
+            return
+        self.order = pc.sort_indices(self.table, sort_keys=[(self.columns[column], 'descending' if descending else 'ascending')],
+                                     null_placement='at_end')
+
+    def close(self):
+        """
+        Releases the memory maps and removes the temporary Arrow files.
+        """
+        self._pages.clear()
+        self.table = None
+        for source in self._sources:
+            source.close()
+        self._sources = []
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
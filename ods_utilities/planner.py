@@ -0,0 +1,190 @@
+import logging
+import os
+import re
+import zipfile
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ods_utilities.compression import read_sample, table_extension
+from ods_utilities.joins import parse_size
+from ods_utilities.readers import preview
+
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the available memory used as budget when no --memory-budget is given
+DEFAULT_BUDGET_FRACTION = 0.5
+
+# Peak memory of an eager run relative to the DataFrames it loads: parser buffers while a sheet
+# is built, the copies made by cleaning, mapping and the writers
+WORKING_SET_FACTOR = 3
+
+# Rows read with `preview` to measure the in-memory size of a row
+SAMPLE_ROWS = 1000
+
+# Decompressed bytes read from the start of an ODS/XLSX sheet to measure the XML size of a row
+XML_SAMPLE_BYTES = 1 << 20
+
+# In-memory size of a file whose row count cannot be estimated (e.g. XLS), relative to its size
+UNKNOWN_FORMAT_FACTOR = 10
+
+Plan = namedtuple('Plan', ['streaming', 'estimate', 'budget'])
+
+
+def available_memory():
+    """
+    Returns the memory available to new allocations in bytes, or None if it cannot be read.
+    """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_budget():
+    """
+    Returns `DEFAULT_BUDGET_FRACTION` of the available memory, or None if it cannot be read.
+    """
+    memory = available_memory()
+    return int(memory * DEFAULT_BUDGET_FRACTION) if memory else None
+
+
+def pop_memory_budget(args):
+    """
+    Removes a `--memory-budget=<size>` (or `--memory-budget <size>`) option from a list of
+    command line arguments, see `pop_format_option`.
+
+    Returns:
+        int: The budget in bytes, or None when the option is not given.
+
+    Raises:
+        ValueError: If the size is missing or not understood.
+    """
+    for index, arg in enumerate(args):
+        if arg.startswith('--memory-budget='):
+            return parse_size(args.pop(index)[len('--memory-budget='):])
+        if arg == '--memory-budget':
+            if index + 1 >= len(args):
+                raise ValueError("--memory-budget needs a size, e.g. 512MB or 2GB.")
+            args.pop(index)
+            return parse_size(args.pop(index))
+    return None
+
+
+def format_size(size):
+    """
+    Formats a number of bytes as e.g. '1.5 GB'.
+    """
+    if size is None:
+        return 'unknown'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _xml_rows(archive, paths, row_tag):
+    """
+    Estimates the rows of the sheets stored in `paths` of an ODS/XLSX archive from their
+    decompressed size and the size of the rows at the start of the first one, or returns None
+    when the sample has no row to measure.
+    """
+    total = sum(archive.getinfo(path).file_size for path in paths)
+    with archive.open(paths[0]) as content:
+        sample = content.read(XML_SAMPLE_BYTES)
+    rows = len(re.findall(row_tag, sample))
+    if rows == 0:
+        return None
+    return int(total / len(sample) * rows)
+
+
+def estimate_rows(file_path):
+    """
+    Estimates the number of rows of a file without parsing it, or returns None when it can't.
+
+    Parquet and Arrow files store their row count. For CSV files the size is divided by the
+    length of the first lines (for a compressed CSV, by the compressed bytes they took); for ODS
+    and XLSX files, the decompressed size of the sheets by the XML size of their first rows.
+    """
+    extension = table_extension(file_path)
+    if extension == '.parquet':
+        return pq.ParquetFile(file_path).metadata.num_rows
+    if extension in ('.arrow', '.feather'):
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+    if extension == '.csv':
+        sample, size = read_sample(file_path, XML_SAMPLE_BYTES)
+        lines = sample.count(b'\n')
+        return int(os.path.getsize(file_path) / size * lines) if lines else 1
+    if extension in ('.ods', '.odt'):
+        with zipfile.ZipFile(file_path) as archive:
+            return _xml_rows(archive, ['content.xml'], rb'<table:table-row[\s>/]')
+    if extension == '.xlsx':
+        with zipfile.ZipFile(file_path) as archive:
+            paths = [name for name in archive.namelist() if name.startswith('xl/worksheets/') and name.endswith('.xml')]
+            return _xml_rows(archive, paths, rb'<row[\s>/]') if paths else 0
+    return None
+
+
+def estimate_footprint(file_path, usecols=None):
+    """
+    Estimates the memory taken by a file once loaded as DataFrames, from its estimated row
+    count and the deep memory usage of a sample of rows read with `preview`.
+
+    Args:
+        file_path (str): Path to the file.
+        usecols (list, optional): Only count these columns.
+
+    Returns:
+        int: Estimated size in bytes.
+    """
+    rows = estimate_rows(file_path)
+    if rows is None:
+        return os.path.getsize(file_path) * UNKNOWN_FORMAT_FACTOR
+    sample = next(iter(preview(file_path, n_rows=SAMPLE_ROWS).values()))
+    if usecols is not None:
+        sample = sample[[column for column in sample.columns if column in usecols]]
+    if sample.empty:
+        return 0
+    row_size = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    return int(rows * row_size)
+
+
+def plan(task, files, memory_budget=None):
+    """
+    Chooses between loading the inputs of a task in memory and streaming them in chunks.
+
+    The task streams when its estimated working set (the footprint of its inputs times
+    `WORKING_SET_FACTOR`) does not fit the budget. The decision and the estimate are logged.
+
+    Args:
+        task (str): Name of the task, for the log.
+        files (list): Input paths, or (path, usecols) tuples when only some columns are read.
+        memory_budget (int, optional): Budget in bytes. Defaults to `default_budget()`.
+
+    Returns:
+        Plan: (streaming, estimate, budget), sizes in bytes. Without a budget (the available
+        memory is unknown and none is given) the task runs in memory.
+    """
+    budget = memory_budget if memory_budget is not None else default_budget()
+    estimate = 0
+    for item in files:
+        file_path, usecols = item if isinstance(item, tuple) else (item, None)
+        estimate += estimate_footprint(file_path, usecols)
+    estimate *= WORKING_SET_FACTOR
+
+    streaming = budget is not None and estimate > budget
+    names = ', '.join(os.path.basename(item[0] if isinstance(item, tuple) else item) for item in files)
+    logger.info("%s: estimated working set %s for %s, budget %s -> %s", task, format_size(estimate), names,
+                format_size(budget), 'streaming' if streaming else 'in memory')
+    return Plan(streaming, estimate, budget)
@@ -0,0 +1,1302 @@
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import weakref
+import zipfile
+from bisect import bisect_left
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from xml.sax import saxutils
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from lxml import etree
+
+from ods_utilities.compression import read_compression, table_extension
+from ods_utilities.writers import write_arrow
+
+
+TABLE_NS = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+OFFICE_NS = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TEXT_NS = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+TABLE = f'{{{TABLE_NS}}}table'
+ROW = f'{{{TABLE_NS}}}table-row'
+CELL = f'{{{TABLE_NS}}}table-cell'
+COVERED_CELL = f'{{{TABLE_NS}}}covered-table-cell'
+TABLE_NAME = f'{{{TABLE_NS}}}name'
+ROWS_REPEATED = f'{{{TABLE_NS}}}number-rows-repeated'
+COLUMNS_REPEATED = f'{{{TABLE_NS}}}number-columns-repeated'
+VALUE_TYPE = f'{{{OFFICE_NS}}}value-type'
+VALUE = f'{{{OFFICE_NS}}}value'
+DATE_VALUE = f'{{{OFFICE_NS}}}date-value'
+TIME_VALUE = f'{{{OFFICE_NS}}}time-value'
+BOOLEAN_VALUE = f'{{{OFFICE_NS}}}boolean-value'
+PARAGRAPH = f'{{{TEXT_NS}}}p'
+SPACE = f'{{{TEXT_NS}}}s'
+TAB = f'{{{TEXT_NS}}}tab'
+LINE_BREAK = f'{{{TEXT_NS}}}line-break'
+SPACE_COUNT = f'{{{TEXT_NS}}}c'
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELATIONSHIPS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+XLSX_SHEET = f'{{{SHEET_NS}}}sheet'
+XLSX_ROW = f'{{{SHEET_NS}}}row'
+XLSX_CELL = f'{{{SHEET_NS}}}c'
+XLSX_VALUE = f'{{{SHEET_NS}}}v'
+XLSX_INLINE_STRING = f'{{{SHEET_NS}}}is'
+XLSX_TEXT = f'{{{SHEET_NS}}}t'
+XLSX_RUN = f'{{{SHEET_NS}}}r'
+XLSX_SHARED_STRING = f'{{{SHEET_NS}}}si'
+XLSX_NUMBER_FORMAT = f'{{{SHEET_NS}}}numFmt'
+XLSX_CELL_FORMATS = f'{{{SHEET_NS}}}cellXfs'
+XLSX_FORMAT = f'{{{SHEET_NS}}}xf'
+XLSX_WORKBOOK_PROPERTIES = f'{{{SHEET_NS}}}workbookPr'
+XLSX_RELATIONSHIP = f'{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship'
+RELATIONSHIP_ID = f'{{{RELATIONSHIPS_NS}}}id'
+
+# Built-in number formats that display a date or a time
+XLSX_DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+XLSX_EPOCH = datetime(1899, 12, 30)
+XLSX_EPOCH_1904 = datetime(1904, 1, 1)
+
+# Automatic categorical detection: columns with at least CATEGORY_MIN_ROWS rows and at most
+# CATEGORY_MAX_RATIO distinct values per row
+CATEGORY_MIN_ROWS = 1000
+CATEGORY_MAX_RATIO = 0.1
+
+# Column kinds accepted as per-column overrides in `dtypes`
+COLUMN_KINDS = ('integer', 'float', 'datetime', 'timedelta', 'boolean', 'string')
+
+INT_PATTERN = re.compile(r'^[+-]?\d+$')
+INT64_MIN = np.iinfo(np.int64).min
+INT64_MAX = np.iinfo(np.int64).max
+# Integers above this magnitude cannot round-trip through float64
+FLOAT_EXACT_LIMIT = 2 ** 53
+
+
+def _element_text(element):
+    """
+    Returns the text of an ODS text element, expanding <text:s>, <text:tab> and <text:line-break>.
+    """
+    parts = [element.text or '']
+    for child in element:
+        if child.tag == SPACE:
+            parts.append(' ' * int(child.get(SPACE_COUNT, '1')))
+        elif child.tag == TAB:
+            parts.append('\t')
+        elif child.tag == LINE_BREAK:
+            parts.append('\n')
+        elif isinstance(child.tag, str):
+            parts.append(_element_text(child))
+        parts.append(child.tail or '')
+    return ''.join(parts)
+
+
+def _cell_text(cell):
+    """
+    Returns the displayed text of a cell, one line per <text:p> paragraph.
+    """
+    return '\n'.join(_element_text(p) for p in cell.iterchildren(PARAGRAPH))
+
+
+def _classify_number(raw):
+    """
+    Classifies the raw office:value of a numeric cell as 'integer', 'float' or 'bigint'.
+
+    LibreOffice writes integral numbers without a decimal point, but other producers write "1.0",
+    so integral floats within the exact float64 range are also treated as integers. Integers that
+    do not fit in int64 are reported as 'bigint' so the column falls back to exact strings.
+    """
+    if INT_PATTERN.match(raw):
+        value = int(raw)
+        return 'integer' if INT64_MIN <= value <= INT64_MAX else 'bigint'
+    try:
+        value = float(raw)
+    except ValueError:
+        return 'string'
+    if value.is_integer() and abs(value) <= FLOAT_EXACT_LIMIT:
+        return 'integer'
+    return 'float'
+
+
+def _read_cell(cell):
+    """
+    Reads a <table:table-cell> and returns a (kind, raw) tuple, or None when the cell is empty.
+
+    `raw` is always the exact string stored in the document: office:value for numbers,
+    office:date-value / office:time-value / office:boolean-value for those types, and the
+    displayed text for strings. Conversion to native types happens once per column.
+    """
+    value_type = cell.get(VALUE_TYPE)
+    if value_type in ('float', 'percentage', 'currency'):
+        raw = cell.get(VALUE)
+        return _classify_number(raw), raw
+    if value_type == 'date':
+        return 'datetime', cell.get(DATE_VALUE)
+    if value_type == 'time':
+        return 'timedelta', cell.get(TIME_VALUE)
+    if value_type == 'boolean':
+        return 'boolean', cell.get(BOOLEAN_VALUE)
+    text = _cell_text(cell)
+    if text == '':
+        return None
+    return 'string', text
+
+
+class _SheetBuilder:
+    """
+    Accumulates the cells of one sheet column by column.
+
+    Empty rows and empty trailing cells are only materialized when followed by content, so the
+    huge `number-rows-repeated` / `number-columns-repeated` runs that spreadsheet editors append
+    at the end of a sheet never allocate anything. `take` turns the rows accumulated so far into
+    a DataFrame and starts over, which lets the readers hand out a sheet in chunks.
+
+    When `usecols` is given, the header row is used to resolve it into the sorted list of column
+    indexes `selected`; the row readers then only decode those cells and pass them in that order.
+    """
+
+    def __init__(self, usecols=None):
+        self.usecols = usecols
+        self.selected = None
+        self.header = None
+        self.columns = []
+        self.kinds = []
+        self.n_rows = 0
+        self.pending_rows = 0
+        self.offset = 0
+
+    def add_row(self, cells, repeat, limit=None):
+        """
+        Adds `repeat` copies of a row. With a `limit`, rows (empty rows followed by content
+        included) are only added until the builder holds `limit` of them.
+
+        Returns:
+            int: The copies left to add once the rows have been taken.
+        """
+        if self.header is None:
+            header = [raw for _, raw in (cell or (None, None) for cell in cells)]
+            if self.usecols is not None:
+                # Blank sheets have no header to resolve the columns against
+                self.selected = _resolve_usecols(header, self.usecols) if header else []
+                header = [header[index] if index < len(header) else None for index in self.selected]
+                cells = _project(cells, self.selected)
+            self.header = header
+            repeat -= 1
+            if repeat == 0:
+                return 0
+        if not cells:
+            self.pending_rows += repeat
+            return 0
+
+        # Flush the empty rows that turned out not to be trailing
+        if self.pending_rows:
+            flushed = self.pending_rows if limit is None else min(self.pending_rows, limit - self.n_rows)
+            for column in self.columns:
+                column.extend([None] * flushed)
+            self.n_rows += flushed
+            self.pending_rows -= flushed
+            if self.pending_rows:
+                return repeat
+        added = repeat if limit is None else min(repeat, limit - self.n_rows)
+
+        while len(self.columns) < len(cells):
+            self.columns.append([None] * self.n_rows)
+            self.kinds.append(set())
+
+        for _ in range(added):
+            for index, column in enumerate(self.columns):
+                cell = cells[index] if index < len(cells) else None
+                if cell is None:
+                    column.append(None)
+                else:
+                    self.kinds[index].add(cell[0])
+                    column.append(cell[1])
+        self.n_rows += added
+        return repeat - added
+
+    def take(self, dtypes=None, na_value=None):
+        """
+        Returns the accumulated rows as a DataFrame, indexed after the rows taken before, and
+        releases them.
+        """
+        header = list(self.header or [])
+        width = max(len(header), len(self.columns))
+        header.extend([None] * (width - len(header)))
+        while len(self.columns) < width:
+            self.columns.append([None] * self.n_rows)
+            self.kinds.append(set())
+
+        dtypes = dtypes or {}
+        arrays = {}
+        for index, (name, raw_values, kinds) in enumerate(zip(header, self.columns, self.kinds)):
+            kind = dtypes.get(name) or _infer_kind(kinds)
+            arrays[index] = _convert_column(raw_values, kind, na_value)
+        df = pd.DataFrame(arrays, index=pd.RangeIndex(self.offset, self.offset + self.n_rows))
+        df.columns = header
+
+        self.columns = [[] for _ in range(width)]
+        self.kinds = [set() for _ in range(width)]
+        self.offset += self.n_rows
+        self.n_rows = 0
+        return df
+
+
+def _resolve_usecols(header, usecols):
+    """
+    Resolves column names and/or positional indexes into the sorted list of column indexes to read.
+
+    Raises:
+        ValueError: If a column name is not in the header.
+    """
+    selected = set()
+    missing = []
+    for column in usecols:
+        if isinstance(column, int):
+            selected.add(column)
+        elif column in header:
+            selected.add(header.index(column))
+        else:
+            missing.append(str(column))
+    if missing:
+        raise ValueError(f"Columns not found: {', '.join(missing)}")
+    return sorted(selected)
+
+
+def _project(cells, selected):
+    """
+    Keeps only the `selected` cells of a full row, trimming trailing empty cells.
+    """
+    projected = [cells[index] if index < len(cells) else None for index in selected]
+    while projected and projected[-1] is None:
+        projected.pop()
+    return projected
+
+
+def _infer_kind(kinds):
+    """
+    Picks the column kind from the set of cell kinds found in that column.
+    """
+    if not kinds:
+        return 'string'
+    if len(kinds) == 1:
+        kind = next(iter(kinds))
+        return 'string' if kind == 'bigint' else kind
+    if kinds == {'integer', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _to_int(raw):
+    if INT_PATTERN.match(raw):
+        return int(raw)
+    value = float(raw)
+    if not value.is_integer():
+        raise ValueError(f"'{raw}' is not an integer")
+    return int(value)
+
+
+def _convert_column(raw_values, kind, na_value=None):
+    """
+    Converts the raw strings of a column into a native numpy/pandas array of the given kind.
+
+    Values that cannot be converted to the requested kind become missing values, like
+    `pd.to_numeric(errors='coerce')` does.
+    """
+    if kind not in COLUMN_KINDS:
+        raise ValueError(f"Unsupported column kind '{kind}'. Use one of: {', '.join(COLUMN_KINDS)}")
+
+    if kind == 'string':
+        # Repeated texts share a single string object
+        pool = {}
+        return np.array([na_value if raw is None else pool.setdefault(raw, raw) for raw in raw_values], dtype=object)
+
+    if kind == 'integer':
+        values = []
+        missing = False
+        for raw in raw_values:
+            try:
+                values.append(_to_int(raw.strip()) if raw is not None else None)
+            except (ValueError, OverflowError):
+                values.append(None)
+            missing = missing or values[-1] is None
+        if not missing:
+            try:
+                return np.array(values, dtype=np.int64)
+            except OverflowError:
+                pass
+        try:
+            return pd.array(values, dtype='Int64')
+        except (TypeError, OverflowError):
+            # Codes longer than int64 are kept verbatim rather than rounded through float64
+            return _convert_column(raw_values, 'string', na_value)
+
+    if kind == 'float':
+        return pd.to_numeric(pd.Series(raw_values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+    if kind == 'datetime':
+        return pd.to_datetime(pd.Series(raw_values, dtype=object), errors='coerce').array
+
+    if kind == 'timedelta':
+        return pd.to_timedelta(pd.Series(raw_values, dtype=object), errors='coerce').array
+
+    # boolean
+    mapping = {'true': True, 'false': False, '1': True, '0': False}
+    values = [mapping.get(raw.strip().lower()) if raw is not None else None for raw in raw_values]
+    if any(value is None for value in values):
+        return pd.array(values, dtype='boolean')
+    return np.array(values, dtype=bool)
+
+
+def _is_low_cardinality(values):
+    """
+    Tells whether an object column holds only strings that repeat enough to be worth a categorical.
+    """
+    if values.dtype != object or len(values) < CATEGORY_MIN_ROWS:
+        return False
+    present = values.dropna()
+    if present.nunique() > len(values) * CATEGORY_MAX_RATIO:
+        return False
+    return bool(present.map(type).eq(str).all())
+
+
+def encode_categoricals(df, categories='auto'):
+    """
+    Converts repetitive text columns into pandas categoricals: each distinct value is stored once
+    and rows hold small integer codes, so groupby, map and merge on them work on the codes.
+
+    Args:
+        df (pd.DataFrame): DataFrame to convert, modified in place.
+        categories (str or list): 'auto' converts the text columns whose number of distinct values
+            is at most `CATEGORY_MAX_RATIO` of their rows, a list converts those columns (the ones
+            missing from `df` are ignored).
+
+    Returns:
+        pd.DataFrame: The converted DataFrame.
+    """
+    if categories == 'auto':
+        columns = [column for column in df.columns if _is_low_cardinality(df[column])]
+    else:
+        columns = [column for column in categories if column in df.columns]
+    for column in columns:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _iter_row_cells(row, selected=None):
+    """
+    Yields the cells of a row as (kind, raw) tuples or None, trimming trailing empty cells.
+
+    With `selected` (sorted column indexes), only those cells are decoded and returned in that
+    order, and the rest of the row is skipped once the last selected column has been read.
+    """
+    if selected is not None:
+        return _iter_selected_row_cells(row, selected)
+
+    cells = []
+    pending_empty = 0
+    for cell in row:
+        if cell.tag != CELL and cell.tag != COVERED_CELL:
+            continue
+        repeat = int(cell.get(COLUMNS_REPEATED, '1'))
+        value = _read_cell(cell)
+        if value is None:
+            pending_empty += repeat
+            continue
+        if pending_empty:
+            cells.extend([None] * pending_empty)
+            pending_empty = 0
+        cells.extend([value] * repeat)
+    return cells
+
+
+def _iter_selected_row_cells(row, selected):
+    cells = [None] * len(selected)
+    index = 0
+    for cell in row:
+        if cell.tag != CELL and cell.tag != COVERED_CELL:
+            continue
+        repeat = int(cell.get(COLUMNS_REPEATED, '1'))
+        first = bisect_left(selected, index)
+        last = bisect_left(selected, index + repeat)
+        if first < last:
+            value = _read_cell(cell)
+            for position in range(first, last):
+                cells[position] = value
+        index += repeat
+        if index > selected[-1]:
+            break
+    while cells and cells[-1] is None:
+        cells.pop()
+    return cells
+
+
+def iter_ods_chunks(file_path, chunk_size=None, dtypes=None, na_value=None, usecols=None):
+    """
+    Streams the sheets of an ODS file as DataFrames of at most `chunk_size` rows.
+
+    Only the rows of the current chunk are kept in memory, parsed XML elements are released as
+    soon as their row has been read. Each chunk infers its column types on its own, so a column
+    can be int64 in one chunk and float64 in the next; `pd.concat` reconciles them.
+
+    Args:
+        file_path (str): Path to the ODS file.
+        chunk_size (int, optional): Maximum number of rows per chunk. Defaults to one chunk per sheet.
+        dtypes (dict, optional): Per-column type overrides, see `read_ods`.
+        na_value (optional): Value used for empty cells in string columns, see `read_ods`.
+        usecols (list, optional): Column names and/or indexes to read, see `read_ods`.
+
+    Yields:
+        tuple: (sheet name, DataFrame). Every sheet yields at least one, possibly empty, DataFrame.
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open('content.xml') as content:
+        yield from _iter_ods_tables(content, chunk_size, dtypes, na_value, usecols)
+
+
+def _iter_ods_tables(content, chunk_size=None, dtypes=None, na_value=None, usecols=None):
+    """
+    Streams the <table:table> elements found in an XML stream, see `iter_ods_chunks`.
+    """
+    builder = None
+    sheet_name = None
+    taken = False
+    for event, element in etree.iterparse(content, events=('start', 'end'), tag=(TABLE, ROW)):
+        if element.tag == TABLE:
+            if event == 'start':
+                builder = _SheetBuilder(usecols)
+                sheet_name = element.get(TABLE_NAME)
+                taken = False
+                continue
+            if builder.n_rows or not taken:
+                yield sheet_name, builder.take(dtypes, na_value)
+            builder = None
+            element.clear()
+            continue
+        if event == 'end' and builder is not None:
+            # A repeated row is split at the chunk boundary, the copies left go to the next chunk
+            repeat = int(element.get(ROWS_REPEATED, '1'))
+            while repeat:
+                repeat = builder.add_row(_iter_row_cells(element, builder.selected), repeat, chunk_size)
+                if chunk_size and builder.n_rows >= chunk_size:
+                    yield sheet_name, builder.take(dtypes, na_value)
+                    taken = True
+            # Release the parsed row and its already processed siblings
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+
+def read_ods(file_path, dtypes=None, na_value=None, usecols=None):
+    """
+    Reads every sheet of an ODS file into DataFrames with native column types.
+
+    Instead of going through ezodf's object model, `content.xml` is streamed with lxml and each
+    cell is read from its `office:value-type` / `office:value` attributes. Columns are built as
+    int64, float64, datetime64, timedelta64, bool or string (object) arrays directly, so numbers
+    are never round-tripped through `str`. Integer columns with empty cells use pandas' nullable
+    `Int64`, and integers that do not fit in int64 (long numeric codes) are kept as exact strings
+    instead of being rounded through float64. Columns mixing several cell types are read as strings.
+
+    The first row of each sheet is used as the header.
+
+    Args:
+        file_path (str): Path to the ODS file.
+        dtypes (dict, optional): Per-column overrides mapping a column name to one of
+            'integer', 'float', 'datetime', 'timedelta', 'boolean' or 'string'. Cells that cannot
+            be converted to the requested kind become missing values.
+        na_value (optional): Value used for empty cells in string columns. Defaults to None.
+        usecols (list, optional): Column names and/or zero-based indexes to read, resolved against
+            the header of each sheet. Cells of other columns are skipped without being decoded.
+
+    Returns:
+        dict: Keys are sheet names (str), values are pandas DataFrames.
+
+    Raises:
+        ValueError: If a column in `usecols` is not in the header of a sheet.
+    """
+    return dict(iter_ods_chunks(file_path, dtypes=dtypes, na_value=na_value, usecols=usecols))
+
+
+def _column_index(reference):
+    """
+    Returns the zero-based column index of a cell reference such as 'AB12'.
+    """
+    index = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _string_item_text(item):
+    """
+    Returns the text of a shared or inline string, ignoring phonetic runs.
+    """
+    texts = list(item.iterchildren(XLSX_TEXT))
+    if not texts:
+        texts = [text for run in item.iterchildren(XLSX_RUN) for text in run.iterchildren(XLSX_TEXT)]
+    return ''.join(text.text or '' for text in texts)
+
+
+def _xlsx_shared_strings(archive):
+    """
+    Streams `xl/sharedStrings.xml` into a list of strings.
+    """
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as content:
+        for _, item in etree.iterparse(content, tag=XLSX_SHARED_STRING):
+            strings.append(_string_item_text(item))
+            item.clear()
+    return strings
+
+
+def _is_date_format(code):
+    """
+    Tells whether a custom number format code displays a date or a time.
+    """
+    code = re.sub(r'"[^"]*"|\\.|\[[^\]]*\]', '', code).lower()
+    return re.search(r'[dmyhs]', code) is not None
+
+
+def _xlsx_date_styles(archive):
+    """
+    Returns the indexes of the cell styles (the `s` attribute of a cell) that display dates.
+    """
+    if 'xl/styles.xml' not in archive.namelist():
+        return set()
+    styles = etree.parse(archive.open('xl/styles.xml')).getroot()
+    date_formats = set(XLSX_DATE_FORMATS)
+    for number_format in styles.iter(XLSX_NUMBER_FORMAT):
+        if _is_date_format(number_format.get('formatCode', '')):
+            date_formats.add(int(number_format.get('numFmtId')))
+    cell_formats = styles.find(XLSX_CELL_FORMATS)
+    if cell_formats is None:
+        return set()
+    return {index for index, cell_format in enumerate(cell_formats.iterchildren(XLSX_FORMAT))
+            if int(cell_format.get('numFmtId', '0')) in date_formats}
+
+
+def _xlsx_sheets(archive):
+    """
+    Returns the (sheet name, path inside the archive) pairs of a workbook, in workbook order,
+    and whether it uses the 1904 date system.
+    """
+    workbook = etree.parse(archive.open('xl/workbook.xml')).getroot()
+    relationships = etree.parse(archive.open('xl/_rels/workbook.xml.rels')).getroot()
+    targets = {relationship.get('Id'): relationship.get('Target')
+               for relationship in relationships.iter(XLSX_RELATIONSHIP)}
+
+    sheets = []
+    for sheet in workbook.iter(XLSX_SHEET):
+        target = targets[sheet.get(RELATIONSHIP_ID)]
+        path = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+        sheets.append((sheet.get('name'), path))
+
+    properties = workbook.find(XLSX_WORKBOOK_PROPERTIES)
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    return sheets, date1904
+
+
+def _read_xlsx_cell(cell, shared_strings, date_styles, epoch):
+    """
+    Reads a <c> element and returns a (kind, raw) tuple like `_read_cell`, or None when empty.
+    """
+    cell_type = cell.get('t')
+    if cell_type == 'inlineStr':
+        item = cell.find(XLSX_INLINE_STRING)
+        text = _string_item_text(item) if item is not None else ''
+        return ('string', text) if text != '' else None
+
+    value = cell.findtext(XLSX_VALUE)
+    if value is None or value == '':
+        return None
+    if cell_type == 's':
+        text = shared_strings[int(value)]
+        return ('string', text) if text != '' else None
+    if cell_type in ('str', 'e'):
+        return 'string', value
+    if cell_type == 'b':
+        return 'boolean', value
+    if cell_type == 'd':
+        return 'datetime', value
+    if int(cell.get('s', '0')) in date_styles:
+        return 'datetime', (epoch + timedelta(days=float(value))).isoformat()
+    return _classify_number(value), value
+
+
+def _iter_xlsx_row_cells(row, shared_strings, date_styles, epoch, selected=None):
+    """
+    Returns the cells of a <row> element placed at their column index, trimming trailing empty cells.
+
+    With `selected` (sorted column indexes), only those cells are decoded, placed at their
+    position in `selected`, and the rest of the row is skipped after the last selected column.
+    """
+    positions = {column: position for position, column in enumerate(selected)} if selected is not None else None
+    cells = []
+    index = -1
+    for cell in row.iterchildren(XLSX_CELL):
+        reference = cell.get('r')
+        index = _column_index(reference) if reference else index + 1
+        if positions is not None:
+            if index > selected[-1]:
+                break
+            if index not in positions:
+                continue
+        value = _read_xlsx_cell(cell, shared_strings, date_styles, epoch)
+        if positions is not None:
+            index = positions[index]
+        if value is None:
+            continue
+        if index > len(cells):
+            cells.extend([None] * (index - len(cells)))
+        if index < len(cells):
+            cells[index] = value
+        else:
+            cells.append(value)
+    return cells
+
+
+def iter_xlsx_chunks(file_path, chunk_size=None, dtypes=None, na_value=None, usecols=None):
+    """
+    Streams the sheets of an XLSX file as DataFrames of at most `chunk_size` rows.
+
+    The worksheet XML is parsed as a read-only, values-only row stream with lxml instead of
+    loading openpyxl's object model: shared strings are looked up by index, dates are detected
+    from the cell styles and every parsed row is released right away. Peak memory is the shared
+    strings table plus the rows of one chunk. Columns get native types as in `read_ods`.
+
+    Args:
+        file_path (str): Path to the XLSX file.
+        chunk_size (int, optional): Maximum number of rows per chunk. Defaults to one chunk per sheet.
+        dtypes (dict, optional): Per-column type overrides, see `read_ods`.
+        na_value (optional): Value used for empty cells in string columns, see `read_ods`.
+        usecols (list, optional): Column names and/or indexes to read, see `read_ods`.
+
+    Yields:
+        tuple: (sheet name, DataFrame). Every sheet yields at least one, possibly empty, DataFrame.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheets, date1904 = _xlsx_sheets(archive)
+        shared_strings = _xlsx_shared_strings(archive)
+        date_styles = _xlsx_date_styles(archive)
+        epoch = XLSX_EPOCH_1904 if date1904 else XLSX_EPOCH
+
+        for sheet_name, path in sheets:
+            with archive.open(path) as content:
+                for chunk in _iter_xlsx_sheet(content, shared_strings, date_styles, epoch,
+                                              chunk_size, dtypes, na_value, usecols):
+                    yield sheet_name, chunk
+
+
+def _iter_xlsx_sheet(content, shared_strings, date_styles, epoch, chunk_size=None, dtypes=None, na_value=None, usecols=None):
+    """
+    Streams one worksheet XML as DataFrames of at most `chunk_size` rows, see `iter_xlsx_chunks`.
+    """
+    builder = _SheetBuilder(usecols)
+    taken = False
+    last_row = 0
+    for _, row in etree.iterparse(content, tag=XLSX_ROW):
+        row_number = int(row.get('r', last_row + 1))
+        # Rows without cells are not written, keep them as empty rows
+        if builder.header is not None and row_number > last_row + 1:
+            builder.add_row([], row_number - last_row - 1)
+        last_row = row_number
+
+        cells = _iter_xlsx_row_cells(row, shared_strings, date_styles, epoch, builder.selected)
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+        # The empty rows of a gap are split at the chunk boundary like the repeated rows of ODS
+        repeat = 1
+        while repeat:
+            repeat = builder.add_row(cells, repeat, chunk_size)
+            if chunk_size and builder.n_rows >= chunk_size:
+                yield builder.take(dtypes, na_value)
+                taken = True
+    if builder.n_rows or not taken:
+        yield builder.take(dtypes, na_value)
+
+
+def read_xlsx(file_path, dtypes=None, na_value=None, usecols=None):
+    """
+    Reads every sheet of an XLSX file into DataFrames with native column types, see `iter_xlsx_chunks`.
+
+    Returns:
+        dict: Keys are sheet names (str), values are pandas DataFrames.
+    """
+    return dict(iter_xlsx_chunks(file_path, dtypes=dtypes, na_value=na_value, usecols=usecols))
+
+
+def _schema_columns(names, usecols):
+    """
+    Resolves `usecols` against the column names of a Parquet/Arrow schema, keeping file order.
+    """
+    if usecols is None:
+        return None
+    return [names[index] for index in _resolve_usecols(list(names), usecols)]
+
+
+def read_parquet(file_path, usecols=None):
+    """
+    Reads a Parquet file into a DataFrame, memory-mapping the file and decoding only `usecols`.
+
+    Args:
+        file_path (str): Path to the Parquet file.
+        usecols (list, optional): Column names and/or indexes to load. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The table stored in the file.
+    """
+    parquet_file = pq.ParquetFile(file_path, memory_map=True)
+    columns = _schema_columns(parquet_file.schema_arrow.names, usecols)
+    return parquet_file.read(columns=columns).to_pandas()
+
+
+def read_arrow(file_path, usecols=None):
+    """
+    Reads an Arrow IPC (Feather v2) file into a DataFrame.
+
+    The file is memory-mapped, so uncompressed columns are used in place without being parsed,
+    and only `usecols` are materialized.
+
+    Args:
+        file_path (str): Path to the Arrow IPC file.
+        usecols (list, optional): Column names and/or indexes to load. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The table stored in the file.
+    """
+    with pa.memory_map(file_path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+        if usecols is not None:
+            table = table.select(_schema_columns(table.schema.names, usecols))
+        return table.to_pandas()
+
+
+def read_workbook(file_path, dtypes=None, na_value=None, usecols=None, categories=None):
+    """
+    Reads a CSV (plain, gzip or zstd compressed), ODS, XLSX, Parquet or Arrow IPC file into a dictionary of DataFrames.
+
+    Single-table formats (CSV, Parquet, Arrow) are returned under the 'Sheet1' key.
+
+    Args:
+        file_path (str): Path to the file, the format is chosen from its extension.
+        dtypes (dict, optional): Per-column type overrides for ODS and XLSX files, see `read_ods`.
+        na_value (optional): Value used for empty cells in ODS and XLSX string columns, see `read_ods`.
+        usecols (list, optional): Column names and/or zero-based indexes to read. Other columns are
+            skipped by the parsers (ODS/XLSX cells are not decoded, Parquet/Arrow columns are not loaded).
+        categories (str or list, optional): Columns built as categoricals, or 'auto' to detect the
+            repetitive text columns, see `encode_categoricals`.
+
+    Returns:
+        dict: Keys are sheet names (str), values are pandas DataFrames.
+
+    Raises:
+        ValueError: If the file extension is not supported or a column in `usecols` does not exist.
+    """
+    if categories is not None:
+        sheets = read_workbook(file_path, dtypes, na_value, usecols)
+        return {sheet_name: encode_categoricals(df, categories) for sheet_name, df in sheets.items()}
+
+    extension = table_extension(file_path)
+    if extension == '.csv':
+        return {'Sheet1': read_csv(file_path, usecols=usecols)}
+    if extension in ('.ods', '.odt'):
+        return read_ods(file_path, dtypes=dtypes, na_value=na_value, usecols=usecols)
+    if extension == '.xlsx':
+        return read_xlsx(file_path, dtypes=dtypes, na_value=na_value, usecols=usecols)
+    if extension == '.xls':
+        return pd.read_excel(file_path, sheet_name=None, usecols=usecols)
+    if extension == '.parquet':
+        return {'Sheet1': read_parquet(file_path, usecols=usecols)}
+    if extension in ('.arrow', '.feather'):
+        return {'Sheet1': read_arrow(file_path, usecols=usecols)}
+    raise ValueError(f"Unsupported file format for '{file_path}'.")
+
+
+def read_csv(file_path, usecols=None, **kwargs):
+    """
+    Reads a CSV file with `pd.read_csv`, accepting `usecols` mixing column names and indexes.
+
+    gzip and zstd compressed files are detected from their content (see `detect_compression`),
+    whatever their extension.
+    """
+    kwargs.setdefault('compression', read_compression(file_path))
+    if usecols is not None and any(isinstance(column, int) for column in usecols):
+        header = pd.read_csv(file_path, nrows=0, compression=kwargs['compression']).columns.tolist()
+        usecols = [header[index] for index in _resolve_usecols(header, usecols)]
+    return pd.read_csv(file_path, usecols=usecols, **kwargs)
+
+
+def iter_chunks(file_path, chunk_size=100000, dtypes=None, na_value=None, usecols=None, categories=None):
+    """
+    Streams a CSV, ODS, XLSX, Parquet or Arrow IPC file as DataFrames of at most `chunk_size` rows.
+
+    Args:
+        file_path (str): Path to the file, the format is chosen from its extension.
+        chunk_size (int, optional): Maximum number of rows per chunk. Defaults to 100000.
+        dtypes (dict, optional): Per-column type overrides for ODS and XLSX files, see `read_ods`.
+        na_value (optional): Value used for empty cells in ODS and XLSX string columns, see `read_ods`.
+        usecols (list, optional): Column names and/or zero-based indexes to read, see `read_workbook`.
+        categories (str or list, optional): Columns built as categoricals, see `encode_categoricals`.
+            Each chunk has its own categories.
+
+    Yields:
+        tuple: (sheet name, DataFrame). Single-table formats use the 'Sheet1' sheet name.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    if categories is not None:
+        for sheet_name, chunk in iter_chunks(file_path, chunk_size, dtypes, na_value, usecols):
+            yield sheet_name, encode_categoricals(chunk, categories)
+        return
+
+    extension = table_extension(file_path)
+    if extension == '.csv':
+        for chunk in read_csv(file_path, usecols=usecols, chunksize=chunk_size):
+            yield 'Sheet1', chunk
+    elif extension in ('.ods', '.odt'):
+        yield from iter_ods_chunks(file_path, chunk_size, dtypes, na_value, usecols)
+    elif extension == '.xlsx':
+        yield from iter_xlsx_chunks(file_path, chunk_size, dtypes, na_value, usecols)
+    elif extension == '.parquet':
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        columns = _schema_columns(parquet_file.schema_arrow.names, usecols)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield 'Sheet1', batch.to_pandas()
+    elif extension in ('.arrow', '.feather'):
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            columns = _schema_columns(reader.schema.names, usecols)
+            for index in range(reader.num_record_batches):
+                table = pa.Table.from_batches([reader.get_batch(index)])
+                if columns is not None:
+                    table = table.select(columns)
+                for batch in table.to_batches(max_chunksize=chunk_size):
+                    yield 'Sheet1', batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported file format for '{file_path}'.")
+
+
+def _scan_ods_tables(content, block_size=1 << 20):
+    """
+    Scans the raw bytes of `content.xml` for its <table:table> elements without parsing the XML.
+
+    Returns:
+        tuple: The root start tag (bytes, it declares the namespaces the sheets use), and a list of
+        (sheet name, start offset, end offset) with the byte range of each top-level table.
+    """
+    buffer = b''
+    offset = 0
+    position = 0
+    root_tag = None
+    tables = []
+    depth = 0
+    start = name = None
+
+    while True:
+        block = content.read(block_size)
+        buffer += block
+        if root_tag is None:
+            match = re.search(rb'<[\w.-]+:document-content\b[^>]*>', buffer)
+            if match is None:
+                if not block:
+                    raise ValueError("content.xml has no document root")
+                continue
+            root_tag = match.group(0)
+            prefix = re.search(rb'xmlns:([\w.-]+)="' + re.escape(TABLE_NS.encode()) + b'"', root_tag).group(1)
+            table_tag = re.compile(rb'<(/?)' + re.escape(prefix) + rb':table(?=[\s>/])')
+            name_attribute = re.compile(re.escape(prefix) + rb':name="([^"]*)"')
+            position = match.end()
+
+        incomplete = False
+        for match in table_tag.finditer(buffer, position):
+            tag_end = buffer.find(b'>', match.end())
+            if tag_end == -1:
+                position = match.start()
+                incomplete = True
+                break
+            position = tag_end + 1
+            if match.group(1):
+                depth -= 1
+                if depth == 0:
+                    tables.append((name, start, offset + position))
+                continue
+            self_closing = buffer[tag_end - 1:tag_end] == b'/'
+            if depth == 0:
+                start = offset + match.start()
+                attribute = name_attribute.search(buffer, match.end(), tag_end)
+                name = saxutils.unescape(attribute.group(1).decode('utf-8'), {'&quot;': '"', '&apos;': "'"}) if attribute else None
+                if self_closing:
+                    tables.append((name, start, offset + position))
+            if not self_closing:
+                depth += 1
+
+        if not block:
+            return root_tag, tables
+        # Drop the scanned bytes, keeping an incomplete tag or a tail that may hold the start of one
+        keep = position if incomplete else max(position, len(buffer) - 64)
+        offset += keep
+        buffer = buffer[keep:]
+        position -= keep
+
+
+class _ByteRange:
+    """
+    File-like object that reads `prefix`, then `length` bytes of `stream`, then `suffix`.
+
+    Used to hand lxml a single sheet of `content.xml` wrapped in the document root tag, so the
+    namespace prefixes of the sheet still resolve.
+    """
+
+    def __init__(self, prefix, stream, length, suffix):
+        self.parts = [prefix]
+        self.stream = stream
+        self.remaining = length
+        self.suffix = suffix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = 1 << 20
+        if self.parts:
+            return self.parts.pop()
+        if self.remaining > 0:
+            data = self.stream.read(min(size, self.remaining))
+            self.remaining -= len(data)
+            if data:
+                return data
+            self.remaining = 0
+        if self.suffix:
+            data, self.suffix = self.suffix, b''
+            return data
+        return b''
+
+
+class Workbook(Mapping):
+    """
+    Read-only, lazy view of the sheets of a CSV, ODS, XLSX, Parquet or Arrow IPC file.
+
+    Opening a workbook only lists its sheet names: the sheet table of an XLSX, a quick byte scan
+    of `content.xml` for an ODS (which also records the byte range of every sheet). A sheet is
+    parsed when it is accessed, and for ODS only its own byte range is fed to the XML parser.
+    Sheets are not kept by the workbook: once the caller drops a DataFrame its memory is
+    released, accessing the sheet again while it is still referenced returns the same object.
+
+    It behaves like the dictionaries of DataFrames returned by `read_workbook`; `items()` and
+    `values()` parse one sheet at a time as they are iterated. A workbook sent to another process
+    keeps the sheet names and ODS byte ranges, so the file is not scanned again there.
+    """
+
+    def __init__(self, file_path, dtypes=None, na_value=None, usecols=None, categories=None):
+        self.file_path = file_path
+        self.dtypes = dtypes
+        self.na_value = na_value
+        self.usecols = usecols
+        self.categories = categories
+        self.extension = table_extension(file_path)
+        self._loaded = weakref.WeakValueDictionary()
+        self._xlsx = None
+
+        if self.extension in ('.ods', '.odt'):
+            with zipfile.ZipFile(file_path) as archive, archive.open('content.xml') as content:
+                self._root_tag, tables = _scan_ods_tables(content)
+            self._root_name = re.match(rb'<([\w.:-]+)', self._root_tag).group(1)
+            self._ranges = {name: (start, end) for name, start, end in tables}
+            self.sheet_names = [name for name, _, _ in tables]
+        elif self.extension == '.xlsx':
+            with zipfile.ZipFile(file_path) as archive:
+                sheets, self._date1904 = _xlsx_sheets(archive)
+            self._paths = dict(sheets)
+            self.sheet_names = [name for name, _ in sheets]
+        elif self.extension == '.xls':
+            self.sheet_names = list(pd.ExcelFile(file_path).sheet_names)
+        elif self.extension in ('.csv', '.parquet', '.arrow', '.feather'):
+            self.sheet_names = ['Sheet1']
+        else:
+            raise ValueError(f"Unsupported file format for '{file_path}'.")
+
+    def __getstate__(self):
+        # Parsed sheets and the XLSX shared strings stay in the process that loaded them
+        state = dict(self.__dict__)
+        state['_loaded'] = None
+        state['_xlsx'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._loaded = weakref.WeakValueDictionary()
+
+    def __getitem__(self, sheet_name):
+        if sheet_name not in self.sheet_names:
+            raise KeyError(sheet_name)
+        df = self._loaded.get(sheet_name)
+        if df is None:
+            df = self._parse(sheet_name)
+            if self.categories is not None:
+                df = encode_categoricals(df, self.categories)
+            self._loaded[sheet_name] = df
+        return df
+
+    def __iter__(self):
+        return iter(self.sheet_names)
+
+    def __len__(self):
+        return len(self.sheet_names)
+
+    def items(self):
+        """
+        Yields (sheet name, DataFrame) pairs, parsing each sheet only when it is reached.
+        """
+        for sheet_name in self.sheet_names:
+            yield sheet_name, self[sheet_name]
+
+    def values(self):
+        for _, df in self.items():
+            yield df
+
+    def first(self):
+        """
+        Returns the first sheet, parsing only that one.
+        """
+        return self[self.sheet_names[0]]
+
+    def iter_chunks(self, sheet_name, chunk_size=100000):
+        """
+        Streams one sheet as DataFrames of at most `chunk_size` rows.
+        """
+        if sheet_name not in self.sheet_names:
+            raise KeyError(sheet_name)
+        if self.extension in ('.ods', '.odt'):
+            start, end = self._ranges[sheet_name]
+            with zipfile.ZipFile(self.file_path) as archive, archive.open('content.xml') as content:
+                content.seek(start)
+                sheet = _ByteRange(self._root_tag, content, end - start, b'</' + self._root_name + b'>')
+                for _, chunk in _iter_ods_tables(sheet, chunk_size, self.dtypes, self.na_value, self.usecols):
+                    yield chunk
+        elif self.extension == '.xlsx':
+            with zipfile.ZipFile(self.file_path) as archive:
+                if self._xlsx is None:
+                    epoch = XLSX_EPOCH_1904 if self._date1904 else XLSX_EPOCH
+                    self._xlsx = (_xlsx_shared_strings(archive), _xlsx_date_styles(archive), epoch)
+                shared_strings, date_styles, epoch = self._xlsx
+                with archive.open(self._paths[sheet_name]) as content:
+                    yield from _iter_xlsx_sheet(content, shared_strings, date_styles, epoch,
+                                                chunk_size, self.dtypes, self.na_value, self.usecols)
+        elif self.extension == '.xls':
+            yield pd.read_excel(self.file_path, sheet_name=sheet_name, usecols=self.usecols)
+        else:
+            for _, chunk in iter_chunks(self.file_path, chunk_size, usecols=self.usecols):
+                yield chunk
+
+    def _parse(self, sheet_name):
+        if self.extension in ('.csv', '.parquet', '.arrow', '.feather', '.xls'):
+            if self.extension == '.xls':
+                return pd.read_excel(self.file_path, sheet_name=sheet_name, usecols=self.usecols)
+            return read_workbook(self.file_path, usecols=self.usecols)['Sheet1']
+        chunks = list(self.iter_chunks(sheet_name, chunk_size=None))
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+
+
+def open_workbook(file_path, dtypes=None, na_value=None, usecols=None, categories=None):
+    """
+    Opens a lazy `Workbook`: sheet names are listed right away, sheets are parsed on access.
+
+    Args:
+        file_path (str): Path to the file, the format is chosen from its extension.
+        dtypes (dict, optional): Per-column type overrides for ODS and XLSX files, see `read_ods`.
+        na_value (optional): Value used for empty cells in ODS and XLSX string columns, see `read_ods`.
+        usecols (list, optional): Column names and/or zero-based indexes to read, see `read_workbook`.
+        categories (str or list, optional): Columns built as categoricals, or 'auto' to detect the
+            repetitive text columns, see `encode_categoricals`.
+
+    Returns:
+        Workbook: Mapping of sheet names to DataFrames.
+    """
+    return Workbook(file_path, dtypes=dtypes, na_value=na_value, usecols=usecols, categories=categories)
+
+
+class _SharedStrings:
+    """
+    Shared strings table of an XLSX archive parsed on demand, only up to the highest index looked
+    up so far. Excel writes the table in order of first use, so the first rows of a sheet only need
+    its beginning. The archive must stay open while the table is used.
+    """
+
+    def __init__(self, archive):
+        self.strings = []
+        self._items = None
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            self._items = etree.iterparse(archive.open('xl/sharedStrings.xml'), tag=XLSX_SHARED_STRING)
+
+    def __getitem__(self, index):
+        while index >= len(self.strings) and self._items is not None:
+            try:
+                _, item = next(self._items)
+            except StopIteration:
+                self._items = None
+                break
+            self.strings.append(_string_item_text(item))
+            item.clear()
+        return self.strings[index]
+
+
+def preview(file_path, n_rows=50, sheets=1):
+    """
+    Reads the header and the first `n_rows` rows of a CSV, ODS, XLSX, Parquet or Arrow IPC file.
+
+    Parsing stops as soon as the rows are read: the XML stream of an ODS or XLSX sheet is closed
+    after them, and XLSX shared strings are only decoded up to the ones those rows use. The time
+    does not depend on the size of the file, which makes it cheap enough to check column names
+    before a full run.
+
+    Args:
+        file_path (str): Path to the file, the format is chosen from its extension.
+        n_rows (int): Number of data rows read from each sheet. Defaults to 50.
+        sheets (int, optional): Number of sheets previewed, in workbook order. None previews them
+            all; beyond the first sheet of an ODS file, `content.xml` is byte-scanned to find the
+            sheets (see `Workbook`), which reads the whole file but parses none of it.
+
+    Returns:
+        dict: Keys are sheet names (str), values are DataFrames of at most `n_rows` rows. Their
+        columns are the headers and their dtypes the types inferred from those rows.
+
+    Raises:
+        ValueError: If the file extension is not supported.
+    """
+    n_rows = max(n_rows, 1)
+    extension = table_extension(file_path)
+    if extension == '.csv':
+        return {'Sheet1': read_csv(file_path, nrows=n_rows)}
+    if extension == '.xls':
+        sheet_names = pd.ExcelFile(file_path).sheet_names[:sheets]
+        return pd.read_excel(file_path, sheet_name=sheet_names, nrows=n_rows)
+    if extension == '.parquet':
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        batch = next(parquet_file.iter_batches(batch_size=n_rows), None)
+        return {'Sheet1': (parquet_file.schema_arrow.empty_table() if batch is None else batch).to_pandas()}
+    if extension in ('.arrow', '.feather'):
+        with pa.memory_map(file_path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            table = pa.Table.from_batches([reader.get_batch(0)]) if reader.num_record_batches else reader.schema.empty_table()
+            return {'Sheet1': table.slice(0, n_rows).to_pandas()}
+
+    previews = {}
+    if extension in ('.ods', '.odt'):
+        if sheets == 1:
+            with zipfile.ZipFile(file_path) as archive, archive.open('content.xml') as content:
+                for sheet_name, chunk in _iter_ods_tables(content, chunk_size=n_rows):
+                    return {sheet_name: chunk}
+            return previews
+        # Later sheets are found with the byte scan of `Workbook` and only their start is parsed
+        workbook = Workbook(file_path)
+        for sheet_name in workbook.sheet_names[:sheets]:
+            previews[sheet_name] = next(workbook.iter_chunks(sheet_name, chunk_size=n_rows))
+        return previews
+    if extension == '.xlsx':
+        with zipfile.ZipFile(file_path) as archive:
+            sheet_paths, date1904 = _xlsx_sheets(archive)
+            shared_strings = _SharedStrings(archive)
+            date_styles = _xlsx_date_styles(archive)
+            epoch = XLSX_EPOCH_1904 if date1904 else XLSX_EPOCH
+            for sheet_name, path in sheet_paths[:sheets]:
+                with archive.open(path) as content:
+                    previews[sheet_name] = next(_iter_xlsx_sheet(content, shared_strings, date_styles, epoch, chunk_size=n_rows))
+        return previews
+    raise ValueError(f"Unsupported file format for '{file_path}'.")
+
+
+def read_text_table(file_path):
+    """
+    Reads the first sheet of a file with every column of a CSV, ODS or XLSX file as text, so codes
+    such as '0001' keep their leading zeros instead of being inferred as numbers. Parquet and Arrow
+    files keep the types they were written with.
+
+    Returns:
+        pd.DataFrame: The rows of the first sheet, empty cells as missing values.
+    """
+    extension = table_extension(file_path)
+    if extension == '.csv':
+        return read_csv(file_path, dtype=str, keep_default_na=False, na_values=[''])
+    if extension in ('.ods', '.odt', '.xlsx'):
+        header = next(iter(preview(file_path, n_rows=1).values())).columns
+        return open_workbook(file_path, dtypes={column: 'string' for column in header}).first()
+    return open_workbook(file_path).first()
+
+
+def validate_columns(file_path, columns, sheets=1):
+    """
+    Checks that `columns` are in the header of a file, reading only a `preview` of it.
+
+    Args:
+        file_path (str): Path to the file.
+        columns (list): Column names and/or zero-based indexes.
+        sheets (int, optional): Number of sheets checked, see `preview`. Defaults to the first one.
+
+    Raises:
+        ValueError: If a column is missing, the message lists the missing and the available columns.
+    """
+    for sheet_name, df in preview(file_path, n_rows=1, sheets=sheets).items():
+        header = [str(column) for column in df.columns]
+        missing = [str(column) for column in columns
+                   if not (isinstance(column, int) and 0 <= column < len(header)) and str(column) not in header]
+        if missing:
+            raise ValueError(f"Column(s) {', '.join(repr(column) for column in missing)} not found in "
+                             f"'{os.path.basename(file_path)}' (sheet '{sheet_name}'). Available: {', '.join(header)}")
+
+
+def _load_to_arrow(file_path, directory, dtypes=None, na_value=None, usecols=None, categories=None):
+    """
+    Process pool task of `load_workbooks`: parses every sheet of `file_path` and stores each one as
+    an uncompressed Arrow IPC file in `directory`.
+
+    Returns:
+        list: (sheet name, Arrow file path) pairs, in sheet order.
+    """
+    sheets = []
+    for index, (sheet_name, df) in enumerate(open_workbook(file_path, dtypes, na_value, usecols, categories).items()):
+        arrow_path = os.path.join(directory, f"{os.getpid()}_{index}.arrow")
+        write_arrow(df, arrow_path)
+        sheets.append((sheet_name, arrow_path))
+    return sheets
+
+
+def load_workbooks(requests, workers=None):
+    """
+    Reads several files at the same time, one process per file.
+
+    Each process parses its file and writes the sheets as uncompressed Arrow IPC files to a
+    temporary directory (in /dev/shm when available, so they stay in memory). The parent
+    memory-maps them back instead of receiving pickled DataFrames, so the load takes about as
+    long as the slowest file.
+
+    Args:
+        requests (dict): Keys are names chosen by the caller, values are a file path or a tuple
+            (file path, options) where options are the keyword arguments of `open_workbook`.
+        workers (int, optional): Maximum number of processes. Defaults to one per file.
+
+    Returns:
+        dict: Same keys as `requests`, values are dictionaries of sheet names and DataFrames.
+    """
+    requests = {key: request if isinstance(request, tuple) else (request, {}) for key, request in requests.items()}
+    directory = tempfile.mkdtemp(prefix='workbooks_', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or len(requests) or 1) as executor:
+            futures = {key: executor.submit(_load_to_arrow, file_path, directory, **options)
+                       for key, (file_path, options) in requests.items()}
+            return {key: {sheet_name: read_arrow(arrow_path) for sheet_name, arrow_path in future.result()}
+                    for key, future in futures.items()}
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
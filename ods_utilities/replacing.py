@@ -0,0 +1,130 @@
+import pandas as pd
+
+
+class ReplaceAutomaton:
+    """
+    Aho-Corasick automaton that rewrites the occurrences of many patterns in a text in one scan.
+
+    Matches follow leftmost-longest semantics: the scan replaces the match that starts first, the
+    longest pattern when several start at the same position, and continues after it, so replaced
+    text is never matched again. The result does not depend on the order of the pairs, unlike
+    chaining one `str.replace` per pair.
+
+    Usage:
+        automaton = ReplaceAutomaton({'Av.': 'Avenida', 'Av': 'Ave', 'Col.': 'Colonia'})
+        automaton.replace('Av. Juárez, Col. Centro')  # 'Avenida Juárez, Colonia Centro'
+    """
+
+    def __init__(self, pairs):
+        """
+        Args:
+            pairs (dict): Text to find -> replacement. Empty patterns are ignored.
+        """
+        # Trie: children of every node, depth of every node, and the pattern that ends at it
+        self._children = [{}]
+        self._depth = [0]
+        self._replacement = [None]
+        for pattern, replacement in pairs.items():
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                child = self._children[node].get(char)
+                if child is None:
+                    child = len(self._children)
+                    self._children[node][char] = child
+                    self._children.append({})
+                    self._depth.append(self._depth[node] + 1)
+                    self._replacement.append(None)
+                node = child
+            self._replacement[node] = replacement
+
+        # Failure links (breadth first) and, for every node, the longest pattern that is a suffix
+        # of the node's text, with its length
+        self._fail = [0] * len(self._children)
+        self._longest = [(self._depth[node], node) if self._replacement[node] is not None else None
+                         for node in range(len(self._children))]
+        queue = list(self._children[0].values())
+        for node in queue:
+            for char, child in self._children[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._children[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._children[fail].get(char, 0)
+                if self._longest[child] is None:
+                    self._longest[child] = self._longest[self._fail[child]]
+                queue.append(child)
+        self.size = sum(replacement is not None for replacement in self._replacement)
+
+    def replace(self, text):
+        """
+        Returns `text` with every leftmost-longest match replaced.
+        """
+        children, fail, depth, longest = self._children, self._fail, self._depth, self._longest
+        parts = []
+        emitted = 0  # Start of the text not yet copied to `parts`
+        node = 0
+        position = 0
+        best = None  # (start, end, node) of the best match found since `emitted`
+        length = len(text)
+        while position < length:
+            char = text[position]
+            while node and char not in children[node]:
+                node = fail[node]
+            node = children[node].get(char, 0)
+            position += 1
+
+            match = longest[node]
+            if match is not None:
+                start = position - match[0]
+                if best is None or start < best[0] or (start == best[0] and position > best[1]):
+                    best = (start, position, match[1])
+
+            # No match still to come can start at or before the best one: replace it and restart
+            # the scan right after it
+            if best is not None and (position - depth[node] > best[0] or position == length):
+                parts.append(text[emitted:best[0]])
+                parts.append(self._replacement[best[2]])
+                emitted = position = best[1]
+                node = 0
+                best = None
+        if not parts:
+            return text
+        parts.append(text[emitted:])
+        return ''.join(parts)
+
+
+def load_pairs(df, find_column, replace_column):
+    """
+    Builds the find -> replace dictionary from the rows of a sheet. Rows without a text to find
+    are skipped, a missing replacement deletes the text, and when a text is repeated the last row wins.
+    """
+    pairs = {}
+    for find, replacement in zip(df[find_column], df[replace_column]):
+        if pd.isna(find) or str(find) == '':
+            continue
+        pairs[str(find)] = '' if pd.isna(replacement) else str(replacement)
+    return pairs
+
+
+def replace_columns(df, automaton, columns):
+    """
+    Rewrites the text columns of a DataFrame with a `ReplaceAutomaton`.
+
+    Each column is factorized and only its unique string values are scanned, numbers, dates and
+    missing values are left untouched.
+
+    Args:
+        df (pd.DataFrame): DataFrame to rewrite, modified in place.
+        automaton (ReplaceAutomaton): The find/replace pairs.
+        columns (list): Columns to rewrite.
+
+    Returns:
+        pd.DataFrame: The rewritten DataFrame.
+    """
+    for column in columns:
+        codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        uniques = pd.Series(uniques).astype(object)
+        replaced = uniques.map(lambda value: automaton.replace(value) if isinstance(value, str) else value)
+        df[column] = pd.Series(replaced.array.take(codes), index=df.index, name=column)
+    return df
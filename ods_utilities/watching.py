@@ -0,0 +1,153 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# inotify events of a file that is complete: closed after writing, or moved into the directory
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = os.O_NONBLOCK
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Catalog:
+    """
+    A reference file parsed once and kept in memory, with whatever lookup structures `loader`
+    builds from it. The file is parsed again only when its modification time changes.
+
+    Catalogs are shared by the worker threads, a reload happens once while the other threads wait.
+
+    Usage:
+        cities = Catalog('res_city.ods', lambda path: read_cities(path, column_keys))
+        cities.get()
+    """
+
+    def __init__(self, file_path, loader):
+        self.file_path = file_path
+        self.loader = loader
+        self._mtime = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        mtime = os.stat(self.file_path).st_mtime_ns
+        with self._lock:
+            if mtime != self._mtime:
+                start = time.perf_counter()
+                self._value = self.loader(self.file_path)
+                self._mtime = mtime
+                logger.info("Loaded %s in %.2fs", os.path.basename(self.file_path), time.perf_counter() - start)
+            return self._value
+
+
+def _is_candidate(name):
+    """
+    Skips hidden and temporary files: partial files of `atomic_output`, office lock files.
+    """
+    return not name.startswith(('.', '~$')) and not name.endswith(('.tmp', '.part'))
+
+
+class _Inotify:
+    """
+    Minimal inotify binding through ctypes, reports files closed after writing or moved into
+    the watched directories.
+    """
+
+    def __init__(self, directories):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = {}
+        for directory in directories:
+            descriptor = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if descriptor < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self._directories[descriptor] = directory
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buffer = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        paths = []
+        offset = 0
+        while offset < len(buffer):
+            descriptor, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+            if descriptor in self._directories and name:
+                paths.append(os.path.join(self._directories[descriptor], name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    Reports the new files of a set of directories, with inotify on Linux and by polling elsewhere
+    (or when `polling` is set, e.g. for network shares where inotify sees no events).
+
+    Files already in the directories are reported on the first call. When polling, a file is
+    reported once its size and modification time are the same on two consecutive scans, so a
+    file still being copied is not picked up; with inotify the close or move event is enough.
+    """
+
+    def __init__(self, directories, interval=1.0, polling=False):
+        self.directories = list(directories)
+        self.interval = interval
+        self._inotify = None
+        self._pending = {}
+        self._started = False
+        if not polling:
+            try:
+                self._inotify = _Inotify(self.directories)
+            except (OSError, AttributeError) as e:
+                logger.info("inotify not available (%s), polling every %ss", e, interval)
+        logger.info("Watching %s with %s", ', '.join(self.directories), 'inotify' if self._inotify else 'polling')
+
+    def _scan(self):
+        files = {}
+        for directory in self.directories:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and _is_candidate(entry.name):
+                        stat = entry.stat()
+                        files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def poll(self):
+        """
+        Waits up to `interval` seconds and returns the paths of the new complete files.
+        """
+        if not self._started:
+            self._started = True
+            return sorted(self._scan())
+
+        if self._inotify is not None:
+            paths = self._inotify.wait(self.interval)
+            return [path for path in dict.fromkeys(paths) if _is_candidate(os.path.basename(path)) and os.path.isfile(path)]
+
+        time.sleep(self.interval)
+        current = self._scan()
+        stable = [path for path, signature in current.items() if self._pending.get(path) == signature]
+        self._pending = {path: signature for path, signature in current.items() if path not in stable}
+        return sorted(stable)
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
@@ -0,0 +1,332 @@
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from ods_utilities.compression import CsvWriter, split_extension, write_csv
+from ods_utilities.xlsx import XlsxWriter, write_xlsx
+
+
+# Output formats accepted by the scripts' --format option and the extension of each one
+OUTPUT_EXTENSIONS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'csv.zst': '.csv.zst',
+    'ods': '.ods',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+    'xlsx': '.xlsx',
+}
+
+# Writers of `write_table` and `TableWriter`, ODS is written by each script
+TABLE_FORMATS = ('csv', 'csv.gz', 'csv.zst', 'parquet', 'arrow', 'xlsx')
+
+# CSV formats and their compression, see `CsvWriter`
+CSV_FORMATS = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd'}
+
+
+def pop_format_option(args, default):
+    """
+    Removes a `--format=<format>` (or `--format <format>`) option from a list of command line arguments.
+    `--output-format` is accepted as well.
+
+    Args:
+        args (list): Command line arguments, modified in place.
+        default (str): Format used when the option is not given.
+
+    Returns:
+        str: The requested output format.
+
+    Raises:
+        ValueError: If the format is not one of `OUTPUT_EXTENSIONS`.
+    """
+    output_format = default
+    for index, arg in enumerate(args):
+        option, _, value = arg.partition('=')
+        if option not in ('--format', '--output-format'):
+            continue
+        if value:
+            args.pop(index)
+            output_format = value
+            break
+        if index + 1 < len(args):
+            args.pop(index)
+            output_format = args.pop(index)
+            break
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise ValueError(f"Unsupported output format '{output_format}'. Use one of: {', '.join(OUTPUT_EXTENSIONS)}")
+    return output_format
+
+
+def with_extension(file_path, output_format):
+    """
+    Replaces the extension of `file_path` (with its compression suffix, see `split_extension`) with
+    the one of `output_format`.
+    """
+    return split_extension(file_path)[0] + OUTPUT_EXTENSIONS[output_format]
+
+
+def result_path(output_file_name, output_format, input_file_name, suffix):
+    """
+    Returns the path the result is written to: the output file itself, with the extension of
+    `output_format`. When that is the input file, `suffix` is added before the extension so the
+    input is never overwritten.
+    """
+    output_path = with_extension(output_file_name, output_format)
+    if os.path.realpath(output_path) == os.path.realpath(input_file_name):
+        output_path = suffix.join(split_extension(output_path))
+    return output_path
+
+
+def to_arrow_table(df):
+    """
+    Converts a DataFrame to an Arrow table, turning object columns that mix strings and numbers
+    (e.g. mapped values with an original-value fallback) into strings so they have a single type.
+    """
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True) in ('mixed', 'mixed-integer')]
+    if mixed:
+        df = df.copy()
+        for column in mixed:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    df = df.set_axis([str(column) for column in df.columns], axis=1)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_parquet(df, output_path):
+    """
+    Writes a DataFrame to a Parquet file.
+    """
+    pq.write_table(to_arrow_table(df), output_path)
+
+
+def write_arrow(df, output_path):
+    """
+    Writes a DataFrame to an uncompressed Arrow IPC file, so readers can memory-map it without decoding.
+    """
+    table = to_arrow_table(df)
+    with pa.OSFile(output_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _partial_path(output_path):
+    """
+    Returns the temporary path a file is written to before it is renamed over `output_path`, next
+    to it and with the same extension. A killed run may have left it behind, it is removed.
+    """
+    directory, name = os.path.split(os.path.abspath(output_path))
+    stem, extension = split_extension(name)
+    temp_path = os.path.join(directory, f".{stem}.partial-{os.getpid()}{extension}")
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    return temp_path
+
+
+@contextmanager
+def atomic_output(output_path):
+    """
+    Yields a temporary path next to `output_path` to write a file to, and renames it over
+    `output_path` once the block finishes. Readers never see a half-written file, and an error
+    (or a killed process) leaves the previous file in place. The temporary file keeps the
+    extension, writers that pick the format from it still work.
+
+    Usage:
+        with atomic_output('res_colony.ods') as temp_path:
+            save_data(temp_path, sheet_data)
+    """
+    temp_path = _partial_path(output_path)
+    try:
+        yield temp_path
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_table(df, output_path, output_format):
+    """
+    Writes a DataFrame as CSV (gzip or zstd compressed with 'csv.gz' and 'csv.zst', see
+    `CsvWriter`), Parquet, Arrow IPC or XLSX, atomically (see `atomic_output`).
+
+    ODS outputs are still written by each script, since each one has its own conversion rules.
+
+    Args:
+        df (pd.DataFrame): Data to write.
+        output_path (str): Path of the output file.
+        output_format (str): One of `TABLE_FORMATS`.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if output_format not in TABLE_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'.")
+    with atomic_output(output_path) as temp_path:
+        if output_format in CSV_FORMATS:
+            write_csv(df, temp_path, CSV_FORMATS[output_format])
+        elif output_format == 'parquet':
+            write_parquet(df, temp_path)
+        elif output_format == 'xlsx':
+            write_xlsx(df, temp_path)
+        else:
+            write_arrow(df, temp_path)
+
+
+class TableWriter:
+    """
+    Writes a table chunk by chunk as CSV (plain or compressed, see `CsvWriter`), Parquet, Arrow IPC
+    or XLSX (see `XlsxWriter`), so outputs larger than memory can be produced from streamed DataFrames.
+
+    The schema of Parquet and Arrow outputs is taken from the first chunk (columns that are empty in
+    it are written as strings), later chunks are cast to it. A column of a later chunk that does not
+    cast (e.g. text in a column that was all NaN, so float64, in the first chunk) widens the column
+    to float64 for numbers or to string otherwise, as `to_arrow_table` does for mixed columns, and
+    the rows already written are rewritten with the wider schema.
+
+    Chunks are written to a temporary file that is renamed over `output_path` when the writer is
+    closed, as `atomic_output` does, so the output may be the file the chunks are read from. An
+    error leaves the previous file in place, and a writer that got no chunk writes no file.
+
+    Usage:
+        with TableWriter(output_path, 'parquet') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, output_path, output_format):
+        if output_format not in TABLE_FORMATS:
+            raise ValueError(f"Unsupported output format '{output_format}'.")
+        self.output_path = output_path
+        self.output_format = output_format
+        self.schema = None
+        self._temp_path = _partial_path(output_path)
+        self._sink = None
+        self._writer = None
+
+    def write(self, df):
+        if self.output_format in CSV_FORMATS:
+            if self._writer is None:
+                self._writer = CsvWriter(self._temp_path, CSV_FORMATS[self.output_format])
+                self.schema = True
+            self._writer.write(df)
+            return
+        if self.output_format == 'xlsx':
+            if self._writer is None:
+                self._writer = XlsxWriter(self._temp_path)
+                self.schema = True
+            self._writer.write(df)
+            return
+
+        table = to_arrow_table(df)
+        if self.schema is None:
+            self.schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                     for field in table.schema], metadata=table.schema.metadata)
+            self._open()
+        # Conforming may widen the schema and reopen the writer
+        table = self._conform(table)
+        self._writer.write_table(table)
+
+    def _open(self):
+        if self.output_format == 'parquet':
+            self._writer = pq.ParquetWriter(self._temp_path, self.schema)
+        else:
+            self._sink = pa.OSFile(self._temp_path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def _conform(self, table):
+        """
+        Casts a chunk to the schema of the first one, widening the columns that don't cast (see
+        `_widen`). Empty strings become nulls in non-string columns, a chunk whose cells are all
+        empty is read as text.
+        """
+        columns = []
+        widened = {}
+        for field in self.schema:
+            column = table.column(field.name)
+            if column.type != field.type:
+                if pa.types.is_string(column.type) and not pa.types.is_string(field.type):
+                    column = pc.if_else(pc.equal(column, ''), pa.scalar(None, column.type), column)
+                try:
+                    column = column.cast(field.type)
+                except pa.ArrowException:
+                    if pa.types.is_string(field.type):
+                        raise
+                    numbers = all(pa.types.is_integer(kind) or pa.types.is_floating(kind) for kind in (field.type, column.type))
+                    widened[field.name] = pa.float64() if numbers else pa.string()
+            columns.append(column)
+        if widened:
+            self._widen(widened)
+            return self._conform(table)
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def _widen(self, types):
+        """
+        Changes the type of some columns of the schema and rewrites the rows written so far with it.
+
+        Args:
+            types (dict): New Arrow type of each widened column.
+        """
+        schema = self.schema
+        for name, data_type in types.items():
+            index = schema.get_field_index(name)
+            schema = schema.set(index, schema.field(index).with_type(data_type))
+        # The pandas metadata still describes the old types
+        self.schema = schema.remove_metadata()
+
+        self._close_file()
+        previous_path = f"{self._temp_path}.previous"
+        os.replace(self._temp_path, previous_path)
+        try:
+            self._open()
+            if self.output_format == 'parquet':
+                with pq.ParquetFile(previous_path) as previous:
+                    for batch in previous.iter_batches():
+                        self._writer.write_table(pa.Table.from_batches([batch]).cast(self.schema))
+            else:
+                with pa.memory_map(previous_path, 'r') as source:
+                    reader = pa.ipc.open_file(source)
+                    for index in range(reader.num_record_batches):
+                        self._writer.write_table(pa.Table.from_batches([reader.get_batch(index)]).cast(self.schema))
+        finally:
+            os.remove(previous_path)
+
+    def _close_file(self):
+        try:
+            if self._writer is not None:
+                self._writer.close()
+        finally:
+            if self._sink is not None:
+                self._sink.close()
+            self._writer = self._sink = None
+
+    def close(self):
+        """
+        Finishes the output and renames it over `output_path`.
+        """
+        try:
+            self._close_file()
+            if os.path.exists(self._temp_path):
+                os.replace(self._temp_path, self.output_path)
+        finally:
+            self.discard()
+
+    def discard(self):
+        """
+        Closes the writer without touching `output_path`, removing what was written.
+        """
+        try:
+            self._close_file()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
@@ -0,0 +1,256 @@
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+
+# Rows of an XLSX worksheet, header included. Longer tables continue in a new sheet
+XLSX_MAX_ROWS = 1_048_576
+
+XLSX_EPOCH = datetime(1899, 12, 30)
+
+# Deflate level of the archive entries: the sheet XML is very repetitive, level 1 already
+# compresses it well and is several times faster than the default
+COMPRESS_LEVEL = 1
+
+# Characters not allowed in XML 1.0, removed from the strings
+ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Cell styles of `STYLES`: dates with time and dates
+DATETIME_STYLE = 1
+DATE_STYLE = 2
+
+MAIN_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+STYLES = (
+    f'{XML_DECLARATION}<styleSheet xmlns="{MAIN_NAMESPACE}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+EMPTY_CELL = '<c/>'
+
+
+def _sheet_title(name):
+    """
+    Makes a valid worksheet name: at most 31 characters, without []:*?/\\
+    """
+    return re.sub(r'[\[\]:*?/\\]', '_', str(name))[:31] or 'Sheet1'
+
+
+def _inline_string(text):
+    text = escape(ILLEGAL_CHARACTERS.sub('', text))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _serial(value):
+    """
+    Returns the Excel serial number (days since 1899-12-30) of a date or a datetime.
+    """
+    if isinstance(value, datetime):
+        return (value.replace(tzinfo=None) - XLSX_EPOCH).total_seconds() / 86400
+    return (value - XLSX_EPOCH.date()).days
+
+
+def _cell(value):
+    """
+    Returns the <c> element of a value: booleans, numbers, dates and datetimes keep their type,
+    anything else is written as an inline string.
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        return f'<c><v>{float(value)!r}</v></c>' if np.isfinite(value) else EMPTY_CELL
+    if isinstance(value, datetime):
+        return f'<c s="{DATETIME_STYLE}"><v>{_serial(value)!r}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{DATE_STYLE}"><v>{_serial(value)}</v></c>'
+    return _inline_string(str(value))
+
+
+class XlsxWriter:
+    """
+    Write-only XLSX writer that streams rows to the worksheet XML as they are written, for outputs
+    of any size with constant memory (no workbook object model as with openpyxl and `to_excel`).
+
+    Cells are formatted to XML column by column (text columns once per distinct value) and the
+    rows are assembled from the formatted cells, then compressed into the archive right away.
+    Strings are written inline, so nothing has to be kept until the end, except for categorical
+    columns: their categories go once to the shared strings table and their cells only store an
+    index. Tables with more rows than a sheet holds continue in new sheets (`<sheet_name> (2)`,
+    ...) with the same header.
+
+    Usage:
+        with XlsxWriter('output.xlsx') as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    """
+
+    def __init__(self, output_path, sheet_name='Sheet1'):
+        self.output_path = output_path
+        self.sheet_name = _sheet_title(sheet_name)
+        self.columns = None
+        self._archive = zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL)
+        self._sheets = []
+        self._sheet = None
+        self._row = 0
+        self._shared_strings = {}
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = [str(column) for column in df.columns]
+        if self._sheet is None:
+            self._open_sheet()
+        start = 0
+        while start < len(df):
+            if self._row >= XLSX_MAX_ROWS:
+                self._close_sheet()
+                self._open_sheet()
+            stop = start + XLSX_MAX_ROWS - self._row
+            self._write_rows(df.iloc[start:stop])
+            start = stop
+
+    def _open_sheet(self):
+        number = len(self._sheets) + 1
+        name = self.sheet_name if number == 1 else _sheet_title(f"{self.sheet_name[:24]} ({number})")
+        self._sheets.append(name)
+        self._sheet = self._archive.open(f'xl/worksheets/sheet{number}.xml', 'w', force_zip64=True)
+        header = ''.join(_inline_string(column) for column in self.columns or [])
+        self._sheet.write(f'{XML_DECLARATION}<worksheet xmlns="{MAIN_NAMESPACE}"><sheetData>'
+                          f'<row r="1">{header}</row>'.encode())
+        self._row = 1
+
+    def _close_sheet(self):
+        self._sheet.write(b'</sheetData></worksheet>')
+        self._sheet.close()
+        self._sheet = None
+
+    def _column_cells(self, series):
+        """
+        Returns the <c> elements of a column as an object array. Numbers and datetimes are
+        formatted in one pass over the column, other columns format every distinct value once.
+        """
+        dtype = series.dtype
+        if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+            return np.array([f'<c><v>{value}</v></c>' for value in series.tolist()], dtype=object)
+        if pd.api.types.is_float_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+            values = series.to_numpy()
+            cells = np.full(len(values), EMPTY_CELL, dtype=object)
+            finite = np.isfinite(values)
+            cells[finite] = [f'<c><v>{value!r}</v></c>' for value in values[finite].tolist()]
+            return cells
+        if pd.api.types.is_datetime64_dtype(dtype):
+            values = series.to_numpy()
+            cells = np.full(len(values), EMPTY_CELL, dtype=object)
+            present = ~np.isnat(values)
+            serials = (values[present] - np.datetime64(XLSX_EPOCH, 'ns')) / np.timedelta64(1, 'D')
+            cells[present] = [f'<c s="{DATETIME_STYLE}"><v>{value!r}</v></c>' for value in serials.tolist()]
+            return cells
+
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        if isinstance(dtype, pd.CategoricalDtype):
+            cells = []
+            for value in uniques:
+                if isinstance(value, str):
+                    index = self._shared_strings.setdefault(value, len(self._shared_strings))
+                    cells.append(f'<c t="s"><v>{index}</v></c>')
+                else:
+                    cells.append(_cell(value))
+        else:
+            cells = [_cell(value) for value in uniques]
+        # Missing values get code -1, the last element
+        return np.array(cells + [EMPTY_CELL], dtype=object)[codes]
+
+    def _write_rows(self, df):
+        columns = [self._column_cells(df.iloc[:, position]) for position in range(df.shape[1])]
+        first = self._row + 1
+        rows = [f'<row r="{number}">{"".join(cells)}</row>' for number, cells in enumerate(zip(*columns), first)]
+        self._sheet.write(''.join(rows).encode())
+        self._row += len(df)
+
+    def close(self):
+        """
+        Finishes the last sheet and writes the workbook parts.
+        """
+        if self._archive is None:
+            return
+        if self._sheet is None and not self._sheets:
+            self._open_sheet()
+        if self._sheet is not None:
+            self._close_sheet()
+
+        sheets = ''.join(f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{number}" r:id="rId{number}"/>'
+                         for number, name in enumerate(self._sheets, 1))
+        relationships = ''.join(
+            f'<Relationship Id="rId{number}" Type="{RELATIONSHIPS_NAMESPACE}/worksheet" Target="worksheets/sheet{number}.xml"/>'
+            for number in range(1, len(self._sheets) + 1))
+        count = len(self._sheets)
+        relationships += (f'<Relationship Id="rId{count + 1}" Type="{RELATIONSHIPS_NAMESPACE}/styles" Target="styles.xml"/>'
+                          f'<Relationship Id="rId{count + 2}" Type="{RELATIONSHIPS_NAMESPACE}/sharedStrings" Target="sharedStrings.xml"/>')
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{number}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for number in range(1, count + 1))
+        strings = ''.join(f'<si><t xml:space="preserve">{escape(ILLEGAL_CHARACTERS.sub("", text))}</t></si>'
+                          for text in self._shared_strings)
+        size = len(self._shared_strings)
+
+        parts = {
+            '[Content_Types].xml': (
+                f'{XML_DECLARATION}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                '<Override PartName="/xl/sharedStrings.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+                f'{overrides}</Types>'),
+            '_rels/.rels': (
+                f'{XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                f'<Relationship Id="rId1" Type="{RELATIONSHIPS_NAMESPACE}/officeDocument" Target="xl/workbook.xml"/>'
+                '</Relationships>'),
+            'xl/workbook.xml': (
+                f'{XML_DECLARATION}<workbook xmlns="{MAIN_NAMESPACE}" xmlns:r="{RELATIONSHIPS_NAMESPACE}">'
+                f'<sheets>{sheets}</sheets></workbook>'),
+            'xl/_rels/workbook.xml.rels': (
+                f'{XML_DECLARATION}<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                f'{relationships}</Relationships>'),
+            'xl/styles.xml': STYLES,
+            'xl/sharedStrings.xml': f'{XML_DECLARATION}<sst xmlns="{MAIN_NAMESPACE}" count="{size}" uniqueCount="{size}">{strings}</sst>',
+        }
+        for name, content in parts.items():
+            self._archive.writestr(name, content)
+        self._archive.close()
+        self._archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_xlsx(df, output_path, sheet_name='Sheet1', chunk_size=100000):
+    """
+    Writes a DataFrame to an XLSX file with `XlsxWriter`, `chunk_size` rows at a time.
+    """
+    with XlsxWriter(output_path, sheet_name) as writer:
+        if df.empty:
+            writer.write(df)
+        for start in range(0, len(df), chunk_size):
+            writer.write(df.iloc[start:start + chunk_size])
@@ -0,0 +1,281 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ods_utilities.compression import split_extension  # noqa: E402
+from ods_utilities.joins import mapping_columns  # noqa: E402
+from ods_utilities.readers import validate_columns  # noqa: E402
+from ods_utilities.watching import Catalog, DirectoryWatcher  # noqa: E402
+from ods_utilities.writers import OUTPUT_EXTENSIONS, TABLE_FORMATS, with_extension, write_table  # noqa: E402
+from ods_file_column_fnr import main as fnr  # noqa: E402
+from ods_uom import main as uom  # noqa: E402
+from mx_zip_colony import main as mx  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+# Subdirectories of an inbox where its files are moved once processed
+PROCESSED = 'processed'
+FAILED = 'failed'
+
+
+def read_checked(read, file_path, **kwargs):
+    """
+    Calls the `read_file` of a script, which prints its errors and returns None, and raises instead.
+    """
+    data = read(file_path, **kwargs)
+    if data is None:
+        raise ValueError(f"Could not read '{os.path.basename(file_path)}'")
+    return data
+
+
+def output_path(file_path, settings, suffix='', extension='.csv'):
+    """
+    Returns the path of an output of `file_path` in the job's outbox, in the job's format.
+    """
+    stem = split_extension(os.path.basename(file_path))[0]
+    return with_extension(os.path.join(settings['outbox'], f"{stem}{suffix}{extension}"), settings['format'])
+
+
+def uom_catalogs(settings):
+    def load(file_path):
+        categorias_df = read_checked(uom.read_file, file_path)
+        return uom.crear_mapeo_categorias(categorias_df[['id', 'uom_external_id']]), uom.crear_tabla_unidades(categorias_df)
+    return {'categorias': Catalog(settings['categorias'], load)}
+
+
+def process_uom(file_path, settings, catalogs):
+    """
+    Validates the units of measure of a products file against the categories catalog, see `ods_uom`.
+    """
+    uom_to_category, unidades = catalogs['categorias'].get()
+    compra, normal = settings['unidad_compra'], settings['unidad_normal']
+    validate_columns(file_path, [compra, normal])
+    productos_df = read_checked(uom.read_file, file_path, categories=[compra, normal])
+    productos_df = uom.validar_unidades_medida(productos_df, uom_to_category, compra, normal, unidades)
+    resumen = uom.resumen_por_categoria(productos_df, uom_to_category, compra)
+    written = [output_path(file_path, settings, '_validados'), output_path(file_path, settings, '_resumen_categorias')]
+    write_table(productos_df, written[0], settings['format'])
+    write_table(resumen, written[1], settings['format'])
+    return written
+
+
+def fnr_catalogs(settings):
+    search_columns, taken_columns, _, _ = settings['columns']
+
+    def load(file_path):
+        input_df = read_checked(fnr.read_file, file_path, usecols=search_columns + taken_columns)
+        return fnr.load_lookup(input_df, search_columns, taken_columns)
+    return {'lookup': Catalog(settings['lookup'], load)}
+
+
+def process_fnr(file_path, settings, catalogs):
+    """
+    Fills the target columns of a file from the lookup catalog, see `ods_file_column_fnr`.
+    """
+    _, taken_columns, target_columns, key_columns = settings['columns']
+    lookup = catalogs['lookup'].get()
+    validate_columns(file_path, key_columns)
+    output_df = read_checked(fnr.read_file, file_path)
+    fnr.apply_lookup(lookup, output_df, key_columns, taken_columns, target_columns)
+    fnr.restore_integers(output_df, target_columns)
+    written = output_path(file_path, settings)
+    write_table(output_df, written, settings['format'])
+    return [written]
+
+
+def mx_catalogs(settings):
+    def load_cities(file_path):
+        cities = mx.read_cities(file_path, mx.COLUMN_KEYS['city'])
+        return cities, mx.city_index(cities)
+    return {
+        'cities': Catalog(settings['cities'], load_cities),
+        'ccp': Catalog(settings['ccp'], lambda file_path: mx.process_ccp_data(file_path, mx.COLUMN_KEYS['ccp'])),
+    }
+
+
+def process_mx(file_path, settings, catalogs):
+    """
+    Builds the colonies and zip codes of a Correos de México file (one sheet per state) against the
+    cities and SAT CCP catalogs, see `mx_zip_colony`.
+    """
+    cities, index = catalogs['cities'].get()
+    ccp_data, ccp_lookup = catalogs['ccp'].get()
+    validate_columns(file_path, mx.data_columns(mx.COLUMN_KEYS))
+    _, zipcodes, key_report = mx.read_data(file_path, mx.COLUMN_KEYS, cities, index=index)
+    colonies_data, zipcodes_data = mx.build_outputs(zipcodes, ccp_data, ccp_lookup)
+    colony_path = output_path(file_path, settings, '_res_colony', '.ods')
+    return [
+        mx.write_output(colonies_data, colony_path, 'Colonies', settings['format'], mx.COLONY_COLUMNS),
+        mx.write_output(zipcodes_data, output_path(file_path, settings, '_res_zip', '.ods'), 'Zipcodes',
+                        settings['format'], mx.ZIP_COLUMNS),
+    ] + mx.write_key_report(key_report, colony_path, settings['format'])
+
+
+# Job types: the settings with paths to reference files, the default output format, the output
+# formats it writes (uom and fnr write with `write_table`, which has no ODS writer), the function
+# building the job's catalogs and the one processing a file of its inbox
+JOBS = {
+    'uom': (('categorias',), 'csv', TABLE_FORMATS, uom_catalogs, process_uom),
+    'fnr': (('lookup',), 'csv', TABLE_FORMATS, fnr_catalogs, process_fnr),
+    'mx': (('cities', 'ccp'), 'ods', tuple(OUTPUT_EXTENSIONS), mx_catalogs, process_mx),
+}
+
+
+def load_config(config_path):
+    """
+    Reads the JSON configuration of the service. Relative paths are resolved from the directory
+    of the configuration file, and every job gets its catalogs.
+
+    Returns:
+        dict: The configuration, with the jobs keyed by their inbox directory.
+
+    Raises:
+        ValueError: If a job is not valid.
+        OSError: If the configuration or a reference file cannot be read.
+    """
+    with open(config_path) as config_file:
+        config = json.load(config_file)
+    base = os.path.dirname(os.path.abspath(config_path))
+
+    jobs = {}
+    for settings in config.get('jobs', []):
+        job_type = settings.get('type')
+        if job_type not in JOBS:
+            raise ValueError(f"Unknown job type '{job_type}'. Use one of: {', '.join(JOBS)}")
+        references, default_format, formats, build_catalogs, _ = JOBS[job_type]
+        settings = dict(settings)
+        for key in ('inbox', 'outbox') + references:
+            if key not in settings:
+                raise ValueError(f"The {job_type} job needs a '{key}' setting.")
+            settings[key] = os.path.join(base, settings[key])
+        for key in references:
+            if not os.path.isfile(settings[key]):
+                raise OSError(f"Reference file '{settings[key]}' not found.")
+        settings.setdefault('format', default_format)
+        if settings['format'] not in formats:
+            raise ValueError(f"Unsupported output format '{settings['format']}' for a {job_type} job. Use one of: {', '.join(formats)}")
+        if job_type == 'uom':
+            for key in ('unidad_compra', 'unidad_normal'):
+                if key not in settings:
+                    raise ValueError(f"The uom job needs a '{key}' setting.")
+        if job_type == 'fnr':
+            settings['columns'] = mapping_columns(settings.get('search', ''), settings.get('taken', ''),
+                                                  settings.get('target', ''), settings.get('on'))
+
+        settings['inbox'] = os.path.abspath(settings['inbox'])
+        if settings['inbox'] in jobs:
+            raise ValueError(f"Two jobs watch the same inbox '{settings['inbox']}'.")
+        for directory in (settings['inbox'], settings['outbox'],
+                          os.path.join(settings['inbox'], PROCESSED), os.path.join(settings['inbox'], FAILED)):
+            os.makedirs(directory, exist_ok=True)
+        settings['catalogs'] = build_catalogs(settings)
+        jobs[settings['inbox']] = settings
+
+    if not jobs:
+        raise ValueError("The configuration has no jobs.")
+    config['jobs'] = jobs
+    return config
+
+
+class Service:
+    """
+    Watches the inboxes of the configured jobs and processes every new file in a bounded pool of
+    worker threads.
+
+    The reference catalogs of each job are parsed once, with their lookup indexes, and stay in
+    memory between files; a catalog is parsed again only when its file changes. A file costs its
+    own parsing and the lookups, not the catalogs. Processed files are moved to the `processed`
+    subdirectory of their inbox and files that fail to `failed`, with the error in the log.
+
+    Threads share the catalogs without copying them. At most `workers * 2` files are queued, the
+    rest stay in their inbox until a worker is free.
+    """
+
+    def __init__(self, config):
+        self.jobs = config['jobs']
+        self.workers = config.get('workers', os.cpu_count() or 1)
+        self.watcher = DirectoryWatcher(self.jobs, config.get('interval', 1.0), config.get('polling', False))
+        self._slots = threading.BoundedSemaphore(self.workers * 2)
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def load_catalogs(self):
+        """
+        Parses every catalog before the first file arrives.
+        """
+        for settings in self.jobs.values():
+            for catalog in settings['catalogs'].values():
+                catalog.get()
+
+    def process(self, file_path):
+        settings = self.jobs[os.path.dirname(file_path)]
+        name = os.path.basename(file_path)
+        start = time.perf_counter()
+        try:
+            written = JOBS[settings['type']][4](file_path, settings, settings['catalogs'])
+            destination = PROCESSED
+            logger.info("%s: %s -> %s in %.0f ms", settings['type'], name, ', '.join(os.path.basename(path) for path in written),
+                        (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            destination = FAILED
+            logger.error("%s: error processing %s: %s", settings['type'], name, e)
+        try:
+            os.replace(file_path, os.path.join(settings['inbox'], destination, name))
+        except OSError as e:
+            logger.error("Could not move %s to %s: %s", name, destination, e)
+        finally:
+            with self._lock:
+                self._active.discard(file_path)
+            self._slots.release()
+
+    def run(self, stop=None):
+        """
+        Processes new files until interrupted or until the `stop` event is set.
+        """
+        stop = stop or threading.Event()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                while not stop.is_set():
+                    for file_path in self.watcher.poll():
+                        with self._lock:
+                            if file_path in self._active or not os.path.isfile(file_path):
+                                continue
+                            self._active.add(file_path)
+                        self._slots.acquire()
+                        executor.submit(self.process, file_path)
+            except KeyboardInterrupt:
+                logger.info("Stopping, waiting for the files being processed")
+            finally:
+                self.watcher.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    args = sys.argv[1:]
+    if len(args) < 1:
+        print("Usage: python ods_watch/main.py <config.json>")
+        sys.exit(1)
+
+    try:
+        config = load_config(args[0])
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    service = Service(config)
+    try:
+        service.load_catalogs()
+    except Exception as e:
+        print(f"Error loading the reference catalogs: {e}")
+        sys.exit(1)
+    service.run()
+
+
+if __name__ == "__main__":
+    main()